@@ -4,32 +4,72 @@ API REST para servir dados de futebol com Flask + PostgreSQL (Neon.tech)
 Deploy: Koyeb
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
+import csv
+import io
 from datetime import datetime
 import logging
 
+import db_pool
+import slow_queries
+from single_flight import flights
+from read_replicas import DATABASE_READ_URLS, ReplicaRouter
+from data_versions import DataVersions, path_scope, query_scope
+from compression import init_compression
+from metrics import init_metrics
+from rate_limit import init_rate_limit
+import warmup
+from json_provider import make_json_provider
+from queries import InvalidFilter, build_match_filters, fetch_match_details
+from match_counts import count_matches, TOTAL_EXACT, TOTAL_ESTIMATE
+from standings_history import parse_as_of, parse_round, standings_as_of, standings_cache_ttl
+from pagination import (
+    MATCH_ORDER_BY, MATCH_SEEK, InvalidCursor, decode_cursor, encode_cursor,
+)
+from team_search import (
+    SEARCH_MATCHES_SQL, SEARCH_TEAMS_SQL, TEAM_NAME_MATCH, TEAM_NAME_RANK,
+    search_matches_params, search_teams_params, team_search_params,
+)
+from response_cache import (
+    cached, cache_stats,
+    CACHE_TTL_LEAGUES, CACHE_TTL_SEASONS,
+)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = make_json_provider(app)
 CORS(app)  # Permitir requisições de qualquer origem
+init_metrics(app)  # antes da compressão: mede os bytes já comprimidos
+init_rate_limit(app)  # 429 antes de qualquer consulta
+init_compression(app)
 
 # Configuração do banco de dados Neon.tech
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-def get_db_connection():
-    """Cria conexão com o banco de dados PostgreSQL (Neon)"""
-    try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        return conn
-    except Exception as e:
-        logger.error(f"Erro ao conectar ao banco de dados: {e}")
-        raise
+# Réplicas de leitura opcionais (DATABASE_READ_URL); sem elas, tudo vai ao primário
+router = ReplicaRouter(DATABASE_URL, DATABASE_READ_URLS)
+
+def get_db_connection(primary=False):
+    """
+    Empresta uma conexão do pool do worker (Neon)
+
+    Uso: `with get_db_connection() as conn:` - a conexão volta ao pool
+    ao sair do bloco, mesmo em caso de exceção. As rotas são só leitura e
+    usam as réplicas; `primary=True` força o primário (dados recém-gravados).
+    """
+    return router.connection(primary=primary)
+
+
+# EXPLAIN das consultas lentas amostradas usa o mesmo pool
+slow_queries.init_explain(get_db_connection)
+
+# Versões por liga/temporada para ETag e GET condicional
+data_versions = DataVersions(get_db_connection)
 
 
 # ============================================================================
@@ -46,10 +86,13 @@ def home():
         'description': 'API REST para dados de futebol',
         'endpoints': {
             'health': '/health',
+            'metrics': '/metrics',
             'leagues': '/api/leagues',
             'seasons': '/api/leagues/<league_id>/seasons',
             'matches': '/api/matches',
             'match_details': '/api/matches/<match_id>',
+            'matches_export': '/api/matches/export',
+            'matches_batch': '/api/matches/batch?ids=<id1>,<id2>',
             'standings': '/api/standings/<league_id>/<season>',
             'teams': '/api/teams',
             'team_stats': '/api/teams/<team_id>/stats',
@@ -62,15 +105,19 @@ def home():
 def health():
     """Health check para o Koyeb"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
         
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'pool': db_pool.pool_stats(),
+            'read_routing': router.stats(),
+            'single_flight': flights.stats(),
+            'warmup': warmup.last_warmup,
+            'cache': cache_stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -87,6 +134,7 @@ def health():
 # ============================================================================
 
 @app.route('/api/leagues', methods=['GET'])
+@cached(ttl=CACHE_TTL_LEAGUES)
 def get_leagues():
     """
     Retorna todas as ligas disponíveis
@@ -95,28 +143,27 @@ def get_leagues():
     - country: filtrar por país (opcional)
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        country = request.args.get('country')
-        
-        if country:
-            cur.execute('''
-                SELECT DISTINCT league_id, league_name, country 
-                FROM leagues 
-                WHERE country = %s
-                ORDER BY league_name
-            ''', (country,))
-        else:
-            cur.execute('''
-                SELECT DISTINCT league_id, league_name, country 
-                FROM leagues 
-                ORDER BY country, league_name
-            ''')
-        
-        leagues = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+        
+            country = request.args.get('country')
+        
+            if country:
+                cur.execute('''
+                    SELECT DISTINCT league_id, league_name, country 
+                    FROM leagues 
+                    WHERE country = %s
+                    ORDER BY league_name
+                ''', (country,))
+            else:
+                cur.execute('''
+                    SELECT DISTINCT league_id, league_name, country 
+                    FROM leagues 
+                    ORDER BY country, league_name
+                ''')
+        
+            leagues = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -133,22 +180,23 @@ def get_leagues():
 
 
 @app.route('/api/leagues/<league_id>/seasons', methods=['GET'])
+@data_versions.conditional(path_scope)
+@cached(ttl=CACHE_TTL_SEASONS)
 def get_league_seasons(league_id):
     """Retorna todas as temporadas disponíveis de uma liga"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
         
-        cur.execute('''
-            SELECT DISTINCT season 
-            FROM matches 
-            WHERE league_id = %s 
-            ORDER BY season DESC
-        ''', (league_id,))
+            cur.execute('''
+                SELECT DISTINCT season 
+                FROM matches 
+                WHERE league_id = %s 
+                ORDER BY season DESC
+            ''', (league_id,))
         
-        seasons = cur.fetchall()
-        cur.close()
-        conn.close()
+            seasons = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -169,7 +217,15 @@ def get_league_seasons(league_id):
 # ROTAS DE PARTIDAS
 # ============================================================================
 
+# Linhas buscadas por ida ao servidor no cursor do export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+# Máximo de partidas por chamada de /api/matches/batch
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
+
 @app.route('/api/matches', methods=['GET'])
+@data_versions.conditional(query_scope)
 def get_matches():
     """
     Retorna partidas com filtros
@@ -182,69 +238,233 @@ def get_matches():
     - date_to: data final (YYYY-MM-DD)
     - limit: quantidade de resultados (padrão: 100)
     - offset: paginação (padrão: 0)
+    - cursor: paginação por cursor; use o `next_cursor` da página anterior
+      (ignora offset e é estável durante a ingestão)
+    - include_total: `true` para o total exato (em cache até a próxima
+      ingestão) ou `estimate` para a estimativa do planner (qualquer
+      combinação de filtros, sem COUNT(*))
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Parâmetros de filtro
-        league_id = request.args.get('league_id')
-        season = request.args.get('season')
-        team = request.args.get('team')
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
         limit = int(request.args.get('limit', 100))
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', '').lower()
         
-        # Construir query dinâmica
-        query = 'SELECT * FROM matches WHERE 1=1'
-        params = []
-        
-        if league_id:
-            query += ' AND league_id = %s'
-            params.append(league_id)
-        
-        if season:
-            query += ' AND season = %s'
-            params.append(season)
+        try:
+            filters, params = build_match_filters(request.args)
+        except InvalidFilter as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        if team:
-            query += ' AND (home_team ILIKE %s OR away_team ILIKE %s)'
-            params.extend([f'%{team}%', f'%{team}%'])
+        query = 'SELECT * FROM matches WHERE 1=1' + filters
+        page_params = list(params)
+        
+        if cursor:
+            try:
+                page_params.extend(decode_cursor(cursor))
+            except InvalidCursor as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            query += MATCH_SEEK
+            offset = 0
+        
+        # Buscar uma linha extra para saber se existe próxima página
+        query += MATCH_ORDER_BY + ' LIMIT %s OFFSET %s'
+        page_params.extend([limit + 1, offset])
+        
+        # Total só quando pedido
+        if include_total not in (TOTAL_EXACT, TOTAL_ESTIMATE):
+            include_total = None
+        
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                
+                cur.execute(query, page_params)
+                rows = cur.fetchall()
+                
+                total, total_is_estimate = None, None
+                if include_total:
+                    total, total_is_estimate = count_matches(
+                        cur, filters, params, include_total
+                    )
+                
+                cur.close()
+            return rows, total, total_is_estimate
+        
+        # SQL e parâmetros já saem normalizados de build_match_filters
+        key = ('matches', query, tuple(page_params), include_total)
+        matches, total, total_is_estimate = flights.do(key, load)
+        
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_cursor = encode_cursor(matches[-1])
+        
+        response = {
+            'success': True,
+            'count': len(matches),
+            'limit': limit,
+            'offset': offset,
+            'next_cursor': next_cursor,
+            'data': matches
+        }
+        if total is not None:
+            response['total'] = total
+            response['total_is_estimate'] = total_is_estimate
         
-        if date_from:
-            query += ' AND match_date >= %s'
-            params.append(date_from)
+        return jsonify(response)
         
-        if date_to:
-            query += ' AND match_date <= %s'
-            params.append(date_to)
+    except Exception as e:
+        logger.error(f"Erro ao buscar partidas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/matches/export', methods=['GET'])
+def export_matches():
+    """
+    Exporta todas as partidas dos filtros em streaming
+    
+    Usa um cursor do lado do servidor, então a memória do worker não
+    depende do tamanho da exportação e a primeira linha sai logo.
+    
+    Query params:
+    - os mesmos filtros de /api/matches (league_id, season, team,
+      date_from, date_to)
+    - format: `ndjson` (padrão) ou `csv`
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'error': 'Formato inválido: use ndjson ou csv'
+        }), 400
+    
+    try:
+        filters, params = build_match_filters(request.args)
+    except InvalidFilter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    query = 'SELECT * FROM matches WHERE 1=1' + filters + MATCH_ORDER_BY
+    
+    def generate():
+        with get_db_connection() as conn:
+            cur = conn.cursor(name='matches_export')
+            cur.itersize = EXPORT_BATCH_SIZE
+            cur.execute(query, params)
+            
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow([column.name for column in cur.description])
+                # Cabeçalho em um pedaço próprio: sai mesmo sem linhas
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            while rows:
+                if export_format == 'csv':
+                    writer.writerows(row.values() for row in rows)
+                    chunk = buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                else:
+                    chunk = ''.join(app.json.dumps(row) + '\n' for row in rows)
+                yield chunk
+                rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            
+            cur.close()
+    
+    if export_format == 'csv':
+        response = Response(generate(), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=matches.csv'
+    else:
+        response = Response(generate(), mimetype='application/x-ndjson')
+    return response
+
+
+@app.route('/api/matches/batch', methods=['GET', 'POST'])
+def get_matches_batch():
+    """
+    Retorna várias partidas (com estatísticas) em uma chamada
+    
+    GET:  /api/matches/batch?ids=a,b,c
+    POST: {"ids": ["a", "b", "c"]}
+    
+    Faz uma query para as partidas e outra para todas as estatísticas,
+    independente da quantidade de ids (máximo BATCH_MAX_IDS).
+    """
+    try:
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            if not isinstance(body, dict):
+                return jsonify({
+                    'success': False,
+                    'error': 'Corpo deve ser um objeto JSON: {"ids": [...]}'
+                }), 400
+            ids = body.get('ids') or []
+            if not isinstance(ids, list) or not all(isinstance(match_id, (str, int)) for match_id in ids):
+                return jsonify({
+                    'success': False,
+                    'error': 'Campo "ids" deve ser uma lista de ids'
+                }), 400
+        else:
+            ids = request.args.get('ids', '').split(',')
         
-        query += ' ORDER BY match_date DESC LIMIT %s OFFSET %s'
-        params.extend([limit, offset])
+        # Remover vazios e duplicados mantendo a ordem pedida
+        ids = list(dict.fromkeys(str(match_id).strip() for match_id in ids if str(match_id).strip()))
         
-        cur.execute(query, params)
-        matches = cur.fetchall()
+        if not ids:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetro "ids" é obrigatório'
+            }), 400
         
-        # Contar total
-        count_query = query.split('ORDER BY')[0].replace('SELECT *', 'SELECT COUNT(*)')
-        cur.execute(count_query, params[:-2])  # Remover limit e offset
-        total = cur.fetchone()['count']
+        if len(ids) > BATCH_MAX_IDS:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {BATCH_MAX_IDS} ids por requisição'
+            }), 400
         
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute('SELECT * FROM matches WHERE match_id = ANY(%s)', (ids,))
+            matches = {match['match_id']: match for match in cur.fetchall()}
+            
+            stats = {match_id: [] for match_id in matches}
+            if matches:
+                cur.execute('''
+                    SELECT * FROM match_stats
+                    WHERE match_id = ANY(%s)
+                    ORDER BY match_id, id
+                ''', (list(matches),))
+                for stat in cur.fetchall():
+                    stats[stat['match_id']].append(stat)
+            
+            cur.close()
         
         return jsonify({
             'success': True,
             'count': len(matches),
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'data': matches
+            'not_found': [match_id for match_id in ids if match_id not in matches],
+            'data': [
+                {'match': matches[match_id], 'stats': stats[match_id]}
+                for match_id in ids if match_id in matches
+            ]
         })
         
     except Exception as e:
-        logger.error(f"Erro ao buscar partidas: {e}")
+        logger.error(f"Erro ao buscar partidas em lote: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -255,11 +475,13 @@ def get_matches():
 def get_match_details(match_id):
     """Retorna detalhes completos de uma partida específica"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute('SELECT * FROM matches WHERE match_id = %s', (match_id,))
-        match = cur.fetchone()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            
+            # Partida e estatísticas em uma única query
+            match, stats = fetch_match_details(cur, match_id)
+            
+            cur.close()
         
         if not match:
             return jsonify({
@@ -267,13 +489,6 @@ def get_match_details(match_id):
                 'error': 'Partida não encontrada'
             }), 404
         
-        # Buscar estatísticas se existirem
-        cur.execute('SELECT * FROM match_stats WHERE match_id = %s', (match_id,))
-        stats = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
         return jsonify({
             'success': True,
             'data': {
@@ -295,35 +510,68 @@ def get_match_details(match_id):
 # ============================================================================
 
 @app.route('/api/standings/<league_id>/<season>', methods=['GET'])
+@data_versions.conditional(path_scope)
+@cached(ttl=standings_cache_ttl)
 def get_standings(league_id, season):
-    """Retorna a tabela de classificação de uma liga/temporada"""
+    """
+    Retorna a tabela de classificação de uma liga/temporada
+
+    Query params:
+    - as_of: classificação ao fim desta data (YYYY-MM-DD)
+    - round: classificação ao fim desta rodada
+
+    Com as_of/round a tabela é reconstruída a partir das partidas; sem
+    eles vem a classificação final coletada do Flashscore.
+    """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute('''
-            SELECT * FROM standings 
-            WHERE league_id = %s AND season = %s 
-            ORDER BY position
-        ''', (league_id, season))
-        
-        standings = cur.fetchall()
-        cur.close()
-        conn.close()
-        
+        as_of = request.args.get('as_of')
+        round_number = request.args.get('round')
+        try:
+            as_of = parse_as_of(as_of) if as_of else None
+            round_number = parse_round(round_number) if round_number else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetros inválidos: as_of deve ser YYYY-MM-DD e round um inteiro positivo'
+            }), 400
+
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+
+                if as_of or round_number:
+                    rows = standings_as_of(cur, league_id, season, as_of, round_number)
+                else:
+                    cur.execute('''
+                        SELECT * FROM standings
+                        WHERE league_id = %s AND season = %s
+                        ORDER BY position
+                    ''', (league_id, season))
+                    rows = cur.fetchall()
+
+                cur.close()
+            return rows
+
+        standings = flights.do(('standings', league_id, season, as_of, round_number), load)
+
         if not standings:
             return jsonify({
                 'success': False,
                 'error': 'Tabela não encontrada'
             }), 404
-        
-        return jsonify({
+
+        response = {
             'success': True,
             'league_id': league_id,
             'season': season,
             'count': len(standings),
             'data': standings
-        })
+        }
+        if as_of or round_number:
+            response['as_of'] = as_of.isoformat() if as_of else None
+            response['round'] = round_number
+
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Erro ao buscar classificação: {e}")
@@ -348,34 +596,35 @@ def get_teams():
     - search: buscar por nome
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        league_id = request.args.get('league_id')
-        season = request.args.get('season')
-        search = request.args.get('search')
+        with get_db_connection() as conn:
+            cur = conn.cursor()
         
-        query = 'SELECT DISTINCT team_id, team_name FROM teams WHERE 1=1'
-        params = []
+            league_id = request.args.get('league_id')
+            season = request.args.get('season')
+            search = request.args.get('search')
         
-        if league_id:
-            query += ' AND league_id = %s'
-            params.append(league_id)
+            query = 'SELECT team_id, team_name FROM teams WHERE 1=1'
+            params = []
         
-        if season:
-            query += ' AND season = %s'
-            params.append(season)
+            if league_id:
+                query += ' AND league_id = %s'
+                params.append(league_id)
         
-        if search:
-            query += ' AND team_name ILIKE %s'
-            params.append(f'%{search}%')
+            if season:
+                query += ' AND season = %s'
+                params.append(season)
         
-        query += ' ORDER BY team_name'
+            if search:
+                # Índice trigram + ranking: nomes mais parecidos primeiro
+                query += ' AND ' + TEAM_NAME_MATCH + TEAM_NAME_RANK
+                params.extend(team_search_params(search))
+                params.append(search)
+            else:
+                query += ' ORDER BY team_name'
         
-        cur.execute(query, params)
-        teams = cur.fetchall()
-        cur.close()
-        conn.close()
+            cur.execute(query, params)
+            teams = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -391,7 +640,7 @@ def get_teams():
         }), 500
 
 
-@app.route('/api/teams/<team_id>/stats', methods=['GET'])
+@app.route('/api/teams/<int:team_id>/stats', methods=['GET'])
 def get_team_stats(team_id):
     """
     Retorna estatísticas de um time
@@ -401,31 +650,30 @@ def get_team_stats(team_id):
     - league_id: filtrar por liga (opcional)
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
         
-        season = request.args.get('season')
-        league_id = request.args.get('league_id')
+            season = request.args.get('season')
+            league_id = request.args.get('league_id')
         
-        query = '''
-            SELECT * FROM team_stats 
-            WHERE team_id = %s
-        '''
-        params = [team_id]
+            query = '''
+                SELECT * FROM team_stats 
+                WHERE team_id = %s
+            '''
+            params = [team_id]
         
-        if season:
-            query += ' AND season = %s'
-            params.append(season)
+            if season:
+                query += ' AND season = %s'
+                params.append(season)
         
-        if league_id:
-            query += ' AND league_id = %s'
-            params.append(league_id)
+            if league_id:
+                query += ' AND league_id = %s'
+                params.append(league_id)
         
-        cur.execute(query, params)
-        stats = cur.fetchall()
+            cur.execute(query, params)
+            stats = cur.fetchall()
         
-        cur.close()
-        conn.close()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -465,43 +713,37 @@ def search():
                 'error': 'Parâmetro de busca "q" é obrigatório'
             }), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        results = {}
-        
-        # Buscar times
-        if search_type in ['all', 'teams']:
-            cur.execute('''
-                SELECT DISTINCT team_id, team_name 
-                FROM teams 
-                WHERE team_name ILIKE %s 
-                LIMIT 10
-            ''', (f'%{query_term}%',))
-            results['teams'] = cur.fetchall()
-        
-        # Buscar ligas
-        if search_type in ['all', 'leagues']:
-            cur.execute('''
-                SELECT DISTINCT league_id, league_name, country 
-                FROM leagues 
-                WHERE league_name ILIKE %s 
-                LIMIT 10
-            ''', (f'%{query_term}%',))
-            results['leagues'] = cur.fetchall()
-        
-        # Buscar partidas
-        if search_type in ['all', 'matches']:
-            cur.execute('''
-                SELECT * FROM matches 
-                WHERE home_team ILIKE %s OR away_team ILIKE %s 
-                ORDER BY match_date DESC 
-                LIMIT 10
-            ''', (f'%{query_term}%', f'%{query_term}%'))
-            results['matches'] = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+            
+                found = {}
+            
+                # Buscar times
+                if search_type in ['all', 'teams']:
+                    cur.execute(SEARCH_TEAMS_SQL, search_teams_params(query_term))
+                    found['teams'] = cur.fetchall()
+            
+                # Buscar ligas
+                if search_type in ['all', 'leagues']:
+                    cur.execute('''
+                        SELECT DISTINCT league_id, league_name, country 
+                        FROM leagues 
+                        WHERE league_name ILIKE %s 
+                        LIMIT 10
+                    ''', (f'%{query_term}%',))
+                    found['leagues'] = cur.fetchall()
+            
+                # Buscar partidas
+                if search_type in ['all', 'matches']:
+                    cur.execute(SEARCH_MATCHES_SQL, search_matches_params(query_term))
+                    found['matches'] = cur.fetchall()
+            
+                cur.close()
+            return found
+        
+        # ILIKE e similaridade trigram ignoram maiúsculas
+        results = flights.do(('search', search_type, query_term.lower()), load)
         
         return jsonify({
             'success': True,
@@ -539,4 +781,7 @@ def internal_error(error):
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8000))
+    # Com gunicorn o aquecimento roda no hook when_ready (gunicorn.conf.py)
+    if warmup.WARMUP_ENABLED:
+        warmup.warm_up(app)
     app.run(host='0.0.0.0', port=port, debug=False)
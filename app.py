@@ -5,18 +5,44 @@ API REST simplificada para servir dados já coletados
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
 from datetime import datetime
 import logging
 
+import db_pool
+import slow_queries
+from single_flight import flights
+from read_replicas import DATABASE_READ_URLS, ReplicaRouter
+from data_versions import DataVersions, path_scope, query_scope
+from compression import init_compression
+from metrics import init_metrics
+from rate_limit import init_rate_limit
+import warmup
+from json_provider import make_json_provider
+from queries import fetch_match_details
+from standings_history import parse_as_of, parse_round, standings_as_of, standings_cache_ttl
+from pagination import (
+    MATCH_ORDER_BY, MATCH_SEEK, InvalidCursor, decode_cursor, encode_cursor,
+)
+from team_search import (
+    SEARCH_TEAMS_SQL, TEAM_NAME_MATCH, TEAM_NAME_RANK,
+    search_teams_params, team_search_params,
+)
+from response_cache import (
+    cached, cache_stats,
+    CACHE_TTL_LEAGUES, CACHE_TTL_SEASONS,
+)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = make_json_provider(app)
 CORS(app)
+init_metrics(app)  # antes da compressão: mede os bytes já comprimidos
+init_rate_limit(app)  # 429 antes de qualquer consulta
+init_compression(app)
 
 # Configuração do banco de dados
 DATABASE_URL = os.getenv('DATABASE_URL')
@@ -25,14 +51,19 @@ if not DATABASE_URL:
     logger.warning("DATABASE_URL não configurada! Usando valores padrão para desenvolvimento.")
     DATABASE_URL = "postgresql://localhost/football_db"
 
-def get_db_connection():
-    """Cria conexão com PostgreSQL"""
-    try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        return conn
-    except Exception as e:
-        logger.error(f"Erro ao conectar: {e}")
-        return None
+# Réplicas de leitura opcionais (DATABASE_READ_URL)
+router = ReplicaRouter(DATABASE_URL, DATABASE_READ_URLS)
+
+def get_db_connection(primary=False):
+    """Empresta uma conexão (réplica ou primário com primary=True; usar com `with`)"""
+    return router.connection(primary=primary)
+
+
+# EXPLAIN das consultas lentas amostradas usa o mesmo pool
+slow_queries.init_explain(get_db_connection)
+
+# Versões por liga/temporada para ETag e GET condicional
+data_versions = DataVersions(get_db_connection)
 
 
 @app.route('/')
@@ -46,6 +77,7 @@ def home():
         'documentation': 'https://github.com/seu-usuario/football-api',
         'endpoints': {
             'health': '/health',
+            'metrics': '/metrics',
             'leagues': '/api/leagues',
             'seasons': '/api/leagues/<league_id>/seasons',
             'matches': '/api/matches',
@@ -68,61 +100,56 @@ def home():
 def health():
     """Health check para Koyeb"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'status': 'unhealthy',
-                'database': 'disconnected',
-                'timestamp': datetime.now().isoformat()
-            }), 503
-        
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
         
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'pool': db_pool.pool_stats(),
+            'read_routing': router.stats(),
+            'single_flight': flights.stats(),
+            'warmup': warmup.last_warmup,
+            'cache': cache_stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({
             'status': 'unhealthy',
+            'database': 'disconnected',
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }), 503
 
 
 @app.route('/api/leagues', methods=['GET'])
+@cached(ttl=CACHE_TTL_LEAGUES)
 def get_leagues():
     """Lista todas as ligas"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        country = request.args.get('country')
-        
-        if country:
-            cur.execute('''
-                SELECT DISTINCT league_id, league_name, country 
-                FROM leagues 
-                WHERE country = %s
-                ORDER BY league_name
-            ''', (country,))
-        else:
-            cur.execute('''
-                SELECT DISTINCT league_id, league_name, country 
-                FROM leagues 
-                ORDER BY country, league_name
-            ''')
-        
-        leagues = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            country = request.args.get('country')
+        
+            if country:
+                cur.execute('''
+                    SELECT DISTINCT league_id, league_name, country 
+                    FROM leagues 
+                    WHERE country = %s
+                    ORDER BY league_name
+                ''', (country,))
+            else:
+                cur.execute('''
+                    SELECT DISTINCT league_id, league_name, country 
+                    FROM leagues 
+                    ORDER BY country, league_name
+                ''')
+        
+            leagues = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -135,24 +162,22 @@ def get_leagues():
 
 
 @app.route('/api/leagues/<league_id>/seasons', methods=['GET'])
+@data_versions.conditional(path_scope)
+@cached(ttl=CACHE_TTL_SEASONS)
 def get_league_seasons(league_id):
     """Retorna temporadas disponíveis de uma liga"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT DISTINCT season 
-            FROM matches 
-            WHERE league_id = %s 
-            ORDER BY season DESC
-        ''', (league_id,))
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('''
+                SELECT DISTINCT season 
+                FROM matches 
+                WHERE league_id = %s 
+                ORDER BY season DESC
+            ''', (league_id,))
         
-        seasons = cur.fetchall()
-        cur.close()
-        conn.close()
+            seasons = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -166,21 +191,17 @@ def get_league_seasons(league_id):
 
 
 @app.route('/api/matches', methods=['GET'])
+@data_versions.conditional(query_scope)
 def get_matches():
-    """Lista partidas com filtros e paginação"""
+    """Lista partidas com filtros e paginação (offset ou cursor)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
         # Parâmetros
         league_id = request.args.get('league_id')
         season = request.args.get('season')
         team = request.args.get('team')
         limit = min(int(request.args.get('limit', 50)), 100)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
         
         # Query dinâmica
         query = 'SELECT * FROM matches WHERE 1=1'
@@ -198,20 +219,40 @@ def get_matches():
             query += ' AND (home_team ILIKE %s OR away_team ILIKE %s)'
             params.extend([f'%{team}%', f'%{team}%'])
         
-        query += ' ORDER BY match_date DESC LIMIT %s OFFSET %s'
-        params.extend([limit, offset])
-        
-        cur.execute(query, params)
-        matches = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        if cursor:
+            try:
+                params.extend(decode_cursor(cursor))
+            except InvalidCursor as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            query += MATCH_SEEK
+            offset = 0
+        
+        # Uma linha extra indica se existe próxima página
+        query += MATCH_ORDER_BY + ' LIMIT %s OFFSET %s'
+        params.extend([limit + 1, offset])
+        
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(query, params)
+                rows = cur.fetchall()
+                cur.close()
+            return rows
+        
+        # Requisições iguais e simultâneas compartilham a mesma consulta
+        matches = flights.do(('matches', query, tuple(params)), load)
+        
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_cursor = encode_cursor(matches[-1])
         
         return jsonify({
             'success': True,
             'count': len(matches),
             'limit': limit,
             'offset': offset,
+            'next_cursor': next_cursor,
             'data': matches
         })
     except Exception as e:
@@ -223,26 +264,15 @@ def get_matches():
 def get_match_details(match_id):
     """Detalhes de uma partida específica"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM matches WHERE match_id = %s', (match_id,))
-        match = cur.fetchone()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            # Partida e estatísticas em uma única query
+            match, stats = fetch_match_details(cur, match_id)
+            cur.close()
         
         if not match:
-            cur.close()
-            conn.close()
             return jsonify({'success': False, 'error': 'Match not found'}), 404
         
-        # Buscar estatísticas
-        cur.execute('SELECT * FROM match_stats WHERE match_id = %s', (match_id,))
-        stats = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
         return jsonify({
             'success': True,
             'data': {
@@ -256,34 +286,51 @@ def get_match_details(match_id):
 
 
 @app.route('/api/standings/<league_id>/<season>', methods=['GET'])
+@data_versions.conditional(path_scope)
+@cached(ttl=standings_cache_ttl)
 def get_standings(league_id, season):
-    """Tabela de classificação"""
+    """Tabela de classificação (?as_of=YYYY-MM-DD / ?round=N reconstroem pelas partidas)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT * FROM standings 
-            WHERE league_id = %s AND season = %s 
-            ORDER BY position
-        ''', (league_id, season))
-        
-        standings = cur.fetchall()
-        cur.close()
-        conn.close()
-        
+        as_of = request.args.get('as_of')
+        round_number = request.args.get('round')
+        try:
+            as_of = parse_as_of(as_of) if as_of else None
+            round_number = parse_round(round_number) if round_number else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid as_of or round'}), 400
+
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                if as_of or round_number:
+                    rows = standings_as_of(cur, league_id, season, as_of, round_number)
+                else:
+                    cur.execute('''
+                        SELECT * FROM standings
+                        WHERE league_id = %s AND season = %s
+                        ORDER BY position
+                    ''', (league_id, season))
+                    rows = cur.fetchall()
+                cur.close()
+            return rows
+
+        standings = flights.do(('standings', league_id, season, as_of, round_number), load)
+
         if not standings:
             return jsonify({'success': False, 'error': 'Standings not found'}), 404
-        
-        return jsonify({
+
+        response = {
             'success': True,
             'league_id': league_id,
             'season': season,
             'count': len(standings),
             'data': standings
-        })
+        }
+        if as_of or round_number:
+            response['as_of'] = as_of.isoformat() if as_of else None
+            response['round'] = round_number
+
+        return jsonify(response)
     except Exception as e:
         logger.error(f"Error fetching standings: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -293,37 +340,35 @@ def get_standings(league_id, season):
 def get_teams():
     """Lista times com filtros"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        
-        league_id = request.args.get('league_id')
-        season = request.args.get('season')
-        search = request.args.get('search')
-        
-        query = 'SELECT DISTINCT team_id, team_name FROM teams WHERE 1=1'
-        params = []
-        
-        if league_id:
-            query += ' AND league_id = %s'
-            params.append(league_id)
-        
-        if season:
-            query += ' AND season = %s'
-            params.append(season)
-        
-        if search:
-            query += ' AND team_name ILIKE %s'
-            params.append(f'%{search}%')
-        
-        query += ' ORDER BY team_name'
-        
-        cur.execute(query, params)
-        teams = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+        
+            league_id = request.args.get('league_id')
+            season = request.args.get('season')
+            search = request.args.get('search')
+        
+            query = 'SELECT team_id, team_name FROM teams WHERE 1=1'
+            params = []
+        
+            if league_id:
+                query += ' AND league_id = %s'
+                params.append(league_id)
+        
+            if season:
+                query += ' AND season = %s'
+                params.append(season)
+        
+            if search:
+                # Índice trigram + ranking: nomes mais parecidos primeiro
+                query += ' AND ' + TEAM_NAME_MATCH + TEAM_NAME_RANK
+                params.extend(team_search_params(search))
+                params.append(search)
+            else:
+                query += ' ORDER BY team_name'
+        
+            cur.execute(query, params)
+            teams = cur.fetchall()
+            cur.close()
         
         return jsonify({
             'success': True,
@@ -344,33 +389,29 @@ def search():
         if not query_term:
             return jsonify({'success': False, 'error': 'Query parameter "q" required'}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cur = conn.cursor()
-        results = {}
-        
-        # Buscar times
-        cur.execute('''
-            SELECT DISTINCT team_id, team_name 
-            FROM teams 
-            WHERE team_name ILIKE %s 
-            LIMIT 10
-        ''', (f'%{query_term}%',))
-        results['teams'] = cur.fetchall()
-        
-        # Buscar ligas
-        cur.execute('''
-            SELECT DISTINCT league_id, league_name, country 
-            FROM leagues 
-            WHERE league_name ILIKE %s 
-            LIMIT 10
-        ''', (f'%{query_term}%',))
-        results['leagues'] = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        def load():
+            with get_db_connection() as conn:
+                cur = conn.cursor()
+                found = {}
+            
+                # Buscar times
+                cur.execute(SEARCH_TEAMS_SQL, search_teams_params(query_term))
+                found['teams'] = cur.fetchall()
+            
+                # Buscar ligas
+                cur.execute('''
+                    SELECT DISTINCT league_id, league_name, country 
+                    FROM leagues 
+                    WHERE league_name ILIKE %s 
+                    LIMIT 10
+                ''', (f'%{query_term}%',))
+                found['leagues'] = cur.fetchall()
+            
+                cur.close()
+            return found
+        
+        # ILIKE e similaridade trigram ignoram maiúsculas
+        results = flights.do(('search', query_term.lower()), load)
         
         return jsonify({
             'success': True,
@@ -395,4 +436,7 @@ def internal_error(error):
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8000))
     debug = os.getenv('ENVIRONMENT', 'production') != 'production'
+    # Com gunicorn o aquecimento roda no hook when_ready (gunicorn.conf.py)
+    if warmup.WARMUP_ENABLED:
+        warmup.warm_up(app)
     app.run(host='0.0.0.0', port=port, debug=debug)
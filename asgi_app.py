@@ -0,0 +1,700 @@
+"""
+Football Data REST API - Versão assíncrona (ASGI)
+Mesmas rotas e respostas do api.py, com Quart + asyncpg: consultas
+independentes de uma requisição rodam em paralelo (ex.: /api/search) e
+cada worker atende muitos clientes lentos sem ocupar uma thread por cliente
+
+Execução: uvicorn asgi_app:app --host 0.0.0.0 --port $PORT --workers 2
+"""
+
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+import asyncpg
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import logging
+
+from db_pool import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+from json_provider import make_json_provider
+from match_counts import (
+    COUNT_SQL, ESTIMATE_SQL, ESTIMATE_TABLE_SQL, GENERATION_SQL,
+    TOTAL_ESTIMATE, TOTAL_EXACT, count_cache, plan_rows,
+)
+from pagination import (
+    MATCH_ORDER_BY, MATCH_SEEK, NO_DATE, InvalidCursor, decode_cursor, encode_cursor,
+)
+from queries import MATCH_DETAILS_SQL, InvalidFilter, build_match_filters, decode_stats
+from standings_history import build_standings_query, parse_as_of, parse_round
+from team_search import (
+    SEARCH_MATCHES_SQL, SEARCH_TEAMS_SQL, TEAM_NAME_MATCH, TEAM_NAME_RANK,
+    search_matches_params, search_teams_params, team_search_params,
+)
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+app.json = make_json_provider(app)
+app = cors(app, allow_origin='*')  # Permitir requisições de qualquer origem
+
+# Configuração do banco de dados Neon.tech
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Linhas buscadas por ida ao servidor no cursor do export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+# Máximo de partidas por chamada de /api/matches/batch
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
+# Parâmetros da URL que só a libpq entende (o asyncpg os rejeita)
+LIBPQ_ONLY_PARAMS = {'channel_binding'}
+
+_PLACEHOLDER = re.compile(r'%(%|s)')
+
+pool = None
+
+
+def asyncpg_dsn(url):
+    """Remove da DATABASE_URL os parâmetros que o asyncpg não aceita"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in LIBPQ_ONLY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def to_asyncpg(sql):
+    """Converte os placeholders do psycopg2 (%s, %%) para os do asyncpg ($1, %)"""
+    counter = iter(range(1, 10_000))
+
+    def replace(match):
+        return '%' if match.group(1) == '%' else f'${next(counter)}'
+
+    return _PLACEHOLDER.sub(replace, sql)
+
+
+async def fetch(sql, *params):
+    """Executa uma consulta em uma conexão própria do pool e retorna dicts"""
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        rows = await conn.fetch(to_asyncpg(sql), *params)
+    return [dict(row) for row in rows]
+
+
+async def fetchrow(sql, *params):
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        row = await conn.fetchrow(to_asyncpg(sql), *params)
+    return dict(row) if row else None
+
+
+async def fetchval(sql, *params):
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        return await conn.fetchval(to_asyncpg(sql), *params)
+
+
+@app.before_serving
+async def open_pool():
+    """Cria o pool do worker antes de aceitar requisições"""
+    global pool
+    pool = await asyncpg.create_pool(
+        asyncpg_dsn(DATABASE_URL),
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+    )
+    logger.info(f"Pool asyncpg criado (pid={os.getpid()}, min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+
+
+@app.after_serving
+async def close_pool():
+    await pool.close()
+
+
+def pool_stats():
+    """Estatísticas do pool asyncpg deste worker"""
+    if pool is None:
+        return None
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        'pid': os.getpid(),
+        'minconn': pool.get_min_size(),
+        'maxconn': pool.get_max_size(),
+        'size': size,
+        'idle': idle,
+        'in_use': size - idle,
+    }
+
+
+# ============================================================================
+# ROTAS DE SAÚDE E INFO
+# ============================================================================
+
+@app.route('/')
+async def home():
+    """Endpoint raiz com informações da API"""
+    return jsonify({
+        'name': 'Football Data API',
+        'version': '1.0.0',
+        'status': 'online',
+        'description': 'API REST para dados de futebol',
+        'endpoints': {
+            'health': '/health',
+            'leagues': '/api/leagues',
+            'seasons': '/api/leagues/<league_id>/seasons',
+            'matches': '/api/matches',
+            'match_details': '/api/matches/<match_id>',
+            'matches_export': '/api/matches/export',
+            'matches_batch': '/api/matches/batch?ids=<id1>,<id2>',
+            'standings': '/api/standings/<league_id>/<season>',
+            'teams': '/api/teams',
+            'team_stats': '/api/teams/<team_id>/stats',
+            'search': '/api/search'
+        }
+    })
+
+
+@app.route('/health')
+async def health():
+    """Health check para o Koyeb"""
+    try:
+        await fetchval('SELECT 1')
+
+        return jsonify({
+            'status': 'healthy',
+            'database': 'connected',
+            'pool': pool_stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'database': 'disconnected',
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 503
+
+
+# ============================================================================
+# ROTAS DE LIGAS/CAMPEONATOS
+# ============================================================================
+
+@app.route('/api/leagues', methods=['GET'])
+async def get_leagues():
+    """Retorna todas as ligas disponíveis (query param: country)"""
+    try:
+        country = request.args.get('country')
+
+        if country:
+            leagues = await fetch('''
+                SELECT DISTINCT league_id, league_name, country
+                FROM leagues
+                WHERE country = %s
+                ORDER BY league_name
+            ''', country)
+        else:
+            leagues = await fetch('''
+                SELECT DISTINCT league_id, league_name, country
+                FROM leagues
+                ORDER BY country, league_name
+            ''')
+
+        return jsonify({
+            'success': True,
+            'count': len(leagues),
+            'data': leagues
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar ligas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/leagues/<league_id>/seasons', methods=['GET'])
+async def get_league_seasons(league_id):
+    """Retorna todas as temporadas disponíveis de uma liga"""
+    try:
+        seasons = await fetch('''
+            SELECT DISTINCT season
+            FROM matches
+            WHERE league_id = %s
+            ORDER BY season DESC
+        ''', league_id)
+
+        return jsonify({
+            'success': True,
+            'league_id': league_id,
+            'count': len(seasons),
+            'data': seasons
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar temporadas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================================
+# ROTAS DE PARTIDAS
+# ============================================================================
+
+async def count_matches(filters, params, mode):
+    """Versão assíncrona de match_counts.count_matches (mesmo cache)"""
+    if mode == TOTAL_ESTIMATE:
+        if not filters:
+            return max(await fetchval(ESTIMATE_TABLE_SQL), 0), True
+        plan = await fetchval(ESTIMATE_SQL + filters, *params)
+        return plan_rows(json.loads(plan)), True
+
+    key = (filters, tuple(params), await fetchval(GENERATION_SQL))
+    total = count_cache.get(key)
+    if total is None:
+        total = await fetchval(COUNT_SQL + filters, *params)
+        count_cache.set(key, total)
+    return total, False
+
+
+@app.route('/api/matches', methods=['GET'])
+async def get_matches():
+    """
+    Retorna partidas com filtros (mesmos query params de api.py)
+
+    A página e o total (quando pedido) são buscados em paralelo.
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', '').lower()
+
+        try:
+            filters, params = build_match_filters(request.args)
+        except InvalidFilter as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        query = 'SELECT * FROM matches WHERE 1=1' + filters
+        page_params = list(params)
+
+        if cursor:
+            try:
+                cursor_date, cursor_id = decode_cursor(cursor)
+            except InvalidCursor as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+            # asyncpg codifica date.max como infinity
+            cursor_date = date.max if cursor_date == NO_DATE else date.fromisoformat(cursor_date)
+            page_params.extend([cursor_date, cursor_id])
+            query += MATCH_SEEK
+            offset = 0
+
+        query += MATCH_ORDER_BY + ' LIMIT %s OFFSET %s'
+        page_params.extend([limit + 1, offset])
+
+        tasks = [fetch(query, *page_params)]
+        if include_total in (TOTAL_EXACT, TOTAL_ESTIMATE):
+            tasks.append(count_matches(filters, params, include_total))
+
+        matches, *total = await asyncio.gather(*tasks)
+
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_cursor = encode_cursor(matches[-1])
+
+        response = {
+            'success': True,
+            'count': len(matches),
+            'limit': limit,
+            'offset': offset,
+            'next_cursor': next_cursor,
+            'data': matches
+        }
+        if total:
+            response['total'], response['total_is_estimate'] = total[0]
+
+        return jsonify(response)
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar partidas: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/matches/export', methods=['GET'])
+async def export_matches():
+    """Exporta as partidas dos filtros em streaming (format: ndjson ou csv)"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({
+            'success': False,
+            'error': 'Formato inválido: use ndjson ou csv'
+        }), 400
+
+    try:
+        filters, params = build_match_filters(request.args)
+    except InvalidFilter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    query = to_asyncpg('SELECT * FROM matches WHERE 1=1' + filters + MATCH_ORDER_BY)
+
+    async def generate():
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            async with conn.transaction():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                statement = await conn.prepare(query)
+                if export_format == 'csv':
+                    # Cabeçalho pelas colunas da consulta: sai mesmo sem linhas
+                    writer.writerow(attribute.name for attribute in statement.get_attributes())
+                    yield export_chunk([], export_format, writer, buffer)
+                rows = []
+                async for record in statement.cursor(*params, prefetch=EXPORT_BATCH_SIZE):
+                    rows.append(record)
+                    if len(rows) >= EXPORT_BATCH_SIZE:
+                        yield export_chunk(rows, export_format, writer, buffer)
+                        rows = []
+                if rows:
+                    yield export_chunk(rows, export_format, writer, buffer)
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(generate(), mimetype=mimetype)
+    if export_format == 'csv':
+        response.headers['Content-Disposition'] = 'attachment; filename=matches.csv'
+    return response
+
+
+def export_chunk(rows, export_format, writer, buffer):
+    """Serializa um lote do export"""
+    if export_format == 'csv':
+        writer.writerows(record.values() for record in rows)
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+    return ''.join(app.json.dumps(dict(record)) + '\n' for record in rows)
+
+
+@app.route('/api/matches/batch', methods=['GET', 'POST'])
+async def get_matches_batch():
+    """Várias partidas (com estatísticas) em uma chamada: ?ids=a,b,c ou {"ids": [...]}"""
+    try:
+        if request.method == 'POST':
+            body = await request.get_json(silent=True) or {}
+            if not isinstance(body, dict):
+                return jsonify({
+                    'success': False,
+                    'error': 'Corpo deve ser um objeto JSON: {"ids": [...]}'
+                }), 400
+            ids = body.get('ids') or []
+            if not isinstance(ids, list) or not all(isinstance(match_id, (str, int)) for match_id in ids):
+                return jsonify({
+                    'success': False,
+                    'error': 'Campo "ids" deve ser uma lista de ids'
+                }), 400
+        else:
+            ids = request.args.get('ids', '').split(',')
+
+        ids = list(dict.fromkeys(str(match_id).strip() for match_id in ids if str(match_id).strip()))
+
+        if not ids:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetro "ids" é obrigatório'
+            }), 400
+
+        if len(ids) > BATCH_MAX_IDS:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo de {BATCH_MAX_IDS} ids por requisição'
+            }), 400
+
+        # As duas consultas não dependem uma da outra
+        match_rows, stat_rows = await asyncio.gather(
+            fetch('SELECT * FROM matches WHERE match_id = ANY(%s)', ids),
+            fetch('SELECT * FROM match_stats WHERE match_id = ANY(%s) ORDER BY match_id, id', ids),
+        )
+        matches = {match['match_id']: match for match in match_rows}
+        stats = {match_id: [] for match_id in matches}
+        for stat in stat_rows:
+            if stat['match_id'] in stats:
+                stats[stat['match_id']].append(stat)
+
+        return jsonify({
+            'success': True,
+            'count': len(matches),
+            'not_found': [match_id for match_id in ids if match_id not in matches],
+            'data': [
+                {'match': matches[match_id], 'stats': stats[match_id]}
+                for match_id in ids if match_id in matches
+            ]
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar partidas em lote: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/matches/<match_id>', methods=['GET'])
+async def get_match_details(match_id):
+    """Retorna detalhes completos de uma partida específica"""
+    try:
+        match = await fetchrow(MATCH_DETAILS_SQL, match_id)
+
+        if not match:
+            return jsonify({
+                'success': False,
+                'error': 'Partida não encontrada'
+            }), 404
+
+        stats = decode_stats(match.pop('stats'))
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'match': match,
+                'stats': stats
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar detalhes da partida: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================================
+# ROTAS DE CLASSIFICAÇÃO
+# ============================================================================
+
+@app.route('/api/standings/<league_id>/<season>', methods=['GET'])
+async def get_standings(league_id, season):
+    """Retorna a tabela de classificação (?as_of= / ?round= reconstroem pelas partidas)"""
+    try:
+        as_of = request.args.get('as_of')
+        round_number = request.args.get('round')
+        try:
+            as_of = parse_as_of(as_of) if as_of else None
+            round_number = parse_round(round_number) if round_number else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetros inválidos: as_of deve ser YYYY-MM-DD e round um inteiro positivo'
+            }), 400
+
+        if as_of or round_number:
+            query, params = build_standings_query(league_id, season, as_of, round_number)
+            standings = await fetch(query, *params)
+        else:
+            standings = await fetch('''
+                SELECT * FROM standings
+                WHERE league_id = %s AND season = %s
+                ORDER BY position
+            ''', league_id, season)
+
+        if not standings:
+            return jsonify({
+                'success': False,
+                'error': 'Tabela não encontrada'
+            }), 404
+
+        response = {
+            'success': True,
+            'league_id': league_id,
+            'season': season,
+            'count': len(standings),
+            'data': standings
+        }
+        if as_of or round_number:
+            response['as_of'] = as_of.isoformat() if as_of else None
+            response['round'] = round_number
+
+        return jsonify(response)
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar classificação: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================================
+# ROTAS DE TIMES
+# ============================================================================
+
+@app.route('/api/teams', methods=['GET'])
+async def get_teams():
+    """Retorna lista de times (query params: league_id, season, search)"""
+    try:
+        league_id = request.args.get('league_id')
+        season = request.args.get('season')
+        search = request.args.get('search')
+
+        query = 'SELECT team_id, team_name FROM teams WHERE 1=1'
+        params = []
+
+        if league_id:
+            query += ' AND league_id = %s'
+            params.append(league_id)
+
+        if season:
+            query += ' AND season = %s'
+            params.append(season)
+
+        if search:
+            query += ' AND ' + TEAM_NAME_MATCH + TEAM_NAME_RANK
+            params.extend(team_search_params(search))
+            params.append(search)
+        else:
+            query += ' ORDER BY team_name'
+
+        teams = await fetch(query, *params)
+
+        return jsonify({
+            'success': True,
+            'count': len(teams),
+            'data': teams
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar times: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/teams/<int:team_id>/stats', methods=['GET'])
+async def get_team_stats(team_id):
+    """Retorna estatísticas de um time (query params: season, league_id)"""
+    try:
+        season = request.args.get('season')
+        league_id = request.args.get('league_id')
+
+        query = 'SELECT * FROM team_stats WHERE team_id = %s'
+        params = [team_id]
+
+        if season:
+            query += ' AND season = %s'
+            params.append(season)
+
+        if league_id:
+            query += ' AND league_id = %s'
+            params.append(league_id)
+
+        stats = await fetch(query, *params)
+
+        return jsonify({
+            'success': True,
+            'team_id': team_id,
+            'count': len(stats),
+            'data': stats
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar estatísticas do time: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================================
+# ROTA DE BUSCA
+# ============================================================================
+
+@app.route('/api/search', methods=['GET'])
+async def search():
+    """
+    Busca geral na API (query params: q, type)
+
+    Times, ligas e partidas são buscados em paralelo, cada um em uma
+    conexão do pool: a latência é a da consulta mais lenta, não a soma.
+    """
+    try:
+        query_term = request.args.get('q', '')
+        search_type = request.args.get('type', 'all')
+
+        if not query_term:
+            return jsonify({
+                'success': False,
+                'error': 'Parâmetro de busca "q" é obrigatório'
+            }), 400
+
+        queries = {}
+
+        if search_type in ['all', 'teams']:
+            queries['teams'] = fetch(SEARCH_TEAMS_SQL, *search_teams_params(query_term))
+
+        if search_type in ['all', 'leagues']:
+            queries['leagues'] = fetch('''
+                SELECT DISTINCT league_id, league_name, country
+                FROM leagues
+                WHERE league_name ILIKE %s
+                LIMIT 10
+            ''', f'%{query_term}%')
+
+        if search_type in ['all', 'matches']:
+            queries['matches'] = fetch(SEARCH_MATCHES_SQL, *search_matches_params(query_term))
+
+        results = dict(zip(queries, await asyncio.gather(*queries.values())))
+
+        return jsonify({
+            'success': True,
+            'query': query_term,
+            'results': results
+        })
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ============================================================================
+# TRATAMENTO DE ERROS
+# ============================================================================
+
+@app.errorhandler(404)
+async def not_found(error):
+    return jsonify({
+        'success': False,
+        'error': 'Endpoint não encontrado'
+    }), 404
+
+
+@app.errorhandler(500)
+async def internal_error(error):
+    return jsonify({
+        'success': False,
+        'error': 'Erro interno do servidor'
+    }), 500
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 8000))
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,693 @@
+"""
+Benchmarks de performance da API
+Rode contra um PostgreSQL LOCAL (nunca contra o Neon de produção):
+os dados sintéticos são criados no schema `bench`
+
+Uso:
+    python benchmark.py trigram [n_partidas]        # ILIKE com/sem índices pg_trgm
+    python benchmark.py match_details [latência_ms] # 2 queries vs 1 query com latência de rede
+    python benchmark.py ingest [n_partidas]         # INSERT por linha vs COPY em lotes (populate)
+    python benchmark.py json [iterações]            # encoders JSON (não precisa de banco)
+    python benchmark.py compression [iterações]     # CPU x bytes economizados por endpoint
+    python benchmark.py http <url_flask> <url_asgi> [concorrência]
+                                                    # carga HTTP lado a lado (APIs já rodando)
+    python benchmark.py single_flight <url_api> [concorrência] [requisições]
+                                                    # rajada de requisições idênticas (single-flight)
+    python benchmark.py rate_limit [iterações]      # custo do limite por API key (não precisa de banco)
+"""
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+import os
+import socket
+import statistics
+import sys
+import threading
+import json
+import time
+import timeit
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, time as dtime
+from decimal import Decimal
+from dotenv import load_dotenv
+
+import compression
+from json_provider import PROVIDERS
+from queries import fetch_match_details
+from team_search import (
+    SEARCH_MATCHES_SQL, SEARCH_TEAMS_SQL, TEAM_NAME_MATCH, TEAM_NAME_RANK,
+    search_matches_params, search_teams_params, team_search_params,
+)
+
+load_dotenv()
+
+BENCH_DATABASE_URL = os.getenv('BENCH_DATABASE_URL', 'postgresql://localhost/football_bench')
+BENCH_SCHEMA = 'bench'
+
+CLUBS = [
+    'Flamengo', 'Palmeiras', 'Corinthians', 'São Paulo', 'Fluminense',
+    'Botafogo', 'Vasco da Gama', 'Grêmio', 'Internacional', 'Atlético Mineiro',
+    'Cruzeiro', 'Santos', 'Arsenal', 'Chelsea', 'Liverpool',
+    'Manchester City', 'Real Madrid', 'Barcelona', 'Juventus', 'Bayern Munich',
+]
+
+
+def connect(**kwargs):
+    """Conexão com search_path apontando para o schema de benchmark"""
+    conn = psycopg2.connect(BENCH_DATABASE_URL, cursor_factory=RealDictCursor, **kwargs)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f'CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}')
+    cur.execute(f'SET search_path TO {BENCH_SCHEMA}, public')
+    cur.close()
+    return conn
+
+
+def create_synthetic_data(cur, n_matches, n_teams=5000):
+    """Cria tabelas teams/matches com dados sintéticos no schema bench"""
+    print(f"Gerando {n_teams} times e {n_matches} partidas...")
+    cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    cur.execute('DROP TABLE IF EXISTS match_stats, matches, teams')
+    cur.execute('''
+        CREATE TABLE teams (
+            team_id SERIAL PRIMARY KEY,
+            team_name VARCHAR(200) NOT NULL,
+            league_id VARCHAR(100),
+            season VARCHAR(20)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE matches (
+            match_id VARCHAR(100) PRIMARY KEY,
+            league_id VARCHAR(100),
+            season VARCHAR(20) NOT NULL,
+            match_date DATE,
+            match_time TIME,
+            home_team VARCHAR(200) NOT NULL,
+            away_team VARCHAR(200) NOT NULL,
+            home_score INTEGER,
+            away_score INTEGER,
+            status VARCHAR(50)
+        )
+    ''')
+    # Clubes reais + variações sintéticas ("Flamengo 3f2a1c")
+    cur.execute('INSERT INTO teams (team_name) SELECT unnest(%s::text[])', (CLUBS,))
+    cur.execute('''
+        INSERT INTO teams (team_name)
+        SELECT (%s::text[])[1 + g %% %s] || ' ' || substr(md5(g::text), 1, 6)
+        FROM generate_series(1, %s) g
+    ''', (CLUBS, len(CLUBS), n_teams - len(CLUBS)))
+    cur.execute('''
+        INSERT INTO matches (match_id, league_id, season, match_date,
+                             home_team, away_team, home_score, away_score, status)
+        SELECT 'm' || g,
+               'league_' || (g %% 11),
+               (2022 + g %% 3)::text,
+               DATE '2022-01-01' + (g %% 1000),
+               t.names[1 + (g * 7919) %% t.n],
+               t.names[1 + (g * 104729 + 1) %% t.n],
+               g %% 5, g %% 3, 'finished'
+        FROM generate_series(1, %s) g,
+             (SELECT array_agg(team_name ORDER BY team_id) AS names, count(*) AS n FROM teams) t
+    ''', (n_matches,))
+    cur.execute('CREATE INDEX idx_matches_home ON matches(home_team)')
+    cur.execute('CREATE INDEX idx_matches_away ON matches(away_team)')
+    cur.execute('CREATE INDEX idx_teams_name ON teams(team_name)')
+    cur.execute('ANALYZE teams')
+    cur.execute('ANALYZE matches')
+
+
+def create_match_stats(cur, stats_per_match=20):
+    """Cria match_stats para todas as partidas do schema bench"""
+    cur.execute('DROP TABLE IF EXISTS match_stats')
+    cur.execute('''
+        CREATE TABLE match_stats (
+            id SERIAL PRIMARY KEY,
+            match_id VARCHAR(100) REFERENCES matches(match_id) ON DELETE CASCADE,
+            stat_type VARCHAR(100) NOT NULL,
+            home_value VARCHAR(50),
+            away_value VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        INSERT INTO match_stats (match_id, stat_type, home_value, away_value)
+        SELECT m.match_id, 'stat_' || s, (s * 3 %% 17)::text, (s * 5 %% 13)::text
+        FROM matches m, generate_series(1, %s) s
+    ''', (stats_per_match,))
+    cur.execute('CREATE INDEX idx_match_stats_match ON match_stats(match_id)')
+    cur.execute('ANALYZE match_stats')
+
+
+class LatencyProxy:
+    """
+    Proxy TCP local que atrasa cada pacote em `latency_ms / 2` por sentido,
+    simulando a distância até um banco remoto (ida e volta = latency_ms)
+    """
+
+    def __init__(self, target_host, target_port, latency_ms):
+        self.target = (target_host, target_port)
+        self.delay = latency_ms / 2000
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.server.accept()
+            upstream = socket.create_connection(self.target)
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pump, args=(src, dst), daemon=True).start()
+
+    def _pump(self, src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                time.sleep(self.delay)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (src, dst):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def percentiles(timings):
+    """(p50, p99) em ms"""
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered), p99
+
+
+def time_query(cur, sql, params, repeat=5):
+    """Retorna (mediana em ms, nó raiz do plano)"""
+    cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cur.fetchone()['QUERY PLAN'][0]['Plan']
+    nodes = []
+    node = plan
+    while node:
+        nodes.append(node['Node Type'])
+        node = (node.get('Plans') or [None])[0]
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), ' > '.join(nodes)
+
+
+def bench_trigram(n_matches=1_000_000):
+    """Compara ILIKE sem índice trigram com as consultas ranqueadas + GIN"""
+    conn = connect()
+    cur = conn.cursor()
+    create_synthetic_data(cur, n_matches)
+
+    term = 'flamen'
+    pattern = f'%{term}%'
+    legacy = {
+        'teams?search=': (
+            'SELECT DISTINCT team_id, team_name FROM teams WHERE team_name ILIKE %s ORDER BY team_name',
+            [pattern],
+        ),
+        'search (teams)': (
+            'SELECT DISTINCT team_id, team_name FROM teams WHERE team_name ILIKE %s LIMIT 10',
+            [pattern],
+        ),
+        'search (matches)': (
+            'SELECT * FROM matches WHERE home_team ILIKE %s OR away_team ILIKE %s '
+            'ORDER BY match_date DESC LIMIT 10',
+            [pattern, pattern],
+        ),
+        'matches?team=': (
+            'SELECT * FROM matches WHERE (home_team ILIKE %s OR away_team ILIKE %s) '
+            'ORDER BY match_date DESC LIMIT 100',
+            [pattern, pattern],
+        ),
+    }
+    trigram = {
+        'teams?search=': (
+            'SELECT team_id, team_name FROM teams WHERE ' + TEAM_NAME_MATCH + TEAM_NAME_RANK,
+            team_search_params(term) + [term],
+        ),
+        'search (teams)': (SEARCH_TEAMS_SQL, search_teams_params(term)),
+        'search (matches)': (SEARCH_MATCHES_SQL, search_matches_params(term)),
+        'matches?team=': legacy['matches?team='],
+    }
+
+    results = {}
+    for name, (sql, params) in legacy.items():
+        results[name] = [time_query(cur, sql, params)]
+
+    print("Criando índices GIN gin_trgm_ops...")
+    start = time.perf_counter()
+    cur.execute('CREATE INDEX idx_teams_name_trgm ON teams USING gin (team_name gin_trgm_ops)')
+    cur.execute('CREATE INDEX idx_matches_home_trgm ON matches USING gin (home_team gin_trgm_ops)')
+    cur.execute('CREATE INDEX idx_matches_away_trgm ON matches USING gin (away_team gin_trgm_ops)')
+    cur.execute('ANALYZE matches')
+    print(f"  índices criados em {time.perf_counter() - start:.1f}s")
+
+    for name, (sql, params) in trigram.items():
+        results[name].append(time_query(cur, sql, params))
+
+    cur.execute('SELECT team_name FROM teams WHERE ' + TEAM_NAME_MATCH + TEAM_NAME_RANK + ' LIMIT 1',
+                team_search_params(term) + [term])
+    print(f"\nMelhor resultado para '{term}': {cur.fetchone()['team_name']}")
+
+    print(f"\n{'consulta':<18} {'antes (ms)':>11} {'depois (ms)':>12} {'ganho':>7}  plano depois")
+    for name, ((before, _), (after, plan)) in results.items():
+        print(f"{name:<18} {before:>11.1f} {after:>12.1f} {before / after:>6.1f}x  {plan}")
+
+    cur.close()
+    conn.close()
+
+
+def bench_match_details(latency_ms=20, requests=300):
+    """Detalhes de partida: duas queries (antes) vs LATERAL json_agg (depois)"""
+    conn = connect()
+    cur = conn.cursor()
+    create_synthetic_data(cur, 10_000, n_teams=200)
+    create_match_stats(cur)
+    cur.close()
+    conn.close()
+
+    dsn = psycopg2.extensions.parse_dsn(BENCH_DATABASE_URL)
+    proxy = LatencyProxy(dsn.get('host', 'localhost'), int(dsn.get('port', 5432)), latency_ms)
+    conn = connect(host='127.0.0.1', port=proxy.port, sslmode='disable')
+    conn.autocommit = False
+    cur = conn.cursor()
+    cur.execute(f'SET search_path TO {BENCH_SCHEMA}, public')
+    conn.commit()
+
+    def before(match_id):
+        cur.execute('SELECT * FROM matches WHERE match_id = %s', (match_id,))
+        cur.fetchone()
+        cur.execute('SELECT * FROM match_stats WHERE match_id = %s', (match_id,))
+        cur.fetchall()
+        conn.rollback()
+
+    def after(match_id):
+        fetch_match_details(cur, match_id)
+        conn.rollback()
+
+    print(f"\nLatência injetada: {latency_ms} ms por ida e volta, {requests} requisições")
+    print(f"{'versão':<22} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name, fn in (('2 queries (antes)', before), ('LATERAL json_agg', after)):
+        timings = []
+        for i in range(requests):
+            match_id = f'm{1 + (i * 37) % 10_000}'
+            start = time.perf_counter()
+            fn(match_id)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p99 = percentiles(timings)
+        print(f"{name:<22} {p50:>9.1f} {p99:>9.1f}")
+
+    cur.close()
+    conn.close()
+
+
+def create_ingest_tables(cur):
+    """Tabelas de destino da ingestão (mesmas chaves do create_database.py) no schema bench"""
+    cur.execute('DROP TABLE IF EXISTS match_hashes, match_stats, standings, matches, teams, leagues CASCADE')
+    cur.execute('CREATE TABLE leagues (league_id VARCHAR(100) PRIMARY KEY)')
+    cur.execute('''
+        CREATE TABLE teams (
+            team_id SERIAL PRIMARY KEY,
+            team_name VARCHAR(200) NOT NULL,
+            league_id VARCHAR(100) REFERENCES leagues(league_id),
+            season VARCHAR(20),
+            UNIQUE(team_name, league_id, season)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE matches (
+            match_id VARCHAR(100) PRIMARY KEY,
+            league_id VARCHAR(100) REFERENCES leagues(league_id),
+            season VARCHAR(20) NOT NULL,
+            match_date DATE,
+            match_time TIME,
+            home_team VARCHAR(200) NOT NULL,
+            away_team VARCHAR(200) NOT NULL,
+            home_score INTEGER,
+            away_score INTEGER,
+            status VARCHAR(50),
+            round VARCHAR(100),
+            stadium VARCHAR(200),
+            referee VARCHAR(200),
+            attendance INTEGER
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE match_stats (
+            id SERIAL PRIMARY KEY,
+            match_id VARCHAR(100) REFERENCES matches(match_id) ON DELETE CASCADE,
+            stat_type VARCHAR(100) NOT NULL,
+            home_value VARCHAR(50),
+            away_value VARCHAR(50)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE match_hashes (
+            match_id VARCHAR(100) PRIMARY KEY REFERENCES matches(match_id) ON DELETE CASCADE,
+            content_hash VARCHAR(32) NOT NULL
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE standings (
+            id SERIAL PRIMARY KEY,
+            league_id VARCHAR(100) REFERENCES leagues(league_id),
+            season VARCHAR(20) NOT NULL,
+            team_name VARCHAR(200) NOT NULL,
+            position INTEGER NOT NULL,
+            played INTEGER, wins INTEGER, draws INTEGER, losses INTEGER,
+            goals_for INTEGER, goals_against INTEGER, goal_difference INTEGER, points INTEGER,
+            UNIQUE(league_id, season, team_name)
+        )
+    ''')
+    cur.execute("INSERT INTO leagues VALUES ('brasileirao')")
+
+
+def ingest_rows(n_matches, prefix):
+    """Partidas sintéticas no formato do BulkLoader (uma com data inválida)"""
+    rows = []
+    for i in range(n_matches):
+        home, away = CLUBS[i % len(CLUBS)], CLUBS[(i * 7 + 1) % len(CLUBS)]
+        rows.append((
+            f'{prefix}{i}', 'brasileirao', str(2022 + i % 3),
+            date(2022, 1, 1) + timedelta(days=i % 1000), dtime(16, 0),
+            home, away, i % 5, i % 3, 'finished', f'Rodada {1 + i % 38}',
+            'Maracanã', None, 40000 + i % 1000,
+        ))
+    rows[n_matches // 2] = rows[n_matches // 2][:3] + ('31/02/2023',) + rows[n_matches // 2][4:]
+    return rows
+
+
+def bench_ingest(n_matches=20000):
+    """Ingestão: INSERT + commit por linha (antes) vs COPY + merge em lotes"""
+    from bulk_load import INGEST_BATCH_SIZE, BulkLoader, TeamIds
+
+    conn = connect()
+    cur = conn.cursor()
+    create_ingest_tables(cur)
+    cur.close()
+    conn.autocommit = False
+
+    # Caminho antigo: amostra menor, o resultado é em linhas/s
+    legacy_rows = ingest_rows(min(n_matches, 2000), 'legacy_')
+    cur = conn.cursor()
+    start = time.perf_counter()
+    for row in legacy_rows:
+        try:
+            cur.execute('''
+                INSERT INTO matches (
+                    match_id, league_id, season, match_date, match_time,
+                    home_team, away_team, home_score, away_score,
+                    status, round, stadium, referee, attendance
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (match_id) DO UPDATE SET
+                    home_score = EXCLUDED.home_score,
+                    away_score = EXCLUDED.away_score,
+                    status = EXCLUDED.status
+            ''', row)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+        for team in (row[5], row[6]):
+            cur.execute('''
+                INSERT INTO teams (team_name, league_id, season) VALUES (%s, %s, %s)
+                ON CONFLICT (team_name, league_id, season) DO NOTHING
+                RETURNING team_id
+            ''', (team, row[1], row[2]))
+            if cur.fetchone():
+                conn.commit()
+            else:
+                cur.execute('SELECT team_id FROM teams WHERE team_name = %s AND league_id = %s AND season = %s',
+                            (team, row[1], row[2]))
+                cur.fetchone()
+    before = len(legacy_rows) / (time.perf_counter() - start)
+    cur.close()
+
+    rows = ingest_rows(n_matches, 'bulk_')
+    loader = BulkLoader(conn)
+    team_ids = TeamIds(conn)
+    start = time.perf_counter()
+    for season in ('2022', '2023', '2024'):
+        team_ids.preload('brasileirao', season)
+    for row in rows:
+        loader.add('matches', row)
+        team_ids.get(row[5], row[1], row[2])
+        team_ids.get(row[6], row[1], row[2])
+    team_ids.flush()
+    loader.flush()
+    after = len(rows) / (time.perf_counter() - start)
+    conn.close()
+
+    print(f"\n{n_matches} partidas, lote de {INGEST_BATCH_SIZE} linhas")
+    print(f"{'versão':<26} {'partidas/s':>11}")
+    print(f"{'INSERT + commit por linha':<26} {before:>11.0f}")
+    print(f"{'COPY + merge em lotes':<26} {after:>11.0f}")
+    print(f"ganho: {after / before:.0f}x, linhas descartadas: {loader.stats['matches']['rejected']}")
+
+
+def sample_matches_payload(rows=100):
+    """Payload de /api/matches com `rows` partidas"""
+    return {
+        'success': True,
+        'count': rows,
+        'limit': rows,
+        'offset': 0,
+        'next_cursor': 'WyIyMDIzLTA1LTAxIiwibTEwMCJd',
+        'data': [{
+            'match_id': f'm{i}',
+            'league_id': 'brasileirao',
+            'season': '2023',
+            'match_date': date(2023, 4, 15) + timedelta(days=i % 200),
+            'match_time': dtime(16, 0),
+            'home_team': CLUBS[i % len(CLUBS)],
+            'away_team': CLUBS[(i * 7 + 3) % len(CLUBS)],
+            'home_score': i % 4,
+            'away_score': i % 3,
+            'status': 'finished',
+            'round': f'Rodada {1 + i % 38}',
+            'stadium': 'Maracanã',
+            'referee': 'Anderson Daronco',
+            'attendance': 40_000 + i,
+            'created_at': datetime(2024, 1, 10, 12, 30, i % 60),
+        } for i in range(rows)]
+    }
+
+
+def sample_standings_payload(teams=20):
+    """Payload de /api/standings com a tabela completa e win_rate Decimal"""
+    return {
+        'success': True,
+        'league_id': 'brasileirao',
+        'season': '2023',
+        'count': teams,
+        'data': [{
+            'id': i,
+            'league_id': 'brasileirao',
+            'season': '2023',
+            'team_name': CLUBS[i % len(CLUBS)],
+            'position': i + 1,
+            'played': 38,
+            'wins': 20 - i // 2,
+            'draws': 8,
+            'losses': 10 + i // 2,
+            'goals_for': 60 - i,
+            'goals_against': 30 + i,
+            'goal_difference': 30 - 2 * i,
+            'points': 68 - i,
+            'win_rate': Decimal('0.5263') - Decimal(i) / 100,
+            'created_at': datetime(2024, 1, 10, 12, 30),
+        } for i in range(teams)]
+    }
+
+
+def bench_json(iterations=2000):
+    """Microbenchmark dos encoders JSON com payloads reais da API"""
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+
+    app = Flask('benchmark')
+    encoders = {'flask (padrão)': DefaultJSONProvider(app)}
+    encoders.update({name: provider(app) for name, provider in PROVIDERS.items()})
+    payloads = {
+        '/api/matches (100)': sample_matches_payload(),
+        'standings (20)': sample_standings_payload(),
+    }
+
+    print(f"{'payload':<20} {'encoder':<16} {'µs/resposta':>12} {'bytes':>8}")
+    for payload_name, payload in payloads.items():
+        for encoder_name, encoder in encoders.items():
+            try:
+                size = len(encoder.dumps(payload))
+            except TypeError as e:
+                print(f"{payload_name:<20} {encoder_name:<16} {'falha':>12}  {e}")
+                continue
+            seconds = timeit.timeit(lambda: encoder.dumps(payload), number=iterations)
+            print(f"{payload_name:<20} {encoder_name:<16} {seconds / iterations * 1e6:>12.1f} {size:>8}")
+
+
+def bench_compression(iterations=200):
+    """Custo de CPU e bytes economizados por endpoint e algoritmo"""
+    from flask import Flask
+
+    encoder = PROVIDERS['orjson'](Flask('benchmark'))
+    payloads = {
+        '/api/matches (100)': sample_matches_payload(100),
+        '/api/matches temporada (380)': sample_matches_payload(380),
+        '/api/standings': sample_standings_payload(20),
+    }
+    levels = [('gzip', False), ('gzip', True)]
+    if compression.brotli:
+        levels += [('br', False), ('br', True)]
+    else:
+        print("brotli não instalado: medindo só gzip")
+
+    print(f"{'endpoint':<30} {'algoritmo':<14} {'bytes':>8} {'comprimido':>11} "
+          f"{'economia':>9} {'µs/resp':>9}")
+    for name, payload in payloads.items():
+        body = encoder.dumps(payload).encode()
+        for encoding, cached in levels:
+            data = compression.compress(body, encoding, cached=cached)
+            seconds = timeit.timeit(
+                lambda: compression.compress(body, encoding, cached=cached), number=iterations
+            )
+            label = f"{encoding} ({'cache' if cached else 'dinâmico'})"
+            print(f"{name:<30} {label:<14} {len(body):>8} {len(data):>11} "
+                  f"{1 - len(data) / len(body):>8.0%} {seconds / iterations * 1e6:>9.0f}")
+
+
+def bench_rate_limit(iterations=100000):
+    """Custo por requisição do limitador (µs), isolado e no before_request do Flask"""
+    import tempfile
+    from flask import Flask
+    import rate_limit
+
+    path = os.path.join(tempfile.mkdtemp(), 'ratelimit.bin')
+    limiter = rate_limit.SlidingWindowLimiter(path)
+    rate_limit.limiter = limiter
+    keys = [f'key:{i}' for i in range(5000)]
+
+    cases = {
+        'hit (mesma chave)': lambda: limiter.hit('key:scraper', 10**9),
+        'hit (5000 chaves)': lambda i=iter(range(10**9)): limiter.hit(keys[next(i) % len(keys)], 10**9),
+    }
+    app = Flask('benchmark')
+    rate_limit.API_KEYS['bench'] = 10**9
+    with app.test_request_context('/api/matches', headers={'X-API-Key': 'bench'}):
+        cases['before_request completo'] = rate_limit.check_rate_limit
+
+        print(f"{'caso':<26} {'µs/req':>8}")
+        for name, fn in cases.items():
+            fn()
+            seconds = timeit.timeit(fn, number=iterations)
+            print(f"{name:<26} {seconds / iterations * 1e6:>8.2f}")
+
+
+HTTP_PATHS = [
+    '/api/search?q=flamengo',
+    '/api/matches?league_id=brasileirao&season=2023&limit=100',
+    '/api/standings/brasileirao/2023',
+]
+
+
+def load_test(base_url, paths, concurrency, total_requests):
+    """
+    Gerador de carga: `concurrency` clientes simultâneos dividindo
+    `total_requests` requisições. Retorna (req/s, p50 ms, p99 ms, erros)
+    """
+    def one(i):
+        url = base_url.rstrip('/') + paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                response.read()
+                ok = response.status < 500
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    timings = [ms for ms, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    p50, p99 = percentiles(timings) if timings else (0, 0)
+    return total_requests / elapsed, p50, p99, errors
+
+
+def bench_http(flask_url, asgi_url, concurrency=50, total_requests=2000):
+    """Mesmas rotas no Flask (gunicorn sync) e no ASGI (uvicorn + asyncpg)"""
+    print(f"{concurrency} clientes simultâneos, {total_requests} requisições por API")
+    print(f"{'api':<8} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+    for name, url in (('flask', flask_url), ('asgi', asgi_url)):
+        load_test(url, HTTP_PATHS, concurrency, concurrency)  # aquecimento
+        rps, p50, p99, errors = load_test(url, HTTP_PATHS, concurrency, total_requests)
+        print(f"{name:<8} {rps:>8.0f} {p50:>9.1f} {p99:>9.1f} {errors:>6}")
+
+
+def single_flight_stats(base_url):
+    with urllib.request.urlopen(base_url.rstrip('/') + '/health', timeout=10) as response:
+        return json.load(response).get('single_flight') or {}
+
+
+def bench_single_flight(base_url, concurrency=100, total_requests=1000):
+    """
+    Rajada de requisições idênticas à mesma classificação reconstruída
+
+    Cada URL leva um parâmetro `_` diferente: o cache de respostas não as
+    atende, mas a chave do single-flight (liga, temporada, data) é a mesma.
+    Para ver o agrupamento, rode a API com 1 worker e várias threads
+    (gunicorn api:app --workers 1 --threads 32) e compare com
+    SINGLE_FLIGHT_ENABLED=false.
+    """
+    paths = [
+        f'/api/standings/brasileirao/2023?as_of=2023-08-01&_={i}'
+        for i in range(total_requests)
+    ]
+    before = single_flight_stats(base_url)
+    rps, p50, p99, errors = load_test(base_url, paths, concurrency, total_requests)
+    after = single_flight_stats(base_url)
+
+    executions = after.get('executions', 0) - before.get('executions', 0)
+    shared = after.get('shared', 0) - before.get('shared', 0)
+    timeouts = after.get('timeouts', 0) - before.get('timeouts', 0)
+    print(f"{concurrency} clientes simultâneos, {total_requests} requisições idênticas")
+    print(f"{'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'erros':>6} "
+          f"{'consultas':>10} {'compartilhadas':>15} {'timeouts':>9}")
+    print(f"{rps:>8.0f} {p50:>9.1f} {p99:>9.1f} {errors:>6} "
+          f"{executions:>10} {shared:>15} {timeouts:>9}")
+
+
+BENCHMARKS = {
+    'trigram': bench_trigram,
+    'match_details': bench_match_details,
+    'ingest': bench_ingest,
+    'json': bench_json,
+    'compression': bench_compression,
+    'http': bench_http,
+    'single_flight': bench_single_flight,
+    'rate_limit': bench_rate_limit,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(1)
+    args = [int(a) if a.isdigit() else a for a in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
@@ -0,0 +1,284 @@
+"""
+Carga em lote das tabelas populadas a partir do Flashscore
+As linhas ficam em memória e, a cada INGEST_BATCH_SIZE, vão ao banco por
+COPY para uma tabela temporária e um único INSERT ... SELECT ... ON
+CONFLICT por tabela, com um commit por lote, em vez de um INSERT e um
+commit (fsync no servidor) por linha. Uma linha inválida é isolada por
+bisseção com savepoints e descartada sem desfazer o resto do lote.
+Os team_id ficam em memória (TeamIds): carregados com uma consulta por
+liga/temporada e completados por um INSERT em lote dos times novos
+"""
+
+import io
+import os
+import logging
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Linhas em memória (somando todas as tabelas) antes de gravar um lote
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+
+
+class TableSpec:
+    """Tabela de destino: colunas copiadas, chave de conflito e colunas atualizadas"""
+
+    def __init__(self, table, columns, key=(), update=()):
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self.update = update
+        self.staging = f'bulk_{table}'
+
+    def merge_sql(self):
+        cols = ', '.join(self.columns)
+        sql = f'INSERT INTO {self.table} ({cols}) SELECT {cols} FROM {self.staging}'
+        if self.key and self.update:
+            sets = ', '.join(f'{col} = EXCLUDED.{col}' for col in self.update)
+            sql += f' ON CONFLICT ({", ".join(self.key)}) DO UPDATE SET {sets}'
+        elif self.key:
+            sql += f' ON CONFLICT ({", ".join(self.key)}) DO NOTHING'
+        return sql
+
+    def row_key(self, row):
+        """Chave de deduplicação dentro do lote (a última versão da linha vence)"""
+        if not self.key:
+            return None
+        return tuple(row[self.columns.index(col)] for col in self.key)
+
+
+# Ordem de gravação: matches antes de match_hashes e match_stats (chave estrangeira).
+# Times têm carga própria (TeamIds), que devolve os team_id gerados
+TABLES = (
+    TableSpec(
+        'matches',
+        ('match_id', 'league_id', 'season', 'match_date', 'match_time',
+         'home_team', 'away_team', 'home_score', 'away_score',
+         'status', 'round', 'stadium', 'referee', 'attendance'),
+        key=('match_id',),
+        update=('match_date', 'match_time', 'home_team', 'away_team', 'home_score', 'away_score',
+                'status', 'round', 'stadium', 'referee', 'attendance'),
+    ),
+    TableSpec(
+        'match_hashes',
+        ('match_id', 'content_hash'),
+        key=('match_id',),
+        update=('content_hash',),
+    ),
+    TableSpec(
+        'match_stats',
+        ('match_id', 'stat_type', 'home_value', 'away_value'),
+    ),
+    TableSpec(
+        'standings',
+        ('league_id', 'season', 'team_name', 'position',
+         'played', 'wins', 'draws', 'losses',
+         'goals_for', 'goals_against', 'goal_difference', 'points'),
+        key=('league_id', 'season', 'team_name'),
+        update=('position', 'played', 'wins', 'draws', 'losses',
+                'goals_for', 'goals_against', 'goal_difference', 'points'),
+    ),
+)
+
+# Escape do formato texto do COPY
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_line(row):
+    """Linha no formato texto do COPY (NULL = \\N)"""
+    return '\t'.join(
+        '\\N' if value is None else str(value).translate(COPY_ESCAPES)
+        for value in row
+    ) + '\n'
+
+
+class BulkLoader:
+    """
+    Acumula linhas por tabela e as grava em lotes
+
+    Usa a conexão recebida (e faz commit nela a cada lote); `flush()` no
+    fim da carga grava o que ainda estiver em memória.
+    """
+
+    def __init__(self, conn, batch_size=INGEST_BATCH_SIZE, tables=TABLES):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.specs = {spec.table: spec for spec in tables}
+        self.pending = {spec.table: {} for spec in tables}
+        self.pending_rows = 0
+        self.stats = {spec.table: {'loaded': 0, 'rejected': 0} for spec in tables}
+        self._create_staging()
+
+    def _create_staging(self):
+        """Tabelas temporárias com os tipos do destino, sem NOT NULL (checado no merge)"""
+        with self.conn.cursor() as cur:
+            for spec in self.specs.values():
+                cur.execute(f'''
+                    CREATE TEMP TABLE IF NOT EXISTS {spec.staging} AS
+                    SELECT {', '.join(spec.columns)} FROM {spec.table} WITH NO DATA
+                ''')
+        self.conn.commit()
+
+    def add(self, table, row):
+        """Enfileira uma linha (tupla na ordem de `columns`) e grava se o lote encheu"""
+        spec = self.specs[table]
+        pending = self.pending[table]
+        key = spec.row_key(row)
+        if key is None:
+            key = len(pending)
+        elif key in pending:
+            self.pending_rows -= 1
+        pending[key] = row
+        self.pending_rows += 1
+        if self.pending_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Grava tudo o que está em memória, tabela por tabela, em um commit"""
+        if not self.pending_rows:
+            return
+        with self.conn.cursor() as cur:
+            for table, pending in self.pending.items():
+                if pending:
+                    self._load(cur, self.specs[table], list(pending.values()))
+                    pending.clear()
+        self.conn.commit()
+        self.pending_rows = 0
+
+    def loaded(self, table):
+        """Linhas de `table` gravadas desde a criação do loader (todos os lotes)"""
+        return self.stats[table]['loaded']
+
+    def discard(self):
+        """Descarta as linhas em memória (após um erro que abortou o lote)"""
+        for pending in self.pending.values():
+            pending.clear()
+        self.pending_rows = 0
+
+    def _load(self, cur, spec, rows):
+        """
+        COPY + merge de `rows` dentro de um savepoint
+
+        Se o lote falha, é dividido ao meio e cada metade é tentada de
+        novo; sobra só a linha com problema, que é registrada e descartada.
+        """
+        cur.execute('SAVEPOINT bulk_load')
+        try:
+            cur.execute(f'TRUNCATE {spec.staging}')
+            data = io.StringIO(''.join(copy_line(row) for row in rows))
+            cur.copy_expert(
+                f'COPY {spec.staging} ({", ".join(spec.columns)}) FROM STDIN', data
+            )
+            cur.execute(spec.merge_sql())
+            cur.execute('RELEASE SAVEPOINT bulk_load')
+        except psycopg2.Error as e:
+            cur.execute('ROLLBACK TO SAVEPOINT bulk_load')
+            cur.execute('RELEASE SAVEPOINT bulk_load')
+            if len(rows) == 1:
+                self.stats[spec.table]['rejected'] += 1
+                logger.error(f"Linha descartada em {spec.table} {rows[0]!r}: {str(e).strip()}")
+                return
+            middle = len(rows) // 2
+            self._load(cur, spec, rows[:middle])
+            self._load(cur, spec, rows[middle:])
+            return
+        self.stats[spec.table]['loaded'] += len(rows)
+
+
+class TeamIds:
+    """
+    Mapa (team_name, league_id, season) -> team_id da ingestão
+
+    `preload()` traz os times já gravados de uma liga/temporada em uma
+    consulta; depois disso `get()` não acessa o banco. Times novos ficam
+    pendentes até `flush()`, que os insere todos de uma vez.
+    """
+
+    INSERT_SQL = '''
+        INSERT INTO teams (team_name, league_id, season) VALUES %s
+        ON CONFLICT (team_name, league_id, season) DO NOTHING
+        RETURNING team_name, league_id, season, team_id
+    '''
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {}
+        self.pending = set()
+        self.preloaded = set()
+        self.stats = {'hits': 0, 'inserted': 0, 'rejected': 0}
+
+    def _cursor(self):
+        # Tuplas mesmo em conexões com RealDictCursor como padrão
+        return self.conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+    def preload(self, league_id, season):
+        """Carrega os times já gravados da liga/temporada (uma vez por processo)"""
+        if (league_id, season) in self.preloaded:
+            return
+        with self._cursor() as cur:
+            cur.execute(
+                'SELECT team_name, team_id FROM teams WHERE league_id = %s AND season = %s',
+                (league_id, season)
+            )
+            for team_name, team_id in cur:
+                self.ids[(team_name, league_id, season)] = team_id
+        self.conn.commit()
+        self.preloaded.add((league_id, season))
+
+    def get(self, team_name, league_id, season):
+        """team_id do time; None (e pendente para o próximo flush) se ainda não existe"""
+        key = (team_name, league_id, season)
+        team_id = self.ids.get(key)
+        if team_id is None:
+            self.pending.add(key)
+        else:
+            self.stats['hits'] += 1
+        return team_id
+
+    def flush(self):
+        """Insere os times pendentes em um comando e guarda os ids gerados"""
+        if not self.pending:
+            return
+        rows = sorted(self.pending)
+        self.pending.clear()
+        with self._cursor() as cur:
+            try:
+                returned = execute_values(cur, self.INSERT_SQL, rows, page_size=len(rows), fetch=True)
+            except psycopg2.Error:
+                self.conn.rollback()
+                returned, rows = self._insert_one_by_one(cur, rows)
+            self._remember(returned)
+            # Inseridos por outro processo entre o preload e agora
+            missing = [row for row in rows if row not in self.ids]
+            if missing:
+                cur.execute(
+                    '''SELECT team_name, league_id, season, team_id FROM teams
+                       WHERE (team_name, league_id, season) IN %s''',
+                    (tuple(missing),)
+                )
+                self._remember(cur.fetchall(), inserted=False)
+        self.conn.commit()
+
+    def _remember(self, returned, inserted=True):
+        for team_name, league_id, season, team_id in returned:
+            self.ids[(team_name, league_id, season)] = team_id
+            if inserted:
+                self.stats['inserted'] += 1
+
+    def _insert_one_by_one(self, cur, rows):
+        """Caminho de erro: isola o time inválido sem perder os demais"""
+        returned, valid = [], []
+        for row in rows:
+            cur.execute('SAVEPOINT team_insert')
+            try:
+                returned += execute_values(cur, self.INSERT_SQL, [row], fetch=True)
+            except psycopg2.Error as e:
+                cur.execute('ROLLBACK TO SAVEPOINT team_insert')
+                self.stats['rejected'] += 1
+                logger.error(f"Time descartado {row!r}: {str(e).strip()}")
+                continue
+            cur.execute('RELEASE SAVEPOINT team_insert')
+            valid.append(row)
+        return returned, valid
@@ -0,0 +1,86 @@
+"""
+Compressão das respostas (gzip/brotli) negociada por Accept-Encoding
+Respostas abaixo de COMPRESS_MIN_SIZE bytes seguem sem compressão.
+Entradas do response_cache guardam os bytes já comprimidos, então
+acertos repetidos no cache não comprimem de novo
+"""
+
+from flask import request
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # dependência opcional: sem ela, só gzip
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() != 'false'
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Níveis para respostas dinâmicas (comprimidas a cada requisição) e para
+# entradas do cache (comprimidas uma vez, então vale gastar mais CPU)
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+GZIP_CACHED_LEVEL = int(os.getenv('GZIP_CACHED_LEVEL', 9))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+BROTLI_CACHED_QUALITY = int(os.getenv('BROTLI_CACHED_QUALITY', 9))
+
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain'}
+
+
+def compress(body, encoding, cached=False):
+    """Comprime `body` (bytes) com o encoding dado"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_CACHED_LEVEL if cached else GZIP_LEVEL, mtime=0)
+
+
+def accepted_encoding():
+    """Encoding preferido pela requisição atual, sem olhar o corpo"""
+    if not COMPRESS_ENABLED:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def negotiate(mimetype, size):
+    """Encoding a usar na requisição atual, ou None para enviar sem compressão"""
+    if size < COMPRESS_MIN_SIZE or mimetype not in COMPRESSIBLE_MIMETYPES:
+        return None
+    return accepted_encoding()
+
+
+def set_encoded_body(response, data, encoding):
+    """
+    Substitui o corpo da resposta pela versão comprimida
+
+    Uma ETag forte já definida ganha o sufixo do encoding, já que os
+    bytes enviados são diferentes dos da versão sem compressão.
+    """
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+
+
+def compress_response(response):
+    """after_request: comprime respostas que ainda não foram comprimidas"""
+    if (response.status_code != 200
+            or response.is_streamed
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    encoding = negotiate(response.mimetype, len(body))
+    if encoding:
+        set_encoded_body(response, compress(body, encoding), encoding)
+    else:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_compression(app):
+    """Registra a compressão de respostas no app Flask"""
+    app.after_request(compress_response)
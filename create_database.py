@@ -11,6 +11,72 @@ load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Estatísticas de times calculadas em uma única agregação sobre matches:
+# cada partida com placar vira duas linhas (mandante e visitante) e o
+# GROUP BY soma tudo por time/liga/temporada, com os recortes casa/fora
+TEAM_STATS_SQL = '''
+    SELECT
+        t.team_id,
+        t.team_name,
+        t.league_id,
+        t.season,
+        COUNT(*)::int AS total_matches,
+        COUNT(*) FILTER (WHERE r.goals_for > r.goals_against)::int AS wins,
+        COUNT(*) FILTER (WHERE r.goals_for = r.goals_against)::int AS draws,
+        COUNT(*) FILTER (WHERE r.goals_for < r.goals_against)::int AS losses,
+        SUM(r.goals_for)::int AS goals_for,
+        SUM(r.goals_against)::int AS goals_against,
+        SUM(r.goals_for - r.goals_against)::int AS goal_difference,
+        (3 * COUNT(*) FILTER (WHERE r.goals_for > r.goals_against)
+           + COUNT(*) FILTER (WHERE r.goals_for = r.goals_against))::int AS points,
+        ROUND(COUNT(*) FILTER (WHERE r.goals_for > r.goals_against)::numeric
+              / COUNT(*), 4)::decimal(5,4) AS win_rate,
+        COUNT(*) FILTER (WHERE r.is_home)::int AS home_matches,
+        COUNT(*) FILTER (WHERE r.is_home AND r.goals_for > r.goals_against)::int AS home_wins,
+        COUNT(*) FILTER (WHERE r.is_home AND r.goals_for = r.goals_against)::int AS home_draws,
+        COUNT(*) FILTER (WHERE r.is_home AND r.goals_for < r.goals_against)::int AS home_losses,
+        COALESCE(SUM(r.goals_for) FILTER (WHERE r.is_home), 0)::int AS home_goals_for,
+        COALESCE(SUM(r.goals_against) FILTER (WHERE r.is_home), 0)::int AS home_goals_against,
+        COUNT(*) FILTER (WHERE NOT r.is_home)::int AS away_matches,
+        COUNT(*) FILTER (WHERE NOT r.is_home AND r.goals_for > r.goals_against)::int AS away_wins,
+        COUNT(*) FILTER (WHERE NOT r.is_home AND r.goals_for = r.goals_against)::int AS away_draws,
+        COUNT(*) FILTER (WHERE NOT r.is_home AND r.goals_for < r.goals_against)::int AS away_losses,
+        COALESCE(SUM(r.goals_for) FILTER (WHERE NOT r.is_home), 0)::int AS away_goals_for,
+        COALESCE(SUM(r.goals_against) FILTER (WHERE NOT r.is_home), 0)::int AS away_goals_against,
+        now() AS updated_at
+    FROM (
+        SELECT m.league_id, m.season, side.team_name, side.is_home,
+               side.goals_for, side.goals_against
+        FROM matches m
+        CROSS JOIN LATERAL (VALUES
+            (m.home_team, true, m.home_score, m.away_score),
+            (m.away_team, false, m.away_score, m.home_score)
+        ) AS side(team_name, is_home, goals_for, goals_against)
+        WHERE m.home_score IS NOT NULL AND m.away_score IS NOT NULL
+    ) r
+    JOIN teams t
+      ON t.team_name = r.team_name
+     AND t.league_id = r.league_id
+     AND t.season = r.season
+    GROUP BY t.team_id, t.team_name, t.league_id, t.season
+'''
+
+
+def team_stats_kind(cur):
+    """relkind de team_stats: 'm' (view materializada), 'r' (tabela antiga) ou None"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('team_stats')")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def drop_team_stats(cur):
+    """Remove team_stats, seja a view materializada ou a tabela antiga"""
+    kind = team_stats_kind(cur)
+    if kind == 'm':
+        cur.execute('DROP MATERIALIZED VIEW team_stats CASCADE;')
+    elif kind is not None:
+        cur.execute('DROP TABLE team_stats CASCADE;')
+
 def create_database_schema():
     """Cria todas as tabelas necessárias no banco de dados"""
     
@@ -100,41 +166,88 @@ def create_database_schema():
     ''')
     print("✓ Tabela 'standings' criada")
     
-    # Tabela de Estatísticas de Times
+    # Versão dos dados de cada liga/temporada (ETag da API)
     cur.execute('''
-        CREATE TABLE IF NOT EXISTS team_stats (
-            id SERIAL PRIMARY KEY,
-            team_id INTEGER REFERENCES teams(team_id),
+        CREATE TABLE IF NOT EXISTS data_versions (
             league_id VARCHAR(100) REFERENCES leagues(league_id),
             season VARCHAR(20) NOT NULL,
-            total_matches INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0,
-            draws INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            goals_for INTEGER DEFAULT 0,
-            goals_against INTEGER DEFAULT 0,
-            goal_difference INTEGER DEFAULT 0,
-            win_rate DECIMAL(5,4),
-            home_wins INTEGER DEFAULT 0,
-            away_wins INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(team_id, league_id, season)
+            version BIGINT NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (league_id, season)
+        );
+    ''')
+    print("✓ Tabela 'data_versions' criada")
+    
+    # Progresso da ingestão por liga/temporada (ingestion_state.py)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS ingestion_state (
+            league_id VARCHAR(100) REFERENCES leagues(league_id),
+            season VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            run_started_at TIMESTAMP NOT NULL,
+            last_match_date DATE,
+            matches_seen INTEGER,
+            unfinished_matches INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            PRIMARY KEY (league_id, season)
+        );
+    ''')
+    # Hash do conteúdo de cada partida: a ingestão incremental só regrava o que
+    # mudou (fora de matches para não aparecer nas respostas da API)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS match_hashes (
+            match_id VARCHAR(100) PRIMARY KEY REFERENCES matches(match_id) ON DELETE CASCADE,
+            content_hash VARCHAR(32) NOT NULL
         );
     ''')
-    print("✓ Tabela 'team_stats' criada")
+    print("✓ Tabelas 'ingestion_state' e 'match_hashes' criadas")
     
     # Criar índices para melhor performance
     print("\nCriando índices...")
     
+    # Busca por similaridade de nomes (ILIKE '%termo%' e operador <%)
+    cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    
     cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_league ON matches(league_id);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_season ON matches(season);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(match_date);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_home ON matches(home_team);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_away ON matches(away_team);')
+    # Paginação por cursor: mesma expressão de pagination.MATCH_SORT_KEY.
+    # Os índices antigos (sem data no fim da ordem) não servem mais
+    cur.execute('DROP INDEX IF EXISTS idx_matches_keyset, idx_matches_league_keyset;')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_matches_date_keyset
+        ON matches ((COALESCE(match_date, DATE 'infinity')) DESC, match_id DESC);
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_matches_league_date_keyset
+        ON matches (league_id, season, (COALESCE(match_date, DATE 'infinity')) DESC, match_id DESC);
+    ''')
+    # Estatísticas por partida (LATERAL de MATCH_DETAILS_SQL e ON DELETE CASCADE)
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_match_stats_match ON match_stats(match_id);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_standings_league ON standings(league_id, season);')
     cur.execute('CREATE INDEX IF NOT EXISTS idx_teams_name ON teams(team_name);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_teams_name_trgm ON teams USING gin (team_name gin_trgm_ops);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_home_trgm ON matches USING gin (home_team gin_trgm_ops);')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_matches_away_trgm ON matches USING gin (away_team gin_trgm_ops);')
     
     print("✓ Índices criados")
+
+    # Estatísticas de Times: view materializada atualizada ao fim de cada
+    # população. A tabela team_stats antiga nunca era preenchida, então é
+    # substituída sem perda de dados.
+    if team_stats_kind(cur) not in (None, 'm'):
+        drop_team_stats(cur)
+    cur.execute(f'CREATE MATERIALIZED VIEW IF NOT EXISTS team_stats AS {TEAM_STATS_SQL};')
+    # Índice único: exigido pelo REFRESH ... CONCURRENTLY e usado pela
+    # consulta por team_id da API
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_team_stats_key
+        ON team_stats (team_id, league_id, season);
+    ''')
+    print("✓ View materializada 'team_stats' criada")
     
     conn.commit()
     cur.close()
@@ -147,7 +260,10 @@ def create_database_schema():
     print("  3. matches - Partidas")
     print("  4. match_stats - Estatísticas de partidas")
     print("  5. standings - Classificação")
-    print("  6. team_stats - Estatísticas de times")
+    print("  6. team_stats - Estatísticas de times (view materializada)")
+    print("  7. data_versions - Versões dos dados por liga/temporada")
+    print("  8. ingestion_state - Progresso da ingestão por liga/temporada")
+    print("  9. match_hashes - Hash do conteúdo de cada partida ingerida")
 
 
 def drop_all_tables():
@@ -157,8 +273,11 @@ def drop_all_tables():
     
     print("⚠️  REMOVENDO TODAS AS TABELAS...")
     
+    cur.execute('DROP TABLE IF EXISTS ingestion_state CASCADE;')
+    cur.execute('DROP TABLE IF EXISTS match_hashes CASCADE;')
+    cur.execute('DROP TABLE IF EXISTS data_versions CASCADE;')
     cur.execute('DROP TABLE IF EXISTS match_stats CASCADE;')
-    cur.execute('DROP TABLE IF EXISTS team_stats CASCADE;')
+    drop_team_stats(cur)
     cur.execute('DROP TABLE IF EXISTS standings CASCADE;')
     cur.execute('DROP TABLE IF EXISTS matches CASCADE;')
     cur.execute('DROP TABLE IF EXISTS teams CASCADE;')
@@ -0,0 +1,143 @@
+"""
+ETags e GET condicional a partir da tabela data_versions
+O populate_database.py incrementa a versão de (league_id, season) sempre
+que grava partidas ou classificação. A API usa essa versão para gerar
+ETags fortes e responder 304 a If-None-Match sem rodar a query principal
+"""
+
+from flask import g, make_response, request, Response
+from functools import wraps
+import hashlib
+import threading
+import os
+import time
+import logging
+
+from compression import accepted_encoding
+from response_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+# Por quanto tempo (s) a versão lida do banco é reutilizada pelo worker
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', 5))
+
+# As versões só crescem, então a soma muda a cada escrita em qualquer
+# temporada da liga (e quando surge uma temporada nova)
+VERSION_SQL = '''
+    SELECT COALESCE(SUM(version), 0) AS version
+    FROM data_versions
+    WHERE league_id = %s
+'''
+
+
+def path_scope(league_id, season=None, **kwargs):
+    """Escopo de rotas com liga/temporada na URL"""
+    return league_id, season
+
+
+def query_scope(*args, **kwargs):
+    """Escopo de rotas filtradas por ?league_id= (&season=)"""
+    league_id = request.args.get('league_id')
+    if not league_id:
+        return None
+    return league_id, request.args.get('season') or None
+
+
+class DataVersions:
+    """Lê e guarda por alguns segundos as versões de cada liga/temporada"""
+
+    def __init__(self, get_connection, ttl=DATA_VERSION_TTL):
+        self.get_connection = get_connection
+        self.ttl = ttl
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def current(self, league_id, season=None):
+        """Versão atual do escopo, ou None se não for possível consultar"""
+        key = (league_id, season)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        query = VERSION_SQL
+        params = [league_id]
+        if season:
+            query += ' AND season = %s'
+            params.append(season)
+        try:
+            with self.get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(query, params)
+                version = cur.fetchone()['version']
+                cur.close()
+        except Exception as e:
+            logger.warning(f"Não foi possível ler data_versions: {e}")
+            return None
+
+        with self._lock:
+            self._versions[key] = (version, now + self.ttl)
+        return version
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+
+    def conditional(self, scope):
+        """
+        Decorator que adiciona ETag e responde 304 quando nada mudou
+
+        `scope(*args, **kwargs)` retorna (league_id, season) da requisição
+        ou None para rotas sem escopo de liga. Deve ficar acima de @cached,
+        que usa a versão (em g.data_version) na chave do cache.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                route_scope = scope(*args, **kwargs)
+                version = self.current(*route_scope) if route_scope else None
+                if version is None:
+                    return view(*args, **kwargs)
+
+                g.data_version = version
+                etag = make_etag(version)
+                matched = etag_matches(etag)
+                if matched:
+                    response = Response(status=304)
+                    response.set_etag(matched)
+                    response.vary.add('Accept-Encoding')
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    encoding = response.headers.get('Content-Encoding')
+                    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+                return response
+            return wrapper
+        return decorator
+
+
+def make_etag(version):
+    """ETag forte: versão dos dados + rota e query string normalizada"""
+    digest = hashlib.sha1(repr(cache_key()[:2]).encode()).hexdigest()[:16]
+    return f'v{version}-{digest}'
+
+
+def etag_matches(etag):
+    """
+    ETag de If-None-Match que vale para a requisição atual, ou None
+
+    Vale a ETag sem sufixo (resposta enviada sem compressão) ou a com o
+    sufixo do encoding que esta requisição receberia; o 304 repete a que
+    casou, igual à do 200 que o cliente guardou.
+    """
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    encoding = accepted_encoding()
+    if encoding and if_none_match.contains(f'{etag}-{encoding}'):
+        return f'{etag}-{encoding}'
+    if if_none_match.contains(etag) or if_none_match.star_tag:
+        return etag
+    return None
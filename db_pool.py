@@ -0,0 +1,340 @@
+"""
+Pool de conexões PostgreSQL compartilhado pelas rotas da API
+Um pool por processo (worker do gunicorn) e por servidor (primário e
+réplicas de leitura), criado na primeira requisição
+"""
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN, parse_dsn
+from psycopg2.pool import PoolError
+from contextlib import contextmanager
+import threading
+import os
+import time
+import logging
+
+import slow_queries
+
+logger = logging.getLogger(__name__)
+
+# Configuração do pool (por worker)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+# Conexões ociosas há mais tempo que isso são testadas com SELECT 1 antes do uso
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 30))
+
+
+class QueryStats(threading.local):
+    """Tempo de banco, consultas e linhas lidas pela thread desde o último reset()"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.time = 0.0
+        self.rows = 0
+
+
+# Acumulado da requisição atual (cada requisição roda em uma thread)
+query_stats = QueryStats()
+
+
+class TimedCursor(RealDictCursor):
+    """
+    RealDictCursor que soma em `query_stats` o tempo de execute/fetch e as
+    linhas lidas, e passa cada execute pelo log de consultas lentas
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - start
+            query_stats.time += elapsed
+            query_stats.queries += 1
+            slow_queries.observe(self, query, vars, elapsed)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        query_stats.time += time.perf_counter() - start
+        if row is not None:
+            query_stats.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        query_stats.time += time.perf_counter() - start
+        query_stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        query_stats.time += time.perf_counter() - start
+        query_stats.rows += len(rows)
+        return rows
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do timeout de checkout"""
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexões psycopg2
+
+    - mantém entre `minconn` e `maxconn` conexões abertas
+    - `getconn` espera até `timeout` segundos por uma conexão livre
+    - conexões quebradas são descartadas no checkout e na devolução
+    - `connection()` devolve a conexão ao pool mesmo em caso de exceção
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, ping_after=DB_POOL_PING_AFTER,
+                 cursor_factory=TimedCursor):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.cursor_factory = cursor_factory
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._idle = []       # [(conn, momento em que voltou ao pool)]
+        self._in_use = set()
+        self._closed = False
+
+        self._stats = {
+            'connects': 0,
+            'checkouts': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=self.cursor_factory)
+        with self._lock:
+            self._stats['connects'] += 1
+        return conn
+
+    def _is_broken(self, conn):
+        if conn.closed:
+            return True
+        return conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN
+
+    def _ping(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Empresta uma conexão, esperando até `timeout` segundos por uma vaga"""
+        if self._closed:
+            raise PoolError('connection pool is closed')
+
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(
+                f'Nenhuma conexão livre em {self.timeout}s (max={self.maxconn})'
+            )
+        waited = time.monotonic() - start
+
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._connect()
+                    break
+                conn, returned_at = idle
+                stale = time.monotonic() - returned_at > self.ping_after
+                if self._is_broken(conn) or (stale and not self._ping(conn)):
+                    logger.warning("Conexão quebrada descartada do pool")
+                    self._discard(conn)
+                    conn = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use.add(conn)
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Devolve uma conexão ao pool (ou a descarta se estiver quebrada)"""
+        with self._lock:
+            if conn not in self._in_use:
+                return
+            self._in_use.discard(conn)
+
+        try:
+            if not discard and not self._is_broken(conn):
+                try:
+                    # Não deixar transação aberta entre requisições
+                    if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            if discard or self._closed or self._is_broken(conn):
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão para o bloco `with` e sempre a devolve"""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self):
+        """Estatísticas do pool deste worker"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'pid': self.pid,
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'timeout': self.timeout,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'size': len(self._in_use) + len(self._idle),
+            })
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
+
+    def closeall(self):
+        """Fecha todas as conexões ociosas; as emprestadas fecham ao voltar"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pools = {}          # dsn -> ConnectionPool do processo atual
+_pools_pid = None
+_pool_lock = threading.Lock()
+
+# Contadores somados entre os pools em pool_stats()
+SUMMED_STATS = (
+    'connects', 'checkouts', 'timeouts', 'discarded', 'wait_time_total',
+    'in_use', 'idle', 'size', 'minconn', 'maxconn',
+)
+
+
+def dsn_label(dsn):
+    """
+    host:porta/banco de uma connection string (sem usuário e senha)
+
+    DSN vazia ou None (DATABASE_URL ausente) é válida: o libpq usa as
+    variáveis PG* e os padrões dele, e o rótulo vira 'default'.
+    """
+    if not dsn:
+        return 'default'
+    params = parse_dsn(dsn)
+    return f"{params.get('host', 'localhost')}:{params.get('port', 5432)}/{params.get('dbname', '')}"
+
+
+def get_pool(dsn):
+    """
+    Retorna o pool do processo atual para `dsn`, criando-o se necessário
+
+    Se o processo foi criado por fork (gunicorn com preload), os pools
+    herdados do master são ignorados e novos são abertos no worker.
+    """
+    global _pools, _pools_pid
+    if _pools_pid == os.getpid():
+        pool = _pools.get(dsn)
+        if pool is not None:
+            return pool
+    with _pool_lock:
+        if _pools_pid != os.getpid():
+            _pools = {}
+            _pools_pid = os.getpid()
+        pool = _pools.get(dsn)
+        if pool is None:
+            pool = ConnectionPool(dsn)
+            _pools[dsn] = pool
+            logger.info(
+                f"Pool de conexões criado para {dsn_label(dsn)} (pid={pool.pid}, "
+                f"min={pool.minconn}, max={pool.maxconn})"
+            )
+        return pool
+
+
+def close_pools():
+    """
+    Fecha os pools do processo atual
+
+    Usado no master do gunicorn antes do fork (preload_app): conexões
+    abertas pelo warm-up não devem ser herdadas pelos workers.
+    """
+    global _pools
+    with _pool_lock:
+        pools, _pools = _pools, {}
+    for pool in pools.values():
+        pool.closeall()
+
+
+def pool_stats():
+    """
+    Estatísticas dos pools do processo atual (None se nenhum foi criado)
+
+    Com réplicas de leitura há um pool por servidor: os contadores vêm
+    somados e o detalhe de cada um fica em 'pools'.
+    """
+    if _pools_pid != os.getpid() or not _pools:
+        return None
+    per_pool = {dsn_label(dsn): pool.stats() for dsn, pool in list(_pools.items())}
+    stats = {key: sum(pool[key] for pool in per_pool.values()) for key in SUMMED_STATS}
+    stats['pid'] = os.getpid()
+    stats['wait_time_max'] = max(pool['wait_time_max'] for pool in per_pool.values())
+    stats['wait_time_avg'] = stats['wait_time_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+    stats['pools'] = per_pool
+    return stats
@@ -0,0 +1,47 @@
+"""
+Configuração do gunicorn (carregada automaticamente de ./gunicorn.conf.py)
+As opções da linha de comando do Procfile continuam valendo; aqui ficam só
+os hooks que precisam rodar no processo master
+"""
+
+import os
+import shutil
+import tempfile
+
+# O app é importado uma vez no master: o warm-up (warmup.py, em when_ready)
+# roda antes de criar os workers e o cache aquecido é compartilhado por
+# copy-on-write
+preload_app = True
+
+# Diretório compartilhado das métricas Prometheus: precisa existir antes de
+# o app (e o prometheus_client) ser importado, o que com preload_app
+# acontece logo após a leitura desta configuração. Cada execução começa
+# com o diretório vazio.
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'football_api_metrics'),
+)
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def when_ready(server):
+    """Aquece os caches no master, depois do preload e antes do primeiro fork"""
+    import warmup
+    if warmup.WARMUP_ENABLED:
+        warmup.warm_up(server.app.wsgi())
+
+
+def pre_fork(server, worker):
+    """Conexões abertas pelo warm-up no master não podem ser herdadas"""
+    import db_pool
+    db_pool.close_pools()
+
+
+def child_exit(server, worker):
+    """Tira os gauges do worker encerrado da soma de /metrics"""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
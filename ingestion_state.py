@@ -0,0 +1,127 @@
+"""
+Progresso da ingestão por liga/temporada (tabela ingestion_state)
+Cada execução do populate_database.py marca a liga/temporada como
+'running' ao começar e 'complete' (ou 'failed') ao terminar. Com isso:
+- o modo incremental pula temporadas encerradas, sem jogos pendentes nem
+  recentes, e as demais gravam só as partidas cujo hash mudou;
+- uma execução interrompida deixa linhas 'running' e a próxima retoma a
+  mesma execução, pulando o que ela já tinha concluído
+"""
+
+from datetime import date, timedelta
+import hashlib
+import os
+
+# 'incremental' (padrão) ou 'full' (busca todas as temporadas de novo)
+INGEST_MODE = os.getenv('INGEST_MODE', 'incremental')
+# Temporadas com partidas nos últimos N dias continuam sendo buscadas
+INGEST_RECENT_DAYS = int(os.getenv('INGEST_RECENT_DAYS', 14))
+
+STATE_COLUMNS = (
+    'status', 'run_started_at', 'last_match_date', 'matches_seen',
+    'unfinished_matches', 'updated_at', 'completed_at',
+)
+
+
+def content_hash(values):
+    """md5 dos valores de uma linha: muda se qualquer campo mudar"""
+    text = '\x1f'.join('\\N' if value is None else str(value) for value in values)
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def load_state(cur, league_id, season):
+    """Estado da liga/temporada como dict, ou None se nunca foi ingerida"""
+    cur.execute(f'''
+        SELECT {', '.join(STATE_COLUMNS)} FROM ingestion_state
+        WHERE league_id = %s AND season = %s
+    ''', (league_id, season))
+    row = cur.fetchone()
+    return dict(zip(STATE_COLUMNS, row)) if row else None
+
+
+def interrupted_run(cur):
+    """Início da execução que parou no meio (linhas 'running'), se houver"""
+    cur.execute('''
+        SELECT max(run_started_at) FROM ingestion_state WHERE status = 'running'
+    ''')
+    return cur.fetchone()[0]
+
+
+def finish_run(cur):
+    """
+    Fecha a execução: o que ainda está 'running' (liga removida de LEAGUES,
+    por exemplo) vira 'failed', para a próxima não tentar retomar
+    """
+    cur.execute('''
+        UPDATE ingestion_state SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running'
+    ''')
+
+
+def is_done(state, run_started_at, mode=INGEST_MODE, today=None):
+    """A liga/temporada pode ser pulada nesta execução?"""
+    if state is None or state['status'] != 'complete':
+        return False
+    # Já concluída pela execução que está sendo retomada
+    if state['run_started_at'] == run_started_at:
+        return True
+    if mode != 'incremental':
+        return False
+    today = today or date.today()
+    return (
+        state['unfinished_matches'] == 0
+        and state['last_match_date'] is not None
+        and state['last_match_date'] < today - timedelta(days=INGEST_RECENT_DAYS)
+    )
+
+
+def standings_unchanged(state, changed_matches, mode=INGEST_MODE):
+    """
+    A classificação pode ser reaproveitada? Só no modo incremental, sem
+    partidas alteradas na temporada e se a execução anterior gravou a
+    classificação (status 'complete': falha nela deixa a temporada 'failed')
+    """
+    return (
+        mode == 'incremental'
+        and changed_matches == 0
+        and state is not None
+        and state['status'] == 'complete'
+    )
+
+
+def mark_running(cur, league_id, season, run_started_at):
+    cur.execute('''
+        INSERT INTO ingestion_state (league_id, season, status, run_started_at)
+        VALUES (%s, %s, 'running', %s)
+        ON CONFLICT (league_id, season) DO UPDATE SET
+            status = 'running',
+            run_started_at = EXCLUDED.run_started_at,
+            updated_at = CURRENT_TIMESTAMP
+    ''', (league_id, season, run_started_at))
+
+
+def mark_complete(cur, league_id, season, matches_seen):
+    """Conclui a liga/temporada, com a última data e os jogos ainda sem placar"""
+    cur.execute('''
+        UPDATE ingestion_state s SET
+            status = 'complete',
+            matches_seen = %s,
+            last_match_date = m.last_match_date,
+            unfinished_matches = m.unfinished,
+            updated_at = CURRENT_TIMESTAMP,
+            completed_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT max(match_date) AS last_match_date,
+                   count(*) FILTER (WHERE home_score IS NULL OR away_score IS NULL)::int AS unfinished
+            FROM matches
+            WHERE league_id = %s AND season = %s
+        ) m
+        WHERE s.league_id = %s AND s.season = %s
+    ''', (matches_seen, league_id, season, league_id, season))
+
+
+def mark_failed(cur, league_id, season):
+    cur.execute('''
+        UPDATE ingestion_state SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+        WHERE league_id = %s AND season = %s
+    ''', (league_id, season))
@@ -0,0 +1,88 @@
+"""
+Encoder JSON das respostas da API
+- `orjson` (padrão): serializa date, time, datetime e Decimal nativamente
+- `stdlib`: encoder padrão do Flask, com o mesmo formato de saída
+Escolha por deploy com JSON_ENCODER=orjson|stdlib
+"""
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from datetime import date, time
+from decimal import Decimal
+import os
+import logging
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson').lower()
+
+
+def _default(obj):
+    """Tipos que nenhum dos encoders trata sozinho"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    """Provider do Flask baseado em orjson (datas em ISO 8601, Decimal como número)"""
+
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self.option),
+            mimetype='application/json',
+        )
+
+
+class StdlibProvider(DefaultJSONProvider):
+    """Encoder padrão do Flask, com datas, Decimal e espaçamento iguais aos do orjson"""
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('separators', (',', ':'))
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Sem o '\n' final nem a indentação em debug do Flask
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps(obj), mimetype='application/json')
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, (date, time)):
+            return obj.isoformat()
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return DefaultJSONProvider.default(obj)
+
+
+PROVIDERS = {
+    'orjson': OrjsonProvider,
+    'stdlib': StdlibProvider,
+}
+
+
+def make_json_provider(app, name=JSON_ENCODER):
+    """Cria o provider configurado, caindo para stdlib se orjson não existir"""
+    if name not in PROVIDERS:
+        logger.warning(f"JSON_ENCODER desconhecido '{name}', usando stdlib")
+        name = 'stdlib'
+    if name == 'orjson' and orjson is None:
+        logger.warning("orjson não instalado, usando encoder stdlib")
+        name = 'stdlib'
+    return PROVIDERS[name](app)
@@ -0,0 +1,81 @@
+"""
+Campeonatos coletados do Flashscore
+Compartilhado entre populate_database.py (ingestão) e a API (warm-up)
+"""
+
+from datetime import date
+
+# Configuração dos campeonatos
+LEAGUES = {
+    'brasileirao': {
+        'name': 'Brasileirão Série A',
+        'country': 'brazil',
+        'league_id': 'brasileirao'
+    },
+    'copa_brasil': {
+        'name': 'Copa do Brasil',
+        'country': 'brazil',
+        'league_id': 'copa_brasil'
+    },
+    'paulista': {
+        'name': 'Campeonato Paulista',
+        'country': 'brazil',
+        'league_id': 'paulista'
+    },
+    'carioca': {
+        'name': 'Campeonato Carioca',
+        'country': 'brazil',
+        'league_id': 'carioca'
+    },
+    'premier_league': {
+        'name': 'Premier League',
+        'country': 'england',
+        'league_id': 'premier_league'
+    },
+    'la_liga': {
+        'name': 'La Liga',
+        'country': 'spain',
+        'league_id': 'la_liga'
+    },
+    'serie_a': {
+        'name': 'Serie A',
+        'country': 'italy',
+        'league_id': 'serie_a'
+    },
+    'bundesliga': {
+        'name': 'Bundesliga',
+        'country': 'germany',
+        'league_id': 'bundesliga'
+    },
+    'ligue_1': {
+        'name': 'Ligue 1',
+        'country': 'france',
+        'league_id': 'ligue_1'
+    },
+    'champions_league': {
+        'name': 'UEFA Champions League',
+        'country': 'europe',
+        'league_id': 'champions_league'
+    },
+    'europa_league': {
+        'name': 'UEFA Europa League',
+        'country': 'europe',
+        'league_id': 'europa_league'
+    }
+}
+
+# Campeonatos disputados no ano civil; os demais usam temporada "2023-2024"
+CALENDAR_YEAR_LEAGUES = {'brasileirao', 'copa_brasil', 'paulista', 'carioca'}
+
+
+def season_label(league_key, year):
+    """Temporada no formato gravado no banco ('2023' ou '2023-2024')"""
+    if league_key in CALENDAR_YEAR_LEAGUES:
+        return str(year)
+    return f"{year}-{year+1}"
+
+
+def season_is_current(season, today=None):
+    """A temporada ainda pode mudar? ('2024' ou '2024-2025' até o fim do último ano)"""
+    today = today or date.today()
+    return int(season[-4:]) >= today.year
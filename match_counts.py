@@ -0,0 +1,124 @@
+"""
+Totais de /api/matches sem COUNT(*) por requisição
+- contagens exatas ficam em cache por combinação de filtros e são
+  invalidadas quando a ingestão incrementa alguma versão de data_versions
+- modo estimativa usa as estatísticas do planner (sem varrer a tabela),
+  com ou sem filtros
+"""
+
+from collections import OrderedDict
+import threading
+import os
+import time
+
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 3600))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv('COUNT_CACHE_MAX_ENTRIES', 512))
+
+# Valores aceitos em ?include_total=
+TOTAL_EXACT = 'true'
+TOTAL_ESTIMATE = 'estimate'
+
+
+class CountCache:
+    """Cache LRU de contagens, uma entrada por (filtros, geração da tabela)"""
+
+    def __init__(self, ttl=COUNT_CACHE_TTL, max_entries=COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, total):
+        with self._lock:
+            self._entries[key] = (total, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+# Soma das versões de data_versions. O populate_database.py incrementa a
+# versão da liga/temporada depois de gravar partidas (e as versões só
+# crescem), então a soma serve de chave de invalidação transacional e
+# replicada, sem precisar de um canal entre processos.
+GENERATION_SQL = 'SELECT COALESCE(SUM(version), 0) AS generation FROM data_versions'
+
+ESTIMATE_TABLE_SQL = '''
+    SELECT reltuples::bigint AS estimate
+    FROM pg_class
+    WHERE oid = 'matches'::regclass
+'''
+
+# Recebe os mesmos filtros de COUNT_SQL
+ESTIMATE_SQL = 'EXPLAIN (FORMAT JSON) SELECT 1 FROM matches WHERE 1=1'
+
+COUNT_SQL = 'SELECT COUNT(*) FROM matches WHERE 1=1'
+
+
+def matches_generation(cur):
+    """
+    Geração atual dos dados de partidas
+
+    Lida antes do COUNT(*): uma contagem feita no meio de uma ingestão fica
+    na geração antiga e é descartada quando a versão for incrementada.
+    """
+    cur.execute(GENERATION_SQL)
+    return cur.fetchone()['generation']
+
+
+def plan_rows(plan):
+    """Linhas estimadas de um EXPLAIN (FORMAT JSON)"""
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_matches(cur, filters='', params=()):
+    """
+    Estimativa do planner para os filtros dados
+
+    Sem filtros vem direto de pg_class; com filtros, do EXPLAIN da mesma
+    condição WHERE (a seletividade sai das estatísticas das colunas, então
+    filtros como team com ILIKE podem errar bem mais que league_id).
+    """
+    if not filters:
+        cur.execute(ESTIMATE_TABLE_SQL)
+        return max(cur.fetchone()['estimate'], 0)
+
+    cur.execute(ESTIMATE_SQL + filters, params)
+    return plan_rows(cur.fetchone()['QUERY PLAN'])
+
+
+def count_matches(cur, filters, params, mode=TOTAL_EXACT):
+    """
+    Total de partidas para os filtros dados
+
+    Retorna (total, is_estimate): TOTAL_ESTIMATE sempre responde com a
+    estimativa do planner e TOTAL_EXACT com o COUNT(*) em cache.
+    """
+    if mode == TOTAL_ESTIMATE:
+        return estimate_matches(cur, filters, params), True
+
+    key = (filters, tuple(params), matches_generation(cur))
+    total = count_cache.get(key)
+    if total is None:
+        cur.execute(COUNT_SQL + filters, params)
+        total = cur.fetchone()['count']
+        count_cache.set(key, total)
+    return total, False
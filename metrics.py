@@ -0,0 +1,162 @@
+"""
+Métricas Prometheus da API (GET /metrics)
+Por rota: histogramas de latência, tempo de banco, linhas lidas e bytes
+da resposta, além de contagem por status. Pool e cache entram como gauges.
+
+Com vários workers do gunicorn, defina PROMETHEUS_MULTIPROC_DIR (o
+gunicorn.conf.py já faz isso): cada worker grava seus valores em arquivos
+nesse diretório e /metrics soma todos, seja qual for o worker que responder
+"""
+
+from flask import Response, g, request
+import os
+import time
+import logging
+
+import db_pool
+from response_cache import cache
+from warmup import is_warmup_request
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+        Histogram, generate_latest, multiprocess,
+    )
+except ImportError:  # dependência opcional: sem ela, /metrics não existe
+    multiprocess = None
+    Counter = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 20000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+if Counter is not None:
+    REQUEST_LATENCY = Histogram(
+        'api_request_duration_seconds', 'Latência das requisições',
+        ['route', 'method'], buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS = Counter(
+        'api_requests', 'Requisições por status',
+        ['route', 'method', 'status'],
+    )
+    REQUEST_DB_TIME = Histogram(
+        'api_request_db_seconds', 'Tempo de banco por requisição',
+        ['route'], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_DB_QUERIES = Counter(
+        'api_db_queries', 'Consultas executadas',
+        ['route'],
+    )
+    RESPONSE_ROWS = Histogram(
+        'api_response_rows', 'Linhas lidas do banco por requisição',
+        ['route'], buckets=ROWS_BUCKETS,
+    )
+    RESPONSE_BYTES = Histogram(
+        'api_response_bytes', 'Tamanho do corpo enviado (após compressão)',
+        ['route'], buckets=BYTES_BUCKETS,
+    )
+
+    # Estado do pool/cache de cada worker, somado entre os workers vivos
+    POOL_CONNECTIONS = Gauge(
+        'api_db_pool_connections', 'Conexões do pool por estado',
+        ['state'], multiprocess_mode='livesum',
+    )
+    POOL_EVENTS = Gauge(
+        'api_db_pool_events', 'Eventos acumulados do pool (checkouts, timeouts...)',
+        ['event'], multiprocess_mode='livesum',
+    )
+    CACHE_SIZE = Gauge(
+        'api_cache_size', 'Ocupação do cache de respostas',
+        ['unit'], multiprocess_mode='livesum',
+    )
+    CACHE_EVENTS = Gauge(
+        'api_cache_events', 'Eventos acumulados do cache (hits, misses...)',
+        ['event'], multiprocess_mode='livesum',
+    )
+
+POOL_EVENT_KEYS = ('connects', 'checkouts', 'timeouts', 'discarded')
+CACHE_EVENT_KEYS = ('hits', 'misses', 'expired', 'evictions', 'compressions', 'compressed_hits')
+
+
+def route_label():
+    """Regra da rota (ex.: /api/matches/<match_id>), para não explodir a cardinalidade"""
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def start_request():
+    """before_request: zera os contadores de banco da thread"""
+    if is_warmup_request():
+        return
+    g.metrics_start = time.perf_counter()
+    db_pool.query_stats.reset()
+
+
+def record_request(response):
+    """after_request: registra as métricas da requisição"""
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+
+    route = route_label()
+    stats = db_pool.query_stats
+    REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - start)
+    REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+    REQUEST_DB_TIME.labels(route).observe(stats.time)
+    REQUEST_DB_QUERIES.labels(route).inc(stats.queries)
+    RESPONSE_ROWS.labels(route).observe(stats.rows)
+    # Respostas em streaming (export) não têm tamanho conhecido aqui
+    if not response.is_streamed:
+        RESPONSE_BYTES.labels(route).observe(response.calculate_content_length() or 0)
+
+    update_gauges()
+    return response
+
+
+def update_gauges():
+    """Copia as estatísticas do pool e do cache deste worker para os gauges"""
+    pool = db_pool.pool_stats()
+    if pool:
+        POOL_CONNECTIONS.labels('in_use').set(pool['in_use'])
+        POOL_CONNECTIONS.labels('idle').set(pool['idle'])
+        for key in POOL_EVENT_KEYS:
+            POOL_EVENTS.labels(key).set(pool[key])
+
+    stats = cache.stats()
+    CACHE_SIZE.labels('entries').set(stats['entries'])
+    CACHE_SIZE.labels('bytes').set(stats['bytes'])
+    for key in CACHE_EVENT_KEYS:
+        CACHE_EVENTS.labels(key).set(stats[key])
+
+
+def metrics_view():
+    """Métricas no formato texto do Prometheus (todos os workers)"""
+    update_gauges()
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """
+    Registra a coleta de métricas e a rota /metrics no app Flask
+
+    Deve ser chamado antes de init_compression: os hooks after_request rodam
+    na ordem inversa, e assim os bytes medidos são os já comprimidos.
+    """
+    if not METRICS_ENABLED:
+        return
+    if Counter is None:
+        logger.warning("prometheus_client não instalado: /metrics desativado")
+        return
+    app.before_request(start_request)
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
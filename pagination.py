@@ -0,0 +1,46 @@
+"""
+Paginação por cursor (keyset) para /api/matches
+O cursor é opaco para o cliente e codifica (match_date, match_id) da
+última partida entregue; a próxima página busca direto a partir dele
+"""
+
+import base64
+import json
+from datetime import date
+
+# Chave de ordenação das partidas. Mantém a ordem de sempre de
+# `match_date DESC` (partidas sem data primeiro, como NULLS FIRST) e
+# match_id desempata, então a ordem é total e estável entre páginas.
+# Deve ser idêntica à expressão dos índices idx_matches_*date_keyset.
+MATCH_SORT_KEY = "COALESCE(match_date, DATE 'infinity')"
+MATCH_ORDER_BY = f' ORDER BY {MATCH_SORT_KEY} DESC, match_id DESC'
+MATCH_SEEK = f' AND ({MATCH_SORT_KEY}, match_id) < (%s::date, %s)'
+
+NO_DATE = 'infinity'
+
+
+class InvalidCursor(ValueError):
+    """Cursor malformado ou adulterado"""
+
+
+def encode_cursor(match):
+    """Gera o cursor que aponta para depois de `match`"""
+    match_date = match.get('match_date')
+    if isinstance(match_date, date):
+        match_date = match_date.isoformat()
+    payload = json.dumps([match_date or NO_DATE, match['match_id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retorna (match_date, match_id) para usar com MATCH_SEEK"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        match_date, match_id = json.loads(base64.urlsafe_b64decode(padded))
+        if match_date != NO_DATE:
+            date.fromisoformat(match_date)
+        if not isinstance(match_id, str):
+            raise TypeError(match_id)
+        return match_date, match_id
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Cursor inválido: {cursor}') from e
@@ -1,90 +1,54 @@
 """
 Script para popular o banco de dados PostgreSQL com dados do FlashscoreApi
 Coleta dados de 2022, 2023 e 2024 e insere no Neon.tech
+
+Uso:
+    python populate_database.py          # incremental: só temporadas em andamento/alteradas
+    python populate_database.py --full   # busca todas as temporadas de novo
+    python populate_database.py --offline  # reconstrói tudo só com o cache em disco do Flashscore
 """
 
 from flashscore import Flashscore
 import psycopg2
 import os
+import sys
 from dotenv import load_dotenv
+import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from bulk_load import INGEST_BATCH_SIZE, BulkLoader, TeamIds
+import ingestion_state
+from ingestion_state import INGEST_MODE, content_hash
+from leagues import LEAGUES, season_label
+from upstream import FLASHSCORE_OFFLINE, cache_stats, flashscore_client, upstream_limiter
+
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(threadName)s:%(message)s')
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-# Configuração dos campeonatos
-LEAGUES = {
-    'brasileirao': {
-        'name': 'Brasileirão Série A',
-        'country': 'brazil',
-        'league_id': 'brasileirao'
-    },
-    'copa_brasil': {
-        'name': 'Copa do Brasil',
-        'country': 'brazil',
-        'league_id': 'copa_brasil'
-    },
-    'paulista': {
-        'name': 'Campeonato Paulista',
-        'country': 'brazil',
-        'league_id': 'paulista'
-    },
-    'carioca': {
-        'name': 'Campeonato Carioca',
-        'country': 'brazil',
-        'league_id': 'carioca'
-    },
-    'premier_league': {
-        'name': 'Premier League',
-        'country': 'england',
-        'league_id': 'premier_league'
-    },
-    'la_liga': {
-        'name': 'La Liga',
-        'country': 'spain',
-        'league_id': 'la_liga'
-    },
-    'serie_a': {
-        'name': 'Serie A',
-        'country': 'italy',
-        'league_id': 'serie_a'
-    },
-    'bundesliga': {
-        'name': 'Bundesliga',
-        'country': 'germany',
-        'league_id': 'bundesliga'
-    },
-    'ligue_1': {
-        'name': 'Ligue 1',
-        'country': 'france',
-        'league_id': 'ligue_1'
-    },
-    'champions_league': {
-        'name': 'UEFA Champions League',
-        'country': 'europe',
-        'league_id': 'champions_league'
-    },
-    'europa_league': {
-        'name': 'UEFA Europa League',
-        'country': 'europe',
-        'league_id': 'europa_league'
-    }
-}
+# Ligas/temporadas coletadas ao mesmo tempo (cada uma com sua conexão);
+# o ritmo de requisições ao Flashscore é limitado em upstream.py
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))
 
 
 class DatabasePopulator:
     """Classe para popular o banco de dados com dados do Flashscore"""
     
-    def __init__(self):
-        self.flashscore = Flashscore()
+    def __init__(self, batch_size=INGEST_BATCH_SIZE, offline=FLASHSCORE_OFFLINE):
+        self.batch_size = batch_size
+        self.offline = offline
+        self.flashscore = flashscore_client(Flashscore, offline)
         self.conn = psycopg2.connect(DATABASE_URL)
         self.cur = self.conn.cursor()
+        self.loader = BulkLoader(self.conn, batch_size=batch_size)
+        self.team_ids = TeamIds(self.conn)
+        self.match_hashes = {}
         logger.info("Conexão com banco de dados estabelecida")
     
     def insert_league(self, league_id, league_name, country):
@@ -101,185 +65,136 @@ class DatabasePopulator:
             self.conn.rollback()
     
     def insert_team(self, team_name, league_id, season):
-        """Insere um time no banco de dados"""
-        try:
-            self.cur.execute('''
-                INSERT INTO teams (team_name, league_id, season)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (team_name, league_id, season) DO NOTHING
-                RETURNING team_id
-            ''', (team_name, league_id, season))
-            
-            result = self.cur.fetchone()
-            if result:
-                self.conn.commit()
-                return result[0]
-            else:
-                # Time já existe, buscar ID
-                self.cur.execute('''
-                    SELECT team_id FROM teams
-                    WHERE team_name = %s AND league_id = %s AND season = %s
-                ''', (team_name, league_id, season))
-                result = self.cur.fetchone()
-                return result[0] if result else None
-                
-        except Exception as e:
-            logger.error(f"Erro ao inserir time {team_name}: {e}")
-            self.conn.rollback()
-            return None
+        """
+        Retorna o team_id do time, sem consultar o banco
+        
+        Time novo retorna None e é inserido no próximo lote.
+        """
+        return self.team_ids.get(team_name, league_id, season)
+    
+    def load_match_hashes(self, league_id, season):
+        """Hashes das partidas já gravadas da liga/temporada (uma consulta)"""
+        self.cur.execute('''
+            SELECT h.match_id, h.content_hash
+            FROM match_hashes h
+            JOIN matches m ON m.match_id = h.match_id
+            WHERE m.league_id = %s AND m.season = %s
+        ''', (league_id, season))
+        self.match_hashes.update(self.cur.fetchall())
+        self.conn.commit()
     
     def insert_match(self, match_data):
-        """Insere uma partida no banco de dados"""
-        try:
-            self.cur.execute('''
-                INSERT INTO matches (
-                    match_id, league_id, season, match_date, match_time,
-                    home_team, away_team, home_score, away_score,
-                    status, round, stadium, referee, attendance
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (match_id) DO UPDATE SET
-                    home_score = EXCLUDED.home_score,
-                    away_score = EXCLUDED.away_score,
-                    status = EXCLUDED.status
-            ''', (
-                match_data.get('match_id'),
-                match_data.get('league_id'),
-                match_data.get('season'),
-                match_data.get('date'),
-                match_data.get('time'),
-                match_data.get('home_team'),
-                match_data.get('away_team'),
-                match_data.get('home_score'),
-                match_data.get('away_score'),
-                match_data.get('status'),
-                match_data.get('round'),
-                match_data.get('stadium'),
-                match_data.get('referee'),
-                match_data.get('attendance')
-            ))
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao inserir partida {match_data.get('match_id')}: {e}")
-            self.conn.rollback()
+        """
+        Enfileira uma partida (gravada no próximo lote)
+        
+        Retorna False, sem enfileirar, se o conteúdo é igual ao já gravado.
+        """
+        row = (
+            match_data.get('match_id'),
+            match_data.get('league_id'),
+            match_data.get('season'),
+            match_data.get('date'),
+            match_data.get('time'),
+            match_data.get('home_team'),
+            match_data.get('away_team'),
+            match_data.get('home_score'),
+            match_data.get('away_score'),
+            match_data.get('status'),
+            match_data.get('round'),
+            match_data.get('stadium'),
+            match_data.get('referee'),
+            match_data.get('attendance')
+        )
+        digest = content_hash(row)
+        if self.match_hashes.get(row[0]) == digest:
             return False
+        self.loader.add('matches', row)
+        self.loader.add('match_hashes', (row[0], digest))
+        return True
     
     def insert_match_stats(self, match_id, stats):
-        """Insere estatísticas de uma partida"""
+        """Enfileira as estatísticas de uma partida"""
         if not stats:
             return
         
-        try:
-            for stat_type, values in stats.items():
-                self.cur.execute('''
-                    INSERT INTO match_stats (match_id, stat_type, home_value, away_value)
-                    VALUES (%s, %s, %s, %s)
-                ''', (match_id, stat_type, values.get('home'), values.get('away')))
-            
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Erro ao inserir estatísticas da partida {match_id}: {e}")
-            self.conn.rollback()
+        for stat_type, values in stats.items():
+            self.loader.add('match_stats', (match_id, stat_type, values.get('home'), values.get('away')))
     
     def insert_standings(self, league_id, season, standings_data):
-        """Insere tabela de classificação"""
+        """Enfileira a tabela de classificação"""
+        for position, team_data in enumerate(standings_data, 1):
+            self.loader.add('standings', (
+                league_id, season,
+                team_data.get('team'),
+                position,
+                team_data.get('played', 0),
+                team_data.get('wins', 0),
+                team_data.get('draws', 0),
+                team_data.get('losses', 0),
+                team_data.get('goals_for', 0),
+                team_data.get('goals_against', 0),
+                team_data.get('goal_difference', 0),
+                team_data.get('points', 0)
+            ))
+    
+    def flush(self):
+        """
+        Grava os lotes pendentes (times e demais tabelas)
+        
+        Erros sobem para populate_league_season, que marca a temporada como
+        'failed' para a próxima execução refazê-la.
+        """
+        self.team_ids.flush()
+        self.loader.flush()
+    
+    def bump_data_version(self, league_id, season):
+        """Incrementa a versão dos dados da liga/temporada (invalida ETags da API)"""
         try:
-            for position, team_data in enumerate(standings_data, 1):
-                self.cur.execute('''
-                    INSERT INTO standings (
-                        league_id, season, team_name, position,
-                        played, wins, draws, losses,
-                        goals_for, goals_against, goal_difference, points
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (league_id, season, team_name) DO UPDATE SET
-                        position = EXCLUDED.position,
-                        played = EXCLUDED.played,
-                        wins = EXCLUDED.wins,
-                        draws = EXCLUDED.draws,
-                        losses = EXCLUDED.losses,
-                        goals_for = EXCLUDED.goals_for,
-                        goals_against = EXCLUDED.goals_against,
-                        goal_difference = EXCLUDED.goal_difference,
-                        points = EXCLUDED.points
-                ''', (
-                    league_id, season,
-                    team_data.get('team'),
-                    position,
-                    team_data.get('played', 0),
-                    team_data.get('wins', 0),
-                    team_data.get('draws', 0),
-                    team_data.get('losses', 0),
-                    team_data.get('goals_for', 0),
-                    team_data.get('goals_against', 0),
-                    team_data.get('goal_difference', 0),
-                    team_data.get('points', 0)
-                ))
-            
+            self.cur.execute('''
+                INSERT INTO data_versions (league_id, season)
+                VALUES (%s, %s)
+                ON CONFLICT (league_id, season) DO UPDATE SET
+                    version = data_versions.version + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (league_id, season))
             self.conn.commit()
         except Exception as e:
-            logger.error(f"Erro ao inserir classificação: {e}")
+            logger.error(f"Erro ao atualizar versão de {league_id} {season}: {e}")
             self.conn.rollback()
     
-    def calculate_team_stats(self, team_name, league_id, season):
-        """Calcula estatísticas de um time baseado nas partidas"""
+    def refresh_team_stats(self):
+        """
+        Recalcula team_stats (view materializada) a partir de matches
+        
+        CONCURRENTLY mantém a versão anterior legível pela API enquanto a
+        agregação roda.
+        """
         try:
-            # Buscar partidas do time
-            self.cur.execute('''
-                SELECT * FROM matches
-                WHERE (home_team = %s OR away_team = %s)
-                AND league_id = %s AND season = %s
-            ''', (team_name, team_name, league_id, season))
-            
-            matches = self.cur.fetchall()
-            
-            stats = {
-                'total_matches': 0,
-                'wins': 0,
-                'draws': 0,
-                'losses': 0,
-                'goals_for': 0,
-                'goals_against': 0,
-                'home_wins': 0,
-                'away_wins': 0
-            }
-            
-            for match in matches:
-                stats['total_matches'] += 1
-                
-                # Determinar se é casa ou visitante
-                is_home = match[5] == team_name  # home_team column
-                team_score = match[7] if is_home else match[8]  # home_score or away_score
-                opponent_score = match[8] if is_home else match[7]
-                
-                if team_score is not None and opponent_score is not None:
-                    stats['goals_for'] += team_score
-                    stats['goals_against'] += opponent_score
-                    
-                    if team_score > opponent_score:
-                        stats['wins'] += 1
-                        if is_home:
-                            stats['home_wins'] += 1
-                        else:
-                            stats['away_wins'] += 1
-                    elif team_score == opponent_score:
-                        stats['draws'] += 1
-                    else:
-                        stats['losses'] += 1
-            
-            # Calcular taxa de vitória
-            stats['win_rate'] = stats['wins'] / stats['total_matches'] if stats['total_matches'] > 0 else 0
-            stats['goal_difference'] = stats['goals_for'] - stats['goals_against']
-            
-            return stats
-            
+            start = time.monotonic()
+            self.cur.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY team_stats')
+            self.conn.commit()
+            logger.info(f"✓ Estatísticas de times atualizadas em {time.monotonic() - start:.1f}s")
         except Exception as e:
-            logger.error(f"Erro ao calcular estatísticas do time: {e}")
-            return None
+            logger.error(f"Erro ao atualizar estatísticas de times: {e}")
+            self.conn.rollback()
     
-    def populate_league_season(self, league_key, season):
-        """Popula dados de uma liga/temporada"""
+    def populate_league_season(self, league_key, season, run_started_at=None, mode=INGEST_MODE):
+        """
+        Popula dados de uma liga/temporada
+        
+        O progresso fica em ingestion_state: temporadas que `is_done` considera
+        concluídas são puladas sem nenhuma requisição ao Flashscore, e as
+        partidas com o mesmo hash do que já está gravado não são regravadas.
+        """
         league_info = LEAGUES[league_key]
         league_id = league_info['league_id']
+        run_started_at = run_started_at or datetime.now()
+        
+        state = ingestion_state.load_state(self.cur, league_id, season)
+        self.conn.commit()
+        if ingestion_state.is_done(state, run_started_at, mode):
+            logger.info(f"⏭  {league_info['name']} {season} já concluído, pulando")
+            return
         
         logger.info(f"="*80)
         logger.info(f"Coletando {league_info['name']} - Temporada {season}")
@@ -288,7 +203,17 @@ class DatabasePopulator:
         # Inserir liga
         self.insert_league(league_id, league_info['name'], league_info['country'])
         
+        # Lotes cheios são gravados durante o laço: a contagem da temporada
+        # é a diferença do total gravado, não o último flush
+        loaded_before = self.loader.loaded('matches')
         try:
+            ingestion_state.mark_running(self.cur, league_id, season, run_started_at)
+            self.conn.commit()
+            
+            # Times e hashes das partidas já gravados desta temporada
+            self.team_ids.preload(league_id, season)
+            self.load_match_hashes(league_id, season)
+            
             # Coletar partidas do Flashscore
             logger.info("Coletando partidas...")
             matches = self.flashscore.get_league_matches(
@@ -296,10 +221,11 @@ class DatabasePopulator:
                 season=season
             )
             
-            match_count = 0
-            for match in matches:
+            matches_seen = 0
+            for index, match in enumerate(matches):
+                matches_seen += 1
                 match_data = {
-                    'match_id': getattr(match, 'id', f"{league_id}_{season}_{match_count}"),
+                    'match_id': getattr(match, 'id', f"{league_id}_{season}_{index}"),
                     'league_id': league_id,
                     'season': season,
                     'date': getattr(match, 'date', None),
@@ -315,56 +241,118 @@ class DatabasePopulator:
                     'attendance': getattr(match, 'attendance', None)
                 }
                 
-                # Inserir partida
-                if self.insert_match(match_data):
-                    match_count += 1
-                    
-                    # Inserir times
-                    if match_data['home_team']:
-                        self.insert_team(match_data['home_team'], league_id, season)
-                    if match_data['away_team']:
-                        self.insert_team(match_data['away_team'], league_id, season)
-                
-                # Delay para não sobrecarregar
-                time.sleep(0.5)
+                # Enfileirar partida (se mudou) e times
+                self.insert_match(match_data)
+                if match_data['home_team']:
+                    self.insert_team(match_data['home_team'], league_id, season)
+                if match_data['away_team']:
+                    self.insert_team(match_data['away_team'], league_id, season)
             
-            logger.info(f"✓ {match_count} partidas inseridas")
+            self.flush()
+            match_count = self.loader.loaded('matches') - loaded_before
+            logger.info(f"✓ {match_count} partidas inseridas ou atualizadas, "
+                        f"{matches_seen - match_count} sem alteração")
+            if match_count:
+                self.bump_data_version(league_id, season)
             
-            # Coletar classificação
-            try:
-                logger.info("Coletando classificação...")
-                table = self.flashscore.get_league_table(
-                    league_id=league_id,
-                    season=season
-                )
-                self.insert_standings(league_id, season, table)
-                logger.info("✓ Classificação inserida")
-            except Exception as e:
-                logger.warning(f"Não foi possível coletar classificação: {e}")
+            # Coletar classificação (sem partidas alteradas ela também não mudou)
+            standings_failed = False
+            if ingestion_state.standings_unchanged(state, match_count, mode):
+                logger.info("Classificação sem alteração")
+            else:
+                try:
+                    logger.info("Coletando classificação...")
+                    table = self.flashscore.get_league_table(
+                        league_id=league_id,
+                        season=season
+                    )
+                    self.insert_standings(league_id, season, table)
+                    self.flush()
+                    self.bump_data_version(league_id, season)
+                    logger.info("✓ Classificação inserida")
+                except Exception as e:
+                    logger.warning(f"Não foi possível coletar classificação: {e}")
+                    self.conn.rollback()
+                    self.loader.discard()
+                    standings_failed = True
+            
+            if standings_failed:
+                # Partidas gravadas, mas a temporada volta na próxima execução
+                ingestion_state.mark_failed(self.cur, league_id, season)
+                self.conn.commit()
+                logger.info(f"⚠️  {league_info['name']} {season} sem classificação, será refeito")
+                return
             
+            ingestion_state.mark_complete(self.cur, league_id, season, matches_seen)
+            self.conn.commit()
             logger.info(f"✅ {league_info['name']} {season} concluído!")
             
         except Exception as e:
             logger.error(f"Erro ao coletar {league_key} {season}: {e}")
+            self.conn.rollback()
+            self.loader.discard()
+            try:
+                ingestion_state.mark_failed(self.cur, league_id, season)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+            # Lotes gravados antes do erro já estão no banco: ETags e caches
+            # da API não podem continuar na versão anterior
+            if self.loader.loaded('matches') > loaded_before:
+                self.bump_data_version(league_id, season)
     
-    def populate_all(self, years=[2022, 2023, 2024]):
-        """Popula o banco com todos os campeonatos e anos"""
+    def populate_all(self, years=[2022, 2023, 2024], workers=INGEST_WORKERS, mode=INGEST_MODE):
+        """
+        Popula o banco com todos os campeonatos e anos
+        
+        As ligas/temporadas rodam em `workers` threads, cada uma com seu
+        próprio DatabasePopulator (conexão e lotes); as requisições ao
+        Flashscore seguem o ritmo do token bucket compartilhado. Se a
+        execução anterior foi interrompida, esta a retoma: as ligas/temporadas
+        que ela já tinha concluído são puladas.
+        """
         logger.info("="*80)
-        logger.info("INICIANDO POPULAÇÃO DO BANCO DE DADOS")
+        logger.info(f"INICIANDO POPULAÇÃO DO BANCO DE DADOS (modo {mode})")
         logger.info("="*80)
         
         start_time = datetime.now()
+        run_started_at = ingestion_state.interrupted_run(self.cur)
+        self.conn.commit()
+        if run_started_at:
+            logger.info(f"Retomando a execução interrompida iniciada em {run_started_at}")
+        else:
+            run_started_at = start_time
         
-        for league_key in LEAGUES:
-            for year in years:
-                # Determinar formato da temporada
-                if league_key in ['brasileirao', 'copa_brasil', 'paulista', 'carioca']:
-                    season = str(year)
-                else:
-                    season = f"{year}-{year+1}"
-                
-                self.populate_league_season(league_key, season)
-                time.sleep(2)  # Delay entre ligas
+        jobs = [
+            (league_key, season_label(league_key, year), run_started_at, mode)
+            for league_key in LEAGUES
+            for year in years
+        ]
+        
+        if workers <= 1:
+            for job in jobs:
+                self.populate_league_season(*job)
+        else:
+            local = threading.local()
+            populators = []
+            
+            def run(job):
+                populator = getattr(local, 'populator', None)
+                if populator is None:
+                    populator = local.populator = DatabasePopulator(self.batch_size, self.offline)
+                    populators.append(populator)
+                populator.populate_league_season(*job)
+            
+            try:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as pool:
+                    list(pool.map(run, jobs))
+            finally:
+                for populator in populators:
+                    populator.close()
+        
+        ingestion_state.finish_run(self.cur)
+        self.conn.commit()
+        self.refresh_team_stats()
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -372,6 +360,11 @@ class DatabasePopulator:
         logger.info("="*80)
         logger.info("POPULAÇÃO CONCLUÍDA!")
         logger.info(f"Tempo total: {duration/60:.1f} minutos")
+        logger.info(f"Espera pelo limite do Flashscore: {upstream_limiter.waited/60:.1f} minutos")
+        logger.info(
+            f"Cache do Flashscore: {cache_stats['hits']} respostas do disco, "
+            f"{cache_stats['misses'] + cache_stats['expired']} buscadas ou ausentes"
+        )
         logger.info("="*80)
     
     def close(self):
@@ -382,11 +375,14 @@ class DatabasePopulator:
 
 
 if __name__ == "__main__":
-    populator = DatabasePopulator()
+    offline = FLASHSCORE_OFFLINE or '--offline' in sys.argv
+    populator = DatabasePopulator(offline=offline)
     
     try:
         # Popular banco com dados de 2022, 2023 e 2024
-        populator.populate_all(years=[2022, 2023, 2024])
+        # (offline o cache é a única fonte: reconstrói todas as temporadas)
+        mode = 'full' if '--full' in sys.argv or offline else INGEST_MODE
+        populator.populate_all(years=[2022, 2023, 2024], mode=mode)
     except KeyboardInterrupt:
         logger.warning("\n⚠️  Processo interrompido pelo usuário")
     except Exception as e:
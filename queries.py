@@ -0,0 +1,101 @@
+"""
+Consultas compartilhadas entre app.py, api.py e asgi_app.py
+"""
+
+from datetime import date, datetime
+import json
+
+
+class InvalidFilter(ValueError):
+    """Filtro de partidas com valor inválido (vira 400 nas rotas)"""
+
+
+def parse_date_filter(name, value):
+    """Data YYYY-MM-DD de ?date_from= / ?date_to="""
+    try:
+        return date.fromisoformat(value)
+    except ValueError as e:
+        raise InvalidFilter(f'Data inválida em {name}: {value} (use YYYY-MM-DD)') from e
+
+
+def build_match_filters(args):
+    """
+    Monta as condições WHERE dos filtros de partidas
+    
+    Retorna (sql, params), onde sql começa com ' AND ...' (ou é vazio)
+    para ser concatenado a 'SELECT ... FROM matches WHERE 1=1'.
+    Datas chegam como YYYY-MM-DD e viram `date` (InvalidFilter se inválidas).
+    """
+    league_id = args.get('league_id')
+    season = args.get('season')
+    team = args.get('team')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    
+    filters = ''
+    params = []
+    
+    if league_id:
+        filters += ' AND league_id = %s'
+        params.append(league_id)
+    
+    if season:
+        filters += ' AND season = %s'
+        params.append(season)
+    
+    if team:
+        filters += ' AND (home_team ILIKE %s OR away_team ILIKE %s)'
+        params.extend([f'%{team}%', f'%{team}%'])
+    
+    if date_from:
+        filters += ' AND match_date >= %s'
+        params.append(parse_date_filter('date_from', date_from))
+    
+    if date_to:
+        filters += ' AND match_date <= %s'
+        params.append(parse_date_filter('date_to', date_to))
+    
+    return filters, params
+
+
+# Partida + estatísticas em uma única ida ao banco: as estatísticas vêm
+# agregadas em JSON por um LATERAL, na ordem de inserção
+MATCH_DETAILS_SQL = '''
+    SELECT m.*, COALESCE(s.stats, '[]'::json) AS stats
+    FROM matches m
+    LEFT JOIN LATERAL (
+        SELECT json_agg(ms ORDER BY ms.id) AS stats
+        FROM match_stats ms
+        WHERE ms.match_id = m.match_id
+    ) s ON true
+    WHERE m.match_id = %s
+'''
+
+
+def fetch_match_details(cur, match_id):
+    """
+    Retorna (match, stats) ou (None, None) se a partida não existe
+
+    As estatísticas chegam como JSON e passam por decode_stats.
+    """
+    cur.execute(MATCH_DETAILS_SQL, (match_id,))
+    match = cur.fetchone()
+    if not match:
+        return None, None
+
+    return match, decode_stats(match.pop('stats'))
+
+
+def decode_stats(stats):
+    """
+    Estatísticas agregadas por MATCH_DETAILS_SQL, com created_at como datetime
+
+    psycopg2 entrega o json já decodificado e o asyncpg como texto; nos dois
+    casos o resultado é o mesmo da consulta direta em match_stats.
+    """
+    if isinstance(stats, str):
+        stats = json.loads(stats)
+    for stat in stats:
+        if stat.get('created_at'):
+            stat['created_at'] = datetime.fromisoformat(stat['created_at'])
+    return stats
@@ -0,0 +1,239 @@
+"""
+Limite de requisições por API key (janela deslizante)
+Chaves opcionais no header X-API-Key, cada uma com sua cota por minuto;
+clientes sem chave são contados por IP. Os contadores ficam em um arquivo
+mapeado em memória (mmap) compartilhado pelos workers do gunicorn, com
+trava por bucket (fcntl), então a cota vale para o servidor todo e não
+para cada worker. Acima da cota a resposta é um 429 com Retry-After,
+antes de qualquer acesso ao banco
+"""
+
+from flask import g, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import logging
+
+from warmup import is_warmup_request
+
+logger = logging.getLogger(__name__)
+
+
+def parse_api_keys(value):
+    """'chave1:600,chave2' -> {'chave1': 600, 'chave2': None} (None = cota padrão)"""
+    keys = {}
+    for item in value.replace(' ', '').split(','):
+        if not item:
+            continue
+        key, _, quota = item.partition(':')
+        keys[key] = int(quota) if quota else None
+    return keys
+
+
+API_KEYS = parse_api_keys(os.getenv('API_KEYS', ''))
+# Sem chaves configuradas o limite fica desligado, a não ser que pedido
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true' if API_KEYS else 'false').lower() != 'false'
+API_KEY_REQUIRED = os.getenv('API_KEY_REQUIRED', 'false').lower() == 'true'
+RATE_LIMIT_WINDOW = float(os.getenv('RATE_LIMIT_WINDOW', 60))
+RATE_LIMIT_DEFAULT = int(os.getenv('RATE_LIMIT_DEFAULT', 600))    # por chave, por janela
+RATE_LIMIT_ANONYMOUS = int(os.getenv('RATE_LIMIT_ANONYMOUS', 120))  # por IP, por janela
+RATE_LIMIT_FILE = os.getenv(
+    'RATE_LIMIT_FILE', os.path.join(tempfile.gettempdir(), 'football_api_ratelimit.bin')
+)
+RATE_LIMIT_BUCKETS = int(os.getenv('RATE_LIMIT_BUCKETS', 1024))
+# Proxies confiáveis na frente da API (o do Koyeb): só as entradas de
+# X-Forwarded-For adicionadas por eles identificam o cliente
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 1))
+
+# Rotas fora do limite (monitoramento)
+EXEMPT_PATHS = {'/', '/health', '/metrics'}
+
+# Slot: hash da chave, janela atual, contagem da janela anterior e da atual
+SLOT = struct.Struct('<QqII')
+BUCKET_SLOTS = 8
+BUCKET_BYTES = SLOT.size * BUCKET_SLOTS
+
+
+def key_hash(key):
+    """Hash estável entre processos (hash() do Python muda por processo); 0 = slot vazio"""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SlidingWindowLimiter:
+    """
+    Contador de janela deslizante em um arquivo compartilhado
+
+    A contagem estimada é `anterior * (fração restante da janela anterior)
+    + atual`, o que suaviza a virada de janela sem guardar um timestamp
+    por requisição. Cada bucket tem 8 slots; chave nova em bucket cheio
+    substitui a de janela mais antiga.
+    """
+
+    def __init__(self, path=RATE_LIMIT_FILE, window=RATE_LIMIT_WINDOW, buckets=RATE_LIMIT_BUCKETS):
+        self.path = path
+        self.window = window
+        self.buckets = buckets
+        self.size = buckets * BUCKET_BYTES
+        self.pid = None
+        self._fd = None
+        self._mm = None
+        self._lock = None
+        self._open_lock = threading.Lock()
+
+    def _open(self):
+        """Abre o arquivo no processo atual (travas fcntl são por processo)"""
+        with self._open_lock:
+            if self.pid != os.getpid():
+                self._open_file()
+
+    def _open_file(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size)
+        # fcntl não exclui threads do mesmo processo
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def _find_slot(self, digest, offset):
+        """Offset do slot da chave no bucket (ou do slot a reutilizar) e seu conteúdo"""
+        empty = oldest = None
+        for i in range(BUCKET_SLOTS):
+            slot_offset = offset + i * SLOT.size
+            stored, window_id, prev, curr = SLOT.unpack_from(self._mm, slot_offset)
+            if stored == digest:
+                return slot_offset, window_id, prev, curr
+            if stored == 0:
+                if empty is None:
+                    empty = slot_offset
+            elif oldest is None or window_id < oldest[1]:
+                oldest = (slot_offset, window_id)
+        return (empty if empty is not None else oldest[0]), 0, 0, 0
+
+    def hit(self, key, limit, now=None):
+        """
+        Conta uma requisição de `key` se couber em `limit`
+
+        Retorna (permitida, restantes, retry_after em segundos).
+        """
+        if self.pid != os.getpid():
+            self._open()
+        now = time.time() if now is None else now
+        digest = key_hash(key)
+        offset = (digest % self.buckets) * BUCKET_BYTES
+        current = int(now // self.window)
+
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, BUCKET_BYTES, offset)
+            try:
+                slot_offset, window_id, prev, curr = self._find_slot(digest, offset)
+                if window_id == current - 1:
+                    prev, curr = curr, 0
+                elif window_id != current:
+                    prev, curr = 0, 0
+
+                elapsed = now - current * self.window
+                estimate = prev * (1 - elapsed / self.window) + curr
+                allowed = estimate + 1 <= limit
+                if allowed:
+                    curr += 1
+                SLOT.pack_into(self._mm, slot_offset, digest, current, prev, curr)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, BUCKET_BYTES, offset)
+
+        if allowed:
+            return True, max(int(limit - estimate - 1), 0), 0
+        return False, 0, self.retry_after(now, current, prev, curr, limit)
+
+    def retry_after(self, now, current, prev, curr, limit):
+        """Segundos até a estimativa deixar espaço para mais uma requisição"""
+        window_start = current * self.window
+        if curr + 1 <= limit and prev:
+            # Ainda nesta janela, conforme o peso da anterior diminui
+            fraction = 1 - (limit - 1 - curr) / prev
+            wait = window_start + fraction * self.window - now
+        elif curr:
+            # Só na próxima janela, quando a atual passa a ser a anterior
+            fraction = max(1 - (limit - 1) / curr, 0)
+            wait = window_start + self.window * (1 + fraction) - now
+        else:
+            wait = self.window  # limite 0
+        return max(math.ceil(wait), 1)
+
+
+limiter = SlidingWindowLimiter()
+
+
+def client_identity():
+    """
+    (identidade, cota) do cliente, ou (None, motivo) se deve ser recusado
+
+    Sem chave, o cliente é o IP. Atrás do proxy do Koyeb, o ProxyFix de
+    init_rate_limit põe em remote_addr a entrada de X-Forwarded-For
+    adicionada pelo proxy; as anteriores vêm do cliente e são ignoradas
+    (trocá-las a cada requisição não zera a contagem).
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        if api_key not in API_KEYS:
+            return None, 'API key inválida'
+        quota = API_KEYS[api_key]
+        return f'key:{api_key}', RATE_LIMIT_DEFAULT if quota is None else quota
+    if API_KEY_REQUIRED:
+        return None, 'Header X-API-Key é obrigatório'
+    return f'ip:{request.remote_addr}', RATE_LIMIT_ANONYMOUS
+
+
+def check_rate_limit():
+    """before_request: 401 para chave inválida, 429 acima da cota"""
+    if request.path in EXEMPT_PATHS or request.method == 'OPTIONS' or is_warmup_request():
+        return None
+
+    identity, quota = client_identity()
+    if identity is None:
+        return jsonify({'success': False, 'error': quota}), 401
+
+    allowed, remaining, retry_after = limiter.hit(identity, quota)
+    g.rate_limit = (quota, remaining)
+    if allowed:
+        return None
+
+    response = jsonify({
+        'success': False,
+        'error': f'Limite de {quota} requisições por {RATE_LIMIT_WINDOW:.0f}s excedido'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit_headers(response):
+    """after_request: informa a cota e o que resta dela"""
+    rate_limit = g.pop('rate_limit', None)
+    if rate_limit is not None:
+        response.headers['X-RateLimit-Limit'] = str(rate_limit[0])
+        response.headers['X-RateLimit-Remaining'] = str(rate_limit[1])
+    return response
+
+
+def init_rate_limit(app):
+    """Registra o limite de requisições no app Flask"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    if TRUSTED_PROXY_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+    app.before_request(check_rate_limit)
+    app.after_request(rate_limit_headers)
+    logger.info(
+        f"Limite de requisições ativo: {len(API_KEYS)} chaves, "
+        f"{RATE_LIMIT_ANONYMOUS}/{RATE_LIMIT_WINDOW:.0f}s por IP sem chave"
+    )
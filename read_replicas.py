@@ -0,0 +1,127 @@
+"""
+Roteamento das leituras da API para réplicas (DATABASE_READ_URL)
+As rotas de leitura usam as réplicas em round-robin; uma réplica que falha
+ao conectar ou durante a consulta fica fora da rotação por
+REPLICA_EJECT_SECONDS e, sem réplica saudável, a leitura vai ao primário.
+Assim uma ingestão longa no primário (populate_database.py) não disputa
+recursos com o tráfego da API
+"""
+
+from contextlib import contextmanager
+import itertools
+import threading
+import os
+import time
+import logging
+
+import psycopg2
+
+from db_pool import PoolTimeout, dsn_label, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Uma ou mais connection strings separadas por vírgula ou espaço
+DATABASE_READ_URLS = os.getenv('DATABASE_READ_URL', '').replace(',', ' ').split()
+# Tempo (s) que uma réplica com falha fica fora da rotação
+REPLICA_EJECT_SECONDS = float(os.getenv('REPLICA_EJECT_SECONDS', 30))
+
+# Falhas que indicam servidor indisponível (e não erro na consulta)
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ReplicaRouter:
+    """
+    Escolhe o servidor de cada conexão: réplica saudável ou primário
+
+    `connection(primary=True)` sempre usa o primário, para rotas que
+    precisam ler as próprias escritas (ou dados que a réplica não replica).
+    """
+
+    def __init__(self, primary_dsn, replica_dsns=(), eject_seconds=REPLICA_EJECT_SECONDS):
+        self.primary_dsn = primary_dsn
+        self.replica_dsns = list(replica_dsns)
+        self.eject_seconds = eject_seconds
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._ejected_until = {}  # dsn -> momento em que volta à rotação
+        self._stats = {
+            'primary': 0,
+            'replica': 0,
+            'fallbacks': 0,
+            'ejections': 0,
+        }
+
+    def healthy_replicas(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                dsn for dsn in self.replica_dsns
+                if self._ejected_until.get(dsn, 0) <= now
+            ]
+
+    def eject(self, dsn, error):
+        """Tira a réplica da rotação por `eject_seconds`"""
+        with self._lock:
+            self._ejected_until[dsn] = time.monotonic() + self.eject_seconds
+            self._stats['ejections'] += 1
+        logger.warning(
+            f"Réplica {dsn_label(dsn)} fora da rotação por {self.eject_seconds:.0f}s: {error}"
+        )
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _checkout(self, primary):
+        """Retorna (pool, conn, dsn) da primeira opção disponível"""
+        if not primary and self.replica_dsns:
+            replicas = self.healthy_replicas()
+            if replicas:
+                start = next(self._turn)
+                for i in range(len(replicas)):
+                    dsn = replicas[(start + i) % len(replicas)]
+                    try:
+                        pool = get_pool(dsn)
+                        conn = pool.getconn()
+                    except CONNECTION_ERRORS as e:
+                        self.eject(dsn, e)
+                        continue
+                    except PoolTimeout:
+                        continue  # réplica ocupada, mas saudável
+                    self._count('replica')
+                    return pool, conn, dsn
+            self._count('fallbacks')
+
+        pool = get_pool(self.primary_dsn)
+        conn = pool.getconn()
+        self._count('primary')
+        return pool, conn, self.primary_dsn
+
+    @contextmanager
+    def connection(self, primary=False):
+        """Empresta uma conexão para o bloco `with` e sempre a devolve"""
+        pool, conn, dsn = self._checkout(primary)
+        discard = False
+        try:
+            yield conn
+        except CONNECTION_ERRORS as e:
+            discard = True
+            if dsn != self.primary_dsn:
+                self.eject(dsn, e)
+            raise
+        finally:
+            pool.putconn(conn, discard=discard)
+
+    def stats(self):
+        """Leituras por destino e réplicas fora da rotação"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['replicas'] = {
+                dsn_label(dsn): {
+                    'healthy': self._ejected_until.get(dsn, 0) <= now,
+                    'ejected_for': max(self._ejected_until.get(dsn, 0) - now, 0.0),
+                }
+                for dsn in self.replica_dsns
+            }
+        return stats
@@ -0,0 +1,225 @@
+"""
+Cache de respostas em memória (TTL + LRU) para endpoints de leitura
+Os dados só mudam quando o populate_database.py roda, então respostas de
+ligas, temporadas e classificações podem ser servidas direto da memória.
+Cada entrada guarda também suas versões comprimidas (gzip/brotli)
+"""
+
+from flask import g, request, make_response, Response
+from collections import OrderedDict
+from functools import wraps
+import threading
+import os
+import time
+
+from compression import compress, negotiate, set_encoded_body
+
+# Configuração do cache (por worker)
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() != 'false'
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# TTL por rota (segundos)
+CACHE_TTL_LEAGUES = int(os.getenv('CACHE_TTL_LEAGUES', 3600))
+CACHE_TTL_SEASONS = int(os.getenv('CACHE_TTL_SEASONS', 3600))
+CACHE_TTL_STANDINGS = int(os.getenv('CACHE_TTL_STANDINGS', 600))
+# Classificações reconstruídas (?as_of= / ?round=): a versão dos dados já
+# está na chave, então cada data pode ficar bem mais tempo em memória
+CACHE_TTL_STANDINGS_HISTORY = int(os.getenv('CACHE_TTL_STANDINGS_HISTORY', 6 * 3600))
+
+
+class CacheEntry:
+    """Resposta armazenada no cache"""
+
+    __slots__ = ('body', 'status', 'mimetype', 'headers', 'expires_at', 'encoded')
+
+    def __init__(self, body, status, mimetype, headers, expires_at):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers
+        self.expires_at = expires_at
+        self.encoded = {}  # encoding -> corpo comprimido
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+class ResponseCache:
+    """
+    Cache LRU thread-safe limitado por número de entradas e por bytes
+
+    Cada entrada tem sua própria expiração (TTL por rota).
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'compressions': 0,
+            'compressed_hits': 0,
+        }
+
+    def get(self, key):
+        """Retorna a entrada válida para `key` ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def set(self, key, entry):
+        """Armazena `entry`, removendo as entradas menos usadas se preciso"""
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def encoded_body(self, key, entry, encoding):
+        """
+        Corpo de `entry` comprimido com `encoding`
+
+        Comprime só na primeira vez; as próximas requisições reutilizam os
+        bytes guardados na entrada (que passam a contar no limite de bytes).
+        """
+        data = entry.encoded.get(encoding)
+        if data is not None:
+            with self._lock:
+                self._stats['compressed_hits'] += 1
+            return data
+
+        data = compress(entry.body, encoding, cached=True)
+        with self._lock:
+            if self._entries.get(key) is entry and encoding not in entry.encoded:
+                entry.encoded[encoding] = data
+                self._bytes += len(data)
+                self._evict()
+            self._stats['compressions'] += 1
+        return data
+
+    def _evict(self):
+        """Remove as entradas menos usadas até caber nos limites (com a trava)"""
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        """Remove todas as entradas (ex.: após uma nova ingestão)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Contadores de acerto/erro e ocupação do cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            })
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+cache = ResponseCache()
+
+
+def cache_key():
+    """
+    Chave da requisição atual: rota + query string normalizada
+
+    Inclui a versão dos dados (g.data_version, definida por
+    data_versions.conditional) quando existe, então uma nova ingestão
+    invalida as entradas da liga sem esperar o TTL.
+    """
+    args = tuple(sorted(
+        (name, value)
+        for name, values in request.args.lists()
+        for value in values
+        if value != ''
+    ))
+    return (request.path, args, g.get('data_version'))
+
+
+def cached(ttl):
+    """
+    Decorator que serve a rota do cache por `ttl` segundos
+
+    `ttl` também pode ser uma função sem argumentos, chamada a cada
+    resposta armazenada (TTL que depende da query string).
+    Só respostas 200 são armazenadas; erros sempre vão ao banco.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return view(*args, **kwargs)
+
+            key = cache_key()
+            entry = cache.get(key)
+            if entry is not None:
+                return response_from_entry(key, entry, 'HIT')
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+
+            entry = CacheEntry(
+                body=response.get_data(),
+                status=response.status_code,
+                mimetype=response.mimetype,
+                headers=[
+                    (name, value) for name, value in response.headers
+                    if name.lower() not in ('content-length', 'content-type')
+                ],
+                expires_at=time.monotonic() + (ttl() if callable(ttl) else ttl),
+            )
+            cache.set(key, entry)
+            return response_from_entry(key, entry, 'MISS')
+        return wrapper
+    return decorator
+
+
+def response_from_entry(key, entry, cache_status):
+    """Monta a resposta a partir da entrada, já comprimida se o cliente aceitar"""
+    response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+    response.headers.extend(entry.headers)
+    response.headers['X-Cache'] = cache_status
+
+    encoding = negotiate(entry.mimetype, len(entry.body))
+    if encoding:
+        set_encoded_body(response, cache.encoded_body(key, entry, encoding), encoding)
+    return response
+
+
+def cache_stats():
+    """Estatísticas do cache deste worker"""
+    return cache.stats()
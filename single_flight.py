@@ -0,0 +1,88 @@
+"""
+Single-flight: consultas idênticas e simultâneas rodam uma vez só
+Quando uma página popular é compartilhada, centenas de requisições iguais
+chegam juntas e, antes de o cache ter a resposta, cada uma iria ao banco.
+Aqui a primeira thread (líder) executa a consulta e as demais com a mesma
+chave esperam o resultado dela
+"""
+
+import threading
+import os
+
+# Máximo de segundos que uma thread espera pela líder antes de consultar por conta própria
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 10))
+SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() != 'false'
+
+
+class _Call:
+    """Execução em andamento de uma chave"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas simultâneas com a mesma chave (entre as threads do worker)
+
+    O resultado é compartilhado entre as threads: quem o recebe não deve
+    modificá-lo. Exceções da líder são repassadas às que esperavam.
+    """
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'executions': 0,
+            'shared': 0,
+            'timeouts': 0,
+        }
+
+    def do(self, key, fn):
+        """Retorna fn(), reaproveitando uma execução em andamento de `key`"""
+        if not SINGLE_FLIGHT_ENABLED:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            return fn()
+
+        with self._lock:
+            self._stats['shared'] += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+flights = SingleFlight()
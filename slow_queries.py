@@ -0,0 +1,225 @@
+"""
+Log de consultas lentas em JSON lines
+O TimedCursor (db_pool.py) chama observe() com a duração de cada execute.
+Acima de SLOW_QUERY_MS a consulta é registrada com o SQL normalizado e o
+formato dos parâmetros (tipos, nunca valores). Uma amostra delas ganha um
+EXPLAIN (ANALYZE, BUFFERS), rodado em uma thread separada para não atrasar
+a resposta, com a lista de tabelas lidas por Seq Scan
+"""
+
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+try:
+    from flask import has_request_context, request
+except ImportError:  # scripts de ingestão podem rodar sem Flask
+    has_request_context = None
+
+SLOW_QUERY_ENABLED = os.getenv('SLOW_QUERY_ENABLED', 'true').lower() != 'false'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+# Fração das consultas lentas que recebem EXPLAIN ANALYZE
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', 0.1))
+# No máximo um EXPLAIN por consulta (fingerprint) a cada N segundos
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 300))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 10000))
+SLOW_QUERY_EXPLAIN_QUEUE = int(os.getenv('SLOW_QUERY_EXPLAIN_QUEUE', 16))
+# Arquivo de saída (JSON lines); sem ele, as linhas vão para stderr
+SLOW_QUERY_LOG_FILE = os.getenv('SLOW_QUERY_LOG_FILE')
+
+logger = logging.getLogger(__name__)
+
+slow_log = logging.getLogger('slow_queries')
+slow_log.setLevel(logging.INFO)
+slow_log.propagate = False
+_handler = logging.FileHandler(SLOW_QUERY_LOG_FILE) if SLOW_QUERY_LOG_FILE else logging.StreamHandler()
+_handler.setFormatter(logging.Formatter('%(message)s'))
+slow_log.addHandler(_handler)
+
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def normalize_sql(query):
+    """SQL em uma linha; os valores já ficam fora do texto (placeholders %s)"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    return _WHITESPACE.sub(' ', str(query)).strip()
+
+
+def fingerprint(sql):
+    """Identificador curto da consulta normalizada, para agregar os logs"""
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+def param_shape(value):
+    """Tipo do parâmetro (listas com o tamanho, ex.: list[25])"""
+    if value is None:
+        return 'null'
+    if isinstance(value, (list, tuple)):
+        return f'list[{len(value)}]'
+    return type(value).__name__
+
+
+def param_shapes(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {name: param_shape(value) for name, value in params.items()}
+    return [param_shape(value) for value in params]
+
+
+def current_route():
+    if has_request_context is None or not has_request_context():
+        return None
+    rule = request.url_rule
+    return rule.rule if rule is not None else request.path
+
+
+def write(event, **fields):
+    """Escreve uma linha JSON no log de consultas lentas"""
+    record = {
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'event': event,
+        'pid': os.getpid(),
+    }
+    record.update(fields)
+    slow_log.info(json.dumps(record, default=str, ensure_ascii=False))
+
+
+def seq_scans(plan):
+    """Tabelas lidas por Seq Scan em um plano do EXPLAIN (FORMAT JSON)"""
+    tables = []
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            tables.append(node.get('Relation Name'))
+        nodes.extend(node.get('Plans', []))
+    return sorted(set(tables))
+
+
+class ExplainWorker:
+    """
+    Thread que roda os EXPLAIN ANALYZE amostrados
+
+    A fila é limitada: se o banco estiver lento a ponto de acumular
+    pedidos, os novos são descartados em vez de somar mais carga.
+    """
+
+    def __init__(self, get_connection, max_pending=SLOW_QUERY_EXPLAIN_QUEUE):
+        self.get_connection = get_connection
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._last_explain = {}  # fingerprint -> momento do último EXPLAIN
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='slow-query-explain', daemon=True)
+        self._thread.start()
+
+    def is_worker_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, query, params, digest):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explain.get(digest)
+            if last is not None and now - last < SLOW_QUERY_EXPLAIN_INTERVAL:
+                return
+            self._last_explain[digest] = now
+        try:
+            self._queue.put_nowait((query, params, digest))
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            query, params, digest = self._queue.get()
+            try:
+                self._explain(query, params, digest)
+            except Exception as e:
+                logger.warning(f"EXPLAIN da consulta {digest} falhou: {e}")
+
+    def _explain(self, query, params, digest):
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            # ANALYZE executa a consulta: limitar o tempo e nunca gravar
+            cur.execute('SET TRANSACTION READ ONLY')
+            cur.execute(f'SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}')
+            cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query, params)
+            row = cur.fetchone()
+            cur.close()
+            conn.rollback()
+
+        result = row['QUERY PLAN'][0] if isinstance(row, dict) else row[0][0]
+        plan = result['Plan']
+        write(
+            'slow_query_explain',
+            fingerprint=digest,
+            sql=normalize_sql(query),
+            execution_ms=result.get('Execution Time'),
+            planning_ms=result.get('Planning Time'),
+            seq_scans=seq_scans(plan),
+            shared_read_blocks=plan.get('Shared Read Blocks'),
+            shared_hit_blocks=plan.get('Shared Hit Blocks'),
+            plan=plan,
+        )
+
+
+_explain_connection = None
+_explain_worker = None
+_worker_lock = threading.Lock()
+
+
+def init_explain(get_connection):
+    """Define de onde vêm as conexões dos EXPLAIN (ex.: get_db_connection da API)"""
+    global _explain_connection
+    _explain_connection = get_connection
+
+
+def explain_worker():
+    """Worker de EXPLAIN do processo atual (recriado após fork), ou None"""
+    global _explain_worker
+    if _explain_connection is None:
+        return None
+    worker = _explain_worker
+    if worker is not None and worker.pid == os.getpid():
+        return worker
+    with _worker_lock:
+        if _explain_worker is None or _explain_worker.pid != os.getpid():
+            _explain_worker = ExplainWorker(_explain_connection)
+        return _explain_worker
+
+
+def observe(cursor, query, params, elapsed):
+    """Chamado pelo TimedCursor após cada execute (elapsed em segundos)"""
+    if not SLOW_QUERY_ENABLED or elapsed * 1000 < SLOW_QUERY_MS:
+        return
+
+    worker = explain_worker()
+    if worker is not None and worker.is_worker_thread():
+        return  # o próprio EXPLAIN ANALYZE
+
+    sql = normalize_sql(query)
+    digest = fingerprint(sql)
+    write(
+        'slow_query',
+        duration_ms=round(elapsed * 1000, 2),
+        fingerprint=digest,
+        sql=sql,
+        params=param_shapes(params),
+        rows=cursor.rowcount,
+        route=current_route(),
+    )
+
+    if (worker is not None
+            and getattr(cursor, 'name', None) is None
+            and _EXPLAINABLE.match(sql)
+            and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE):
+        worker.submit(query, params, digest)
@@ -0,0 +1,115 @@
+"""
+Classificação reconstruída a partir das partidas (?as_of= e ?round=)
+A tabela standings guarda só a classificação final raspada do Flashscore;
+aqui a tabela de qualquer data/rodada sai de uma única agregação sobre
+matches, com ROW_NUMBER() aplicando os critérios de desempate da liga
+"""
+
+from flask import request
+from datetime import date
+
+from response_cache import CACHE_TTL_STANDINGS, CACHE_TTL_STANDINGS_HISTORY
+
+# Critérios de desempate depois dos pontos (todos decrescentes); o nome do
+# time fecha a ordenação para que as posições sejam sempre únicas. Só as
+# ligas que fogem do padrão aparecem em TIEBREAKERS
+DEFAULT_TIEBREAKERS = ('goal_difference', 'goals_for', 'wins')
+TIEBREAKERS = {
+    'brasileirao': ('wins', 'goal_difference', 'goals_for'),
+    'paulista': ('wins', 'goal_difference', 'goals_for'),
+    'carioca': ('wins', 'goal_difference', 'goals_for'),
+}
+
+# Toda partida da temporada entra no CTE, para que times ainda sem jogos
+# na data pedida apareçam zerados; só as que passam no filtro (`counted`)
+# somam nos agregados
+STANDINGS_AS_OF_SQL = '''
+    WITH results AS (
+        SELECT side.team_name, side.goals_for, side.goals_against,
+               (m.home_score IS NOT NULL AND m.away_score IS NOT NULL{filters}) AS counted
+        FROM matches m
+        CROSS JOIN LATERAL (VALUES
+            (m.home_team, m.home_score, m.away_score),
+            (m.away_team, m.away_score, m.home_score)
+        ) AS side(team_name, goals_for, goals_against)
+        WHERE m.league_id = %s AND m.season = %s AND side.team_name IS NOT NULL
+    ),
+    totals AS (
+        SELECT
+            team_name,
+            COUNT(*) FILTER (WHERE counted)::int AS played,
+            COUNT(*) FILTER (WHERE counted AND goals_for > goals_against)::int AS wins,
+            COUNT(*) FILTER (WHERE counted AND goals_for = goals_against)::int AS draws,
+            COUNT(*) FILTER (WHERE counted AND goals_for < goals_against)::int AS losses,
+            COALESCE(SUM(goals_for) FILTER (WHERE counted), 0)::int AS goals_for,
+            COALESCE(SUM(goals_against) FILTER (WHERE counted), 0)::int AS goals_against
+        FROM results
+        GROUP BY team_name
+    ),
+    scored AS (
+        SELECT totals.*,
+               goals_for - goals_against AS goal_difference,
+               3 * wins + draws AS points
+        FROM totals
+    )
+    SELECT ROW_NUMBER() OVER (ORDER BY {order_by})::int AS position,
+           team_name, played, wins, draws, losses,
+           goals_for, goals_against, goal_difference, points
+    FROM scored
+    ORDER BY position
+'''
+
+# Número da rodada dentro do texto do Flashscore ("Round 12", "Rodada 12")
+ROUND_NUMBER = "substring(m.round from '[0-9]+')::int"
+
+
+def parse_round(value):
+    """Número da rodada de ?round= (ValueError se não for inteiro positivo)"""
+    number = int(value)
+    if number < 1:
+        raise ValueError('round deve ser maior que zero')
+    return number
+
+
+def parse_as_of(value):
+    """Data de ?as_of= (YYYY-MM-DD, ValueError se inválida)"""
+    return date.fromisoformat(value)
+
+
+def standings_cache_ttl():
+    """TTL do cache de /api/standings: maior para classificações reconstruídas"""
+    if request.args.get('as_of') or request.args.get('round'):
+        return CACHE_TTL_STANDINGS_HISTORY
+    return CACHE_TTL_STANDINGS
+
+
+def standings_order_by(league_id):
+    """ORDER BY da classificação com os desempates da liga"""
+    columns = ('points',) + TIEBREAKERS.get(league_id, DEFAULT_TIEBREAKERS)
+    return ', '.join(f'{column} DESC' for column in columns) + ', team_name'
+
+
+def build_standings_query(league_id, season, as_of=None, round_number=None):
+    """
+    Monta (sql, params) da classificação até `as_of` e/ou `round_number`
+
+    `as_of` é um `date`; partidas sem data não entram quando ele é usado.
+    """
+    filters = ''
+    filter_params = []
+    if as_of is not None:
+        filters += ' AND m.match_date <= %s'
+        filter_params.append(as_of)
+    if round_number is not None:
+        filters += f' AND {ROUND_NUMBER} <= %s'
+        filter_params.append(round_number)
+
+    query = STANDINGS_AS_OF_SQL.format(filters=filters, order_by=standings_order_by(league_id))
+    return query, filter_params + [league_id, season]
+
+
+def standings_as_of(cur, league_id, season, as_of=None, round_number=None):
+    """Classificação reconstruída (lista vazia se não há partidas)"""
+    query, params = build_standings_query(league_id, season, as_of, round_number)
+    cur.execute(query, params)
+    return cur.fetchall()
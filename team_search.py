@@ -0,0 +1,49 @@
+"""
+Busca de times por similaridade (pg_trgm)
+As condições abaixo são atendidas pelos índices GIN gin_trgm_ops criados
+em create_database.py: ILIKE '%termo%' encontra substrings e o operador
+`<%` (word similarity) tolera erros de digitação. O ranking coloca os
+nomes mais parecidos com o termo primeiro ("flamen" -> "Flamengo")
+"""
+
+SEARCH_LIMIT = 10
+
+# Condição para a coluna team_name (params: team_search_params(termo))
+TEAM_NAME_MATCH = '(team_name ILIKE %s OR %s <%% team_name)'
+
+# Ordenação por similaridade (params: [termo])
+TEAM_NAME_RANK = ' ORDER BY word_similarity(%s, team_name) DESC, team_name'
+
+# team_id é chave primária, então não é preciso DISTINCT
+SEARCH_TEAMS_SQL = f'''
+    SELECT team_id, team_name
+    FROM teams
+    WHERE {TEAM_NAME_MATCH}
+    {TEAM_NAME_RANK}
+    LIMIT {SEARCH_LIMIT}
+'''
+
+SEARCH_MATCHES_SQL = f'''
+    SELECT * FROM matches
+    WHERE home_team ILIKE %s OR away_team ILIKE %s
+       OR %s <%% home_team OR %s <%% away_team
+    ORDER BY GREATEST(word_similarity(%s, home_team), word_similarity(%s, away_team)) DESC,
+             match_date DESC NULLS LAST
+    LIMIT {SEARCH_LIMIT}
+'''
+
+
+def team_search_params(term):
+    """Parâmetros de TEAM_NAME_MATCH"""
+    return [f'%{term}%', term]
+
+
+def search_teams_params(term):
+    """Parâmetros de SEARCH_TEAMS_SQL"""
+    return team_search_params(term) + [term]
+
+
+def search_matches_params(term):
+    """Parâmetros de SEARCH_MATCHES_SQL"""
+    pattern = f'%{term}%'
+    return [pattern, pattern, term, term, term, term]
@@ -119,8 +119,8 @@ def run_tests():
     # Test 6: List matches
     results['matches'] = test_endpoint(
         "List Matches (paginated)",
-        f"{BASE_URL}/api/matches?limit=10",
-        expected_keys=['success', 'count', 'total', 'data']
+        f"{BASE_URL}/api/matches?limit=10&include_total=true",
+        expected_keys=['success', 'count', 'total', 'next_cursor', 'data']
     )
     
     # Test 7: Filter matches by league
@@ -144,6 +144,13 @@ def run_tests():
         expected_keys=['success', 'league_id', 'season', 'data']
     )
     
+    # Test 9b: Standings rebuilt from matches
+    results['standings_as_of'] = test_endpoint(
+        "Get Standings as of date (Brasileirao 2023)",
+        f"{BASE_URL}/api/standings/brasileirao/2023?as_of=2023-08-01",
+        expected_keys=['success', 'as_of', 'round', 'data']
+    )
+    
     # Test 10: List teams
     results['teams'] = test_endpoint(
         "List Teams",
@@ -217,6 +224,13 @@ def test_specific_match():
                     f"{BASE_URL}/api/matches/{match_id}",
                     expected_keys=['success', 'data']
                 )
+                
+                # E a busca em lote (com um id inexistente)
+                test_endpoint(
+                    "Get Matches Batch",
+                    f"{BASE_URL}/api/matches/batch?ids={match_id},nao_existe",
+                    expected_keys=['success', 'count', 'not_found', 'data']
+                )
             else:
                 print_warning("No matches found in database")
         else:
@@ -0,0 +1,80 @@
+"""
+Testes da compressão das respostas (compression.py) com o test client do
+Flask, sem banco:
+
+    python -m pytest test_compression.py
+"""
+
+import gzip
+
+from flask import Flask, Response, jsonify
+import pytest
+
+import compression
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(compression, 'COMPRESS_ENABLED', True)
+    monkeypatch.setattr(compression, 'COMPRESS_MIN_SIZE', 1024)
+
+    app = Flask(__name__)
+
+    @app.route('/data/<int:size>')
+    def data(size):
+        response = jsonify({'data': 'a' * size})
+        response.set_etag('v1-abc')
+        return response
+
+    @app.route('/weak')
+    def weak():
+        response = jsonify({'data': 'a' * 5000})
+        response.set_etag('v1-abc', weak=True)
+        return response
+
+    @app.route('/image')
+    def image():
+        return Response(b'\x89PNG' + b'\0' * 5000, mimetype='image/png')
+
+    compression.init_compression(app)
+    return app
+
+
+def test_small_responses_are_not_compressed(app):
+    response = app.test_client().get('/data/10', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"v1-abc"'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_large_responses_use_the_accepted_encoding(app):
+    response = app.test_client().get('/data/5000', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.get_data())[:9] == b'{"data":"'
+    # Bytes diferentes, ETag forte diferente
+    assert response.headers['ETag'] == '"v1-abc-gzip"'
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli não instalado')
+def test_brotli_is_preferred_when_accepted(app):
+    response = app.test_client().get('/data/5000', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.headers['ETag'] == '"v1-abc-br"'
+
+
+def test_uncompressible_or_unaccepted_responses_pass_through(app):
+    client = app.test_client()
+
+    assert 'Content-Encoding' not in client.get('/data/5000').headers
+    assert 'Content-Encoding' not in client.get('/image', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_weak_etag_keeps_its_value(app):
+    response = app.test_client().get('/weak', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == 'W/"v1-abc"'
@@ -0,0 +1,114 @@
+"""
+Testes das ETags e do GET condicional (data_versions.py) com o test
+client do Flask e um banco falso:
+
+    python -m pytest test_data_versions.py
+"""
+
+from contextlib import contextmanager
+
+from flask import Flask, jsonify
+import pytest
+
+import compression
+from data_versions import DataVersions, path_scope
+
+
+class StubVersionConnection:
+    """Conexão falsa que responde VERSION_SQL com versions[league_id]"""
+
+    def __init__(self, versions):
+        self.versions = versions
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.league_id = params[0]
+
+    def fetchone(self):
+        return {'version': self.versions[self.league_id]}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(compression, 'COMPRESS_ENABLED', True)
+    monkeypatch.setattr(compression, 'COMPRESS_MIN_SIZE', 1024)
+
+    versions = {'brasileirao': 1}
+
+    @contextmanager
+    def connection():
+        if versions.get('down'):
+            raise ConnectionError('banco fora do ar')
+        yield StubVersionConnection(versions)
+
+    data_versions = DataVersions(connection, ttl=0)
+    app = Flask(__name__)
+    app.versions = versions
+    app.calls = 0
+
+    @app.route('/api/standings/<league_id>/<season>')
+    @data_versions.conditional(path_scope)
+    def standings(league_id, season):
+        app.calls += 1
+        return jsonify({'data': 'a' * 5000})
+
+    compression.init_compression(app)
+    return app
+
+
+def test_matching_if_none_match_skips_the_view(app):
+    client = app.test_client()
+    etag = client.get('/api/standings/brasileirao/2024').headers['ETag']
+
+    response = client.get('/api/standings/brasileirao/2024', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == b''
+    assert app.calls == 1
+
+
+def test_304_repeats_the_encoded_etag(app):
+    client = app.test_client()
+    gzip_headers = {'Accept-Encoding': 'gzip'}
+    etag = client.get('/api/standings/brasileirao/2024', headers=gzip_headers).headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    response = client.get(
+        '/api/standings/brasileirao/2024', headers=dict(gzip_headers, **{'If-None-Match': etag})
+    )
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+    # Cliente que não aceita mais gzip não pode reaproveitar a cópia comprimida
+    response = client.get('/api/standings/brasileirao/2024', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_new_data_version_changes_the_etag(app):
+    client = app.test_client()
+    etag = client.get('/api/standings/brasileirao/2024').headers['ETag']
+
+    app.versions['brasileirao'] = 2
+    response = client.get('/api/standings/brasileirao/2024', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    # Outra rota da mesma liga tem outra ETag
+    assert client.get('/api/standings/brasileirao/2023').headers['ETag'] != response.headers['ETag']
+
+
+def test_without_versions_the_route_still_answers(app):
+    app.versions['down'] = True
+
+    response = app.test_client().get('/api/standings/brasileirao/2024', headers={'If-None-Match': '*'})
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
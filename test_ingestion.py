@@ -0,0 +1,282 @@
+"""
+Testes da ingestão: ritmo de requisições e cache em disco (upstream.py) e
+decisões do modo incremental (ingestion_state.py). Usam um Flashscore
+falso que registra o horário de cada chamada, então não precisam de banco
+nem de rede:
+
+    python -m pytest test_ingestion.py
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import pytest
+
+from bulk_load import BulkLoader
+from ingestion_state import content_hash, is_done, standings_unchanged
+from upstream import CachedClient, CacheMiss, RateLimitedClient, TokenBucket
+
+
+class StubFlashscore:
+    """Flashscore falso: registra o horário (segundo `clock`) de cada requisição"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.timestamps = []
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.timestamps.append(self.clock())
+
+    def get_league_matches(self, league_id, season):
+        self._request()
+        return iter([{'id': f'{league_id}_{season}_1', 'home_team': 'Flamengo'}])
+
+    def get_league_table(self, league_id, season):
+        self._request()
+        return [{'team': 'Flamengo', 'points': 70}]
+
+
+class LazyStubFlashscore(StubFlashscore):
+    """Flashscore falso que só busca cada partida quando o iterador chega nela"""
+
+    def __init__(self, matches, clock=time.monotonic):
+        super().__init__(clock)
+        self.matches = matches
+
+    def get_league_matches(self, league_id, season):
+        for i in range(self.matches):
+            self._request()
+            yield {'id': f'{league_id}_{season}_{i}', 'home_team': 'Flamengo'}
+
+
+class FakeClock:
+    """
+    Relógio parado compartilhado pelas threads
+
+    `sleep` não espera: só anota, para a thread que chamou, o horário em
+    que acordaria. `thread_time()` é esse horário, então as requisições
+    saem com o espaçamento exato que o bucket impôs, sem depender do
+    agendador do sistema.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._local = threading.local()
+
+    def __call__(self):
+        self._local.woke_at = self.now
+        return self.now
+
+    def sleep(self, seconds):
+        self._local.woke_at = self.now + seconds
+
+    def thread_time(self):
+        return getattr(self._local, 'woke_at', self.now)
+
+
+def fetch_all(client, jobs, workers):
+    """Mesmo padrão do populate_all: partidas e classificação de cada liga/temporada"""
+    def fetch(job):
+        league_id, season = job
+        client.get_league_matches(league_id=league_id, season=season)
+        client.get_league_table(league_id=league_id, season=season)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fetch, jobs))
+
+
+def test_concurrent_workers_share_the_rate_limit():
+    rate = 20
+    clock = FakeClock()
+    stub = StubFlashscore(clock=clock.thread_time)
+    client = RateLimitedClient(stub, TokenBucket(rate=rate, burst=1, clock=clock, sleep=clock.sleep))
+    jobs = [(f'liga_{i}', '2024') for i in range(12)]
+
+    fetch_all(client, jobs, workers=6)
+
+    # Cada uma das 24 requisições reservou um horário próprio, espaçados em
+    # exatamente 1/rate, por mais que as 6 threads disputem o bucket
+    stamps = sorted(stub.timestamps)
+    assert stamps == pytest.approx([i / rate for i in range(2 * len(jobs))])
+
+
+def test_lazy_results_take_a_token_per_item(tmp_path):
+    rate = 10
+    clock = FakeClock()
+    stub = LazyStubFlashscore(matches=5, clock=clock.thread_time)
+    limited = RateLimitedClient(stub, TokenBucket(rate=rate, burst=1, clock=clock, sleep=clock.sleep))
+
+    # O CachedClient esvazia o iterador com list(): cada partida buscada
+    # ainda espera a sua ficha
+    matches = CachedClient(limited, str(tmp_path)).get_league_matches(league_id='brasileirao', season='2024')
+
+    assert len(matches) == 5
+    assert stub.timestamps == pytest.approx([(i + 1) / rate for i in range(5)])
+
+
+def test_burst_then_steady_rate():
+    now = [0.0]
+    sleeps = []
+    bucket = TokenBucket(rate=10, burst=3, clock=lambda: now[0], sleep=sleeps.append)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert [round(w, 3) for w in waits[3:]] == [0.1, 0.2]
+    assert [round(s, 3) for s in sleeps] == [0.1, 0.2]
+
+
+def test_idle_time_refills_up_to_burst():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=lambda s: None)
+    bucket.acquire()
+    bucket.acquire()
+
+    now[0] = 60.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.5
+
+
+def test_incremental_skips_only_closed_seasons():
+    previous_run = datetime(2024, 6, 1, 3, 0)
+    this_run = datetime(2024, 6, 8, 3, 0)
+    today = date(2024, 6, 8)
+    closed = {
+        'status': 'complete', 'run_started_at': previous_run,
+        'unfinished_matches': 0, 'last_match_date': date(2023, 12, 6),
+    }
+
+    assert is_done(closed, this_run, 'incremental', today)
+    assert not is_done(closed, this_run, 'full', today)
+    # Jogos sem placar ou recentes: a temporada continua sendo buscada
+    assert not is_done(dict(closed, unfinished_matches=3), this_run, 'incremental', today)
+    assert not is_done(dict(closed, last_match_date=date(2024, 6, 2)), this_run, 'incremental', today)
+    assert not is_done(dict(closed, status='failed'), this_run, 'incremental', today)
+    assert not is_done(None, this_run, 'incremental', today)
+
+
+def test_resumed_run_skips_what_it_already_completed():
+    interrupted = datetime(2024, 6, 8, 3, 0)
+    done = {
+        'status': 'complete', 'run_started_at': interrupted,
+        'unfinished_matches': 5, 'last_match_date': date(2024, 6, 7),
+    }
+
+    assert is_done(done, interrupted, 'full')
+    assert not is_done(dict(done, status='running'), interrupted, 'full')
+
+
+def test_standings_refetched_after_changes_or_failure():
+    complete = {'status': 'complete'}
+
+    assert standings_unchanged(complete, 0, 'incremental')
+    assert not standings_unchanged(complete, 1, 'incremental')
+    assert not standings_unchanged(complete, 0, 'full')
+    # Classificação da execução anterior falhou ou nunca foi gravada
+    assert not standings_unchanged({'status': 'failed'}, 0, 'incremental')
+    assert not standings_unchanged(None, 0, 'incremental')
+
+
+def test_content_hash_changes_with_any_field():
+    row = ('m1', 'brasileirao', '2024', '2024-06-01', None, 'Flamengo', 'Palmeiras', None, None)
+    assert content_hash(row) == content_hash(list(row))
+    assert content_hash(row) != content_hash(row[:7] + (2, 1))
+    assert content_hash(row[:4] + ('',) + row[5:]) != content_hash(row)
+
+
+def test_cache_serves_repeated_calls_from_disk(tmp_path):
+    stub = StubFlashscore()
+    cache_dir = str(tmp_path)
+    client = CachedClient(stub, cache_dir)
+
+    first = client.get_league_matches(league_id='brasileirao', season='2022')
+    again = CachedClient(stub, cache_dir).get_league_matches(league_id='brasileirao', season='2022')
+
+    assert first == again == [{'id': 'brasileirao_2022_1', 'home_team': 'Flamengo'}]
+    assert len(stub.timestamps) == 1
+    # Outros argumentos, outra entrada
+    client.get_league_matches(league_id='brasileirao', season='2023')
+    assert len(stub.timestamps) == 2
+
+
+def test_cache_ttl_depends_on_season(tmp_path):
+    stub = StubFlashscore()
+    client = CachedClient(stub, str(tmp_path))
+    current = str(time.localtime().tm_year)
+
+    assert client.ttl('get_league_table', {'season': '2022'}) > client.ttl('get_league_table', {'season': current})
+
+    # Entrada da temporada atual mais velha que o TTL: busca de novo
+    client.get_league_table(league_id='brasileirao', season=current)
+    path = client.path('get_league_table', {'league_id': 'brasileirao', 'season': current})
+    old = time.time() - client.ttl('get_league_table', {'season': current}) - 1
+    os.utime(path, (old, old))
+    client.get_league_table(league_id='brasileirao', season=current)
+    assert len(stub.timestamps) == 2
+
+
+def test_offline_replays_cache_without_requests(tmp_path):
+    stub = StubFlashscore()
+    cache_dir = str(tmp_path)
+    CachedClient(stub, cache_dir).get_league_table(league_id='premier-league', season='2023-2024')
+    offline = CachedClient(None, cache_dir, offline=True)
+
+    # No modo offline o TTL é ignorado
+    path = offline.path('get_league_table', {'league_id': 'premier-league', 'season': '2023-2024'})
+    os.utime(path, (0, 0))
+    assert offline.get_league_table(league_id='premier-league', season='2023-2024') == [
+        {'team': 'Flamengo', 'points': 70}
+    ]
+    with pytest.raises(CacheMiss):
+        offline.get_league_matches(league_id='premier-league', season='2023-2024')
+    assert len(stub.timestamps) == 1
+
+
+class StubConnection:
+    """Conexão falsa: aceita COPY e comandos sem banco, contando os commits"""
+
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self, **kwargs):
+        return StubCursor()
+
+    def commit(self):
+        self.commits += 1
+
+
+class StubCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def copy_expert(self, sql, data):
+        pass
+
+
+def test_loaded_counts_rows_from_automatic_flushes():
+    # Partida + hash por linha: com lote de 100, o loader grava sozinho
+    # várias vezes durante o laço e o flush final não tem nenhuma partida
+    conn = StubConnection()
+    loader = BulkLoader(conn, batch_size=100)
+    before = loader.loaded('matches')
+
+    for i in range(50):
+        loader.add('matches', (f'm{i}', 'brasileirao', '2024') + (None,) * 11)
+        loader.add('match_hashes', (f'm{i}', f'hash{i}'))
+    loader.flush()
+
+    assert loader.loaded('matches') - before == 50
+    assert loader.pending_rows == 0
+    assert conn.commits == 2  # staging + um lote cheio; o flush final ficou vazio
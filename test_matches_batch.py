@@ -0,0 +1,86 @@
+"""
+Testes de /api/matches/batch (api.py) com o test client do Flask e um
+banco falso, sem servidor nem PostgreSQL:
+
+    python -m pytest test_matches_batch.py
+"""
+
+from contextlib import contextmanager
+
+import pytest
+
+import api
+
+MATCHES = [{'match_id': 'm1', 'home_team': 'Flamengo', 'away_team': 'Palmeiras'}]
+STATS = [{'id': 1, 'match_id': 'm1', 'stat_type': 'Posse de bola', 'home_value': '55%', 'away_value': '45%'}]
+
+
+class StubCursor:
+    """Cursor falso: devolve as linhas da tabela citada no FROM"""
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        self.rows = STATS if 'FROM match_stats' in sql else MATCHES
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    queries = []
+
+    class StubConnection:
+        def cursor(self):
+            return StubCursor(queries)
+
+    @contextmanager
+    def connection(primary=False):
+        yield StubConnection()
+
+    monkeypatch.setattr(api, 'get_db_connection', connection)
+    client = api.app.test_client()
+    client.queries = queries
+    return client
+
+
+@pytest.mark.parametrize('body', [
+    ['m1', 'm2'],
+    'm1',
+    {'ids': 'm1'},
+    {'ids': [{'id': 'm1'}]},
+])
+def test_malformed_body_is_rejected(client, body):
+    response = client.post('/api/matches/batch', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert client.queries == []
+
+
+def test_missing_or_too_many_ids(client, monkeypatch):
+    monkeypatch.setattr(api, 'BATCH_MAX_IDS', 2)
+
+    assert client.post('/api/matches/batch', json={}).status_code == 400
+    assert client.get('/api/matches/batch?ids=,,').status_code == 400
+    assert client.get('/api/matches/batch?ids=a,b,c').status_code == 400
+    assert client.queries == []
+
+
+def test_batch_returns_matches_with_stats(client):
+    response = client.post('/api/matches/batch', json={'ids': ['m1', 'm1', 'nope']})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['count'] == 1
+    assert body['not_found'] == ['nope']
+    assert body['data'] == [{'match': MATCHES[0], 'stats': STATS}]
+    # Uma consulta de partidas e uma de estatísticas
+    assert len(client.queries) == 2
@@ -0,0 +1,58 @@
+"""
+Testes do limite de requisições por cliente (rate_limit.py)
+Rodam com o test client do Flask, sem banco:
+
+    python -m pytest test_rate_limit.py
+"""
+
+from flask import Flask, jsonify
+
+import rate_limit
+
+
+def make_app(tmp_path, monkeypatch, quota=3):
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ANONYMOUS', quota)
+    monkeypatch.setattr(rate_limit, 'TRUSTED_PROXY_HOPS', 1)
+    monkeypatch.setattr(rate_limit, 'limiter', rate_limit.SlidingWindowLimiter(str(tmp_path / 'ratelimit.bin')))
+
+    app = Flask(__name__)
+
+    @app.route('/api/leagues')
+    def leagues():
+        return jsonify({'success': True})
+
+    rate_limit.init_rate_limit(app)
+    return app.test_client()
+
+
+def test_rotating_forwarded_for_does_not_reset_the_counter(tmp_path, monkeypatch):
+    client = make_app(tmp_path, monkeypatch)
+
+    # O cliente inventa um X-Forwarded-For por requisição; o proxy do
+    # Koyeb acrescenta o IP real no fim
+    statuses = [
+        client.get(
+            '/api/leagues',
+            headers={'X-Forwarded-For': f'198.51.100.{i}, 203.0.113.7'},
+            environ_base={'REMOTE_ADDR': '10.0.0.2'},
+        ).status_code
+        for i in range(5)
+    ]
+
+    assert statuses == [200, 200, 200, 429, 429]
+
+
+def test_clients_behind_the_proxy_have_separate_quotas(tmp_path, monkeypatch):
+    client = make_app(tmp_path, monkeypatch, quota=1)
+
+    def get(ip):
+        return client.get(
+            '/api/leagues',
+            headers={'X-Forwarded-For': ip},
+            environ_base={'REMOTE_ADDR': '10.0.0.2'},
+        )
+
+    assert get('203.0.113.7').status_code == 200
+    assert get('203.0.113.8').status_code == 200
+    assert get('203.0.113.7').status_code == 429
@@ -0,0 +1,148 @@
+"""
+Testes do cache de respostas (response_cache.py) com o test client do
+Flask e um banco falso para data_versions:
+
+    python -m pytest test_response_cache.py
+"""
+
+from contextlib import contextmanager
+import random
+import time
+
+from flask import Flask, jsonify
+import pytest
+
+import response_cache
+from data_versions import DataVersions, path_scope
+from response_cache import CacheEntry, ResponseCache, cached
+
+
+def entry(body=b'{}', ttl=60):
+    return CacheEntry(body, 200, 'application/json', [], time.monotonic() + ttl)
+
+
+class StubVersionConnection:
+    """Conexão falsa que responde VERSION_SQL com versions[league_id]"""
+
+    def __init__(self, versions):
+        self.versions = versions
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.league_id = params[0]
+
+    def fetchone(self):
+        return {'version': self.versions[self.league_id]}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(response_cache, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(response_cache, 'cache', ResponseCache())
+
+    versions = {'brasileirao': 1}
+
+    @contextmanager
+    def connection():
+        yield StubVersionConnection(versions)
+
+    data_versions = DataVersions(connection, ttl=0)
+    app = Flask(__name__)
+    app.versions = versions
+    app.calls = 0
+
+    @app.route('/api/standings/<league_id>/<season>')
+    @data_versions.conditional(path_scope)
+    @cached(60)
+    def standings(league_id, season):
+        app.calls += 1
+        return jsonify({'league_id': league_id, 'season': season, 'calls': app.calls})
+
+    return app
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', entry())
+    cache.set('b', entry())
+    cache.get('a')  # 'a' passa a ser a mais recente
+    cache.set('c', entry())
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_limit_evicts_and_skips_oversized_entries():
+    cache = ResponseCache(max_bytes=100)
+    cache.set('a', entry(b'x' * 60))
+    cache.set('b', entry(b'x' * 60))
+    cache.set('huge', entry(b'x' * 101))
+
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+    assert cache.get('huge') is None
+    assert cache.stats()['bytes'] == 60
+
+
+def test_compressed_bodies_count_against_the_byte_limit():
+    cache = ResponseCache(max_bytes=25000)
+    body = random.Random(0).randbytes(10000)  # o gzip quase não reduz
+    cache.set('old', entry(body))
+    cache.set('new', entry(body))
+
+    gzipped = cache.encoded_body('new', cache.get('new'), 'gzip')
+
+    # A versão comprimida estourou o limite: a entrada mais antiga sai
+    assert cache.get('old') is None
+    assert cache.stats()['bytes'] == len(body) + len(gzipped) <= 25000
+    # Segunda requisição reaproveita os bytes guardados
+    assert cache.encoded_body('new', cache.get('new'), 'gzip') is gzipped
+    assert cache.stats()['compressions'] == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = ResponseCache()
+    cache.set('a', entry(ttl=-1))
+
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expired'], stats['misses'], stats['entries'], stats['bytes']) == (1, 1, 0, 0)
+
+
+def test_route_is_cached_until_the_data_version_changes(app):
+    client = app.test_client()
+
+    first = client.get('/api/standings/brasileirao/2024')
+    again = client.get('/api/standings/brasileirao/2024')
+    assert (first.headers['X-Cache'], again.headers['X-Cache']) == ('MISS', 'HIT')
+    assert again.get_json() == first.get_json()
+    assert app.calls == 1
+
+    # Outra query string, outra entrada
+    assert client.get('/api/standings/brasileirao/2024?x=1').headers['X-Cache'] == 'MISS'
+
+    # Nova ingestão: a versão entra na chave e a entrada antiga não é usada
+    app.versions['brasileirao'] = 2
+    fresh = client.get('/api/standings/brasileirao/2024')
+    assert fresh.headers['X-Cache'] == 'MISS'
+    assert fresh.get_json()['calls'] == 3
+
+
+def test_cached_hits_are_served_compressed(app, monkeypatch):
+    monkeypatch.setattr(response_cache, 'negotiate', lambda mimetype, size: 'gzip')
+    client = app.test_client()
+
+    miss = client.get('/api/standings/brasileirao/2024', headers={'Accept-Encoding': 'gzip'})
+    hit = client.get('/api/standings/brasileirao/2024', headers={'Accept-Encoding': 'gzip'})
+
+    assert miss.headers['Content-Encoding'] == hit.headers['Content-Encoding'] == 'gzip'
+    assert hit.get_data() == miss.get_data()
+    assert response_cache.cache.stats()['compressions'] == 1
+    assert response_cache.cache.stats()['compressed_hits'] == 1
@@ -0,0 +1,135 @@
+"""
+Testes do single-flight (single_flight.py): threads com a mesma chave
+dividem uma execução, sem banco:
+
+    python -m pytest test_single_flight.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+import single_flight
+from single_flight import SingleFlight
+
+
+class CountingEvent(threading.Event):
+    """Event que conta quantas threads estão esperando por ele"""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+        self._count_lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        with self._count_lock:
+            self.waiting += 1
+        return super().wait(timeout)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Execuções criadas pelo SingleFlight, para saber quando as seguidoras já esperam"""
+    monkeypatch.setattr(single_flight, 'SINGLE_FLIGHT_ENABLED', True)
+    created = []
+
+    class Call(single_flight._Call):
+        def __init__(self):
+            super().__init__()
+            self.done = CountingEvent()
+            created.append(self.done)
+
+    monkeypatch.setattr(single_flight, '_Call', Call)
+    return created
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condição não atingida'
+        time.sleep(0.001)
+
+
+def run_concurrently(flights, key, fn, threads):
+    pool = ThreadPoolExecutor(max_workers=threads)
+    futures = [pool.submit(flights.do, key, fn) for _ in range(threads)]
+    return pool, futures
+
+
+def test_concurrent_calls_share_one_execution(events):
+    flights = SingleFlight(timeout=30)
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        release.wait()
+        return ['linha']
+
+    pool, futures = run_concurrently(flights, 'matches', query, threads=8)
+    # Líder dentro de query() e as outras 7 esperando por ela
+    wait_for(lambda: calls and events and events[0].waiting == 7)
+    release.set()
+    results = [future.result() for future in futures]
+    pool.shutdown()
+
+    assert len(calls) == 1
+    assert results == [['linha']] * 8
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {'executions': 1, 'shared': 7, 'timeouts': 0, 'in_flight': 0}
+
+    # Terminada a execução, a mesma chave consulta de novo
+    flights.do('matches', query)
+    assert len(calls) == 2
+
+
+def test_leader_error_reaches_the_waiters(events):
+    flights = SingleFlight(timeout=30)
+    release = threading.Event()
+
+    def query():
+        release.wait()
+        raise RuntimeError('banco fora do ar')
+
+    pool, futures = run_concurrently(flights, 'matches', query, threads=4)
+    wait_for(lambda: events and events[0].waiting == 3)
+    release.set()
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match='banco fora do ar'):
+            future.result()
+    pool.shutdown()
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_waiter_runs_on_its_own_after_the_timeout(events):
+    flights = SingleFlight(timeout=0.01)
+    release = threading.Event()
+    calls = []
+
+    def slow_query():
+        calls.append('líder')
+        release.wait()
+        return 'líder'
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    leader = pool.submit(flights.do, 'matches', slow_query)
+    wait_for(lambda: calls)
+
+    # A líder continua presa; quem espera desiste e consulta sozinho
+    assert flights.do('matches', lambda: 'própria') == 'própria'
+    assert flights.stats()['timeouts'] == 1
+
+    release.set()
+    assert leader.result() == 'líder'
+    pool.shutdown()
+
+
+def test_each_key_has_its_own_execution(events):
+    flights = SingleFlight(timeout=30)
+
+    assert flights.do('a', lambda: 1) == 1
+    assert flights.do('b', lambda: 2) == 2
+    assert flights.stats()['executions'] == 2
@@ -0,0 +1,218 @@
+"""
+Acesso ao Flashscore durante a população do banco
+Todas as chamadas ao Flashscore, de qualquer thread da ingestão, passam
+por um único token bucket: o ritmo de requisições fica limitado a
+FLASHSCORE_RATE por segundo no processo todo, não importa quantas
+ligas/temporadas estejam sendo coletadas ao mesmo tempo.
+Antes do limite fica um cache em disco das respostas (CachedClient):
+refazer a ingestão depois de uma mudança de schema não precisa buscar de
+novo temporadas encerradas, e o modo offline reconstrói o banco só com ele
+"""
+
+from collections import Counter
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import logging
+
+from leagues import season_is_current
+
+logger = logging.getLogger(__name__)
+
+# Requisições por segundo ao Flashscore e quantas podem sair de uma vez
+FLASHSCORE_RATE = float(os.getenv('FLASHSCORE_RATE', 1))
+FLASHSCORE_BURST = int(os.getenv('FLASHSCORE_BURST', 1))
+
+FLASHSCORE_CACHE_ENABLED = os.getenv('FLASHSCORE_CACHE_ENABLED', 'true').lower() != 'false'
+FLASHSCORE_CACHE_DIR = os.getenv('FLASHSCORE_CACHE_DIR', '.flashscore_cache')
+# Offline: só o cache, sem requisições (respostas ausentes viram CacheMiss)
+FLASHSCORE_OFFLINE = os.getenv('FLASHSCORE_OFFLINE', 'false').lower() == 'true'
+
+# TTL (s) por tipo de resposta na temporada atual; temporadas encerradas
+# não mudam mais e usam FLASHSCORE_CACHE_TTL_FINISHED
+CACHE_TTLS = {
+    'get_league_matches': int(os.getenv('FLASHSCORE_CACHE_TTL_MATCHES', 3600)),
+    'get_league_table': int(os.getenv('FLASHSCORE_CACHE_TTL_TABLE', 3600)),
+}
+CACHE_TTL_FINISHED = int(os.getenv('FLASHSCORE_CACHE_TTL_FINISHED', 90 * 86400))
+
+
+class TokenBucket:
+    """
+    Token bucket com fila implícita
+
+    Cada `acquire()` reserva uma ficha, mesmo que o saldo fique negativo, e
+    dorme fora da trava até a ficha existir: as threads saem na ordem em
+    que chegaram, espaçadas em exatamente 1/rate segundo.
+    """
+
+    def __init__(self, rate=FLASHSCORE_RATE, burst=FLASHSCORE_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated = clock()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até a próxima ficha; retorna os segundos de espera"""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, 0.0)
+            self.waited += wait
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class RateLimitedClient:
+    """
+    Cliente Flashscore cujas chamadas esperam uma ficha do bucket compartilhado
+
+    Resultados preguiçosos (iteradores) também gastam uma ficha a cada item:
+    o Flashscore pode fazer uma requisição por partida enquanto é iterado.
+    """
+
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+
+    def get_league_matches(self, **kwargs):
+        self.limiter.acquire()
+        result = self.client.get_league_matches(**kwargs)
+        if hasattr(result, '__next__'):
+            return self._throttled(result)
+        return result
+
+    def _throttled(self, iterator):
+        while True:
+            self.limiter.acquire()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            yield item
+
+    def get_league_table(self, **kwargs):
+        self.limiter.acquire()
+        return self.client.get_league_table(**kwargs)
+
+
+# Compartilhado por todas as threads da ingestão
+upstream_limiter = TokenBucket()
+
+
+class CacheMiss(LookupError):
+    """Resposta ausente do cache no modo offline"""
+
+
+# Somadas entre todas as threads da ingestão (resumo no fim do populate_all)
+cache_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def count(event):
+    with _stats_lock:
+        cache_stats[event] += 1
+
+
+class CachedClient:
+    """
+    Cache em disco das respostas do Flashscore
+
+    Cada resposta é um arquivo `<dir>/<ab>/<sha256>.pickle.gz`, com o nome
+    derivado da chamada e dos argumentos, gravado de forma atômica (várias
+    threads e execuções podem dividir o diretório). A idade é a do mtime do
+    arquivo. São arquivos gravados por este processo: não aponte o
+    diretório para dados de terceiros (pickle).
+    """
+
+    def __init__(self, client, cache_dir=FLASHSCORE_CACHE_DIR, offline=FLASHSCORE_OFFLINE):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.offline = offline
+
+    def get_league_matches(self, **kwargs):
+        return self._call('get_league_matches', kwargs)
+
+    def get_league_table(self, **kwargs):
+        return self._call('get_league_table', kwargs)
+
+    def path(self, call, kwargs):
+        key = hashlib.sha256(
+            json.dumps([call, kwargs], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f'{key}.pickle.gz')
+
+    def ttl(self, call, kwargs):
+        season = kwargs.get('season')
+        if season and not season_is_current(str(season)):
+            return CACHE_TTL_FINISHED
+        return CACHE_TTLS[call]
+
+    def _call(self, call, kwargs):
+        path = self.path(call, kwargs)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            age = None
+
+        if age is not None and (self.offline or age < self.ttl(call, kwargs)):
+            try:
+                with open(path, 'rb') as f:
+                    result = pickle.loads(gzip.decompress(f.read()))
+                count('hits')
+                return result
+            except Exception as e:
+                logger.warning(f"Entrada do cache ilegível {path}: {e}")
+
+        if self.offline:
+            count('misses')
+            raise CacheMiss(f"{call}({kwargs}) não está no cache {self.cache_dir}")
+
+        result = getattr(self.client, call)(**kwargs)
+        if hasattr(result, '__next__'):
+            result = list(result)  # geradores não são serializáveis
+        count('expired' if age is not None else 'misses')
+        self._store(path, result)
+        return result
+
+    def _store(self, path, result):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(gzip.compress(pickle.dumps(result), compresslevel=6))
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar no cache {path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        count('stored')
+
+
+def flashscore_client(factory, offline=FLASHSCORE_OFFLINE):
+    """
+    Cliente usado pela ingestão: cache -> limite de requisições -> Flashscore
+
+    Acertos no cache não gastam fichas do token bucket. No modo offline o
+    Flashscore nem é instanciado.
+    """
+    if offline:
+        return CachedClient(None, offline=True)
+    client = RateLimitedClient(factory(), upstream_limiter)
+    if FLASHSCORE_CACHE_ENABLED:
+        return CachedClient(client)
+    return client
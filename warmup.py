@@ -0,0 +1,85 @@
+"""
+Aquecimento dos caches antes de aceitar tráfego
+Após um deploy ou restart, carrega ligas, temporadas de cada liga e a
+classificação da temporada mais recente de cada campeonato de LEAGUES,
+passando pelas próprias rotas (e portanto pelo response_cache, com as
+versões comprimidas). Importar o app não aquece nada: o gunicorn chama
+warm_up no hook when_ready (gunicorn.conf.py, com preload_app), uma vez no
+master, e os workers herdam o cache por copy-on-write; `python api.py`
+aquece antes de app.run
+"""
+
+from flask import request
+import os
+import time
+import logging
+
+from compression import ENCODINGS
+from leagues import LEAGUES
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() != 'false'
+
+# Marca as requisições do aquecimento (fora de métricas e do limite por cliente)
+WARMUP_ENVIRON_KEY = 'football_api.warmup'
+
+# Resultado do último aquecimento neste processo (exibido em /health)
+last_warmup = None
+
+
+def is_warmup_request():
+    return request.environ.get(WARMUP_ENVIRON_KEY, False)
+
+
+def warm_up(app):
+    """
+    Faz as requisições de aquecimento com o test client do app
+
+    Nunca levanta exceção: com o banco fora do ar o worker sobe assim
+    mesmo, só que com o cache frio.
+    """
+    global last_warmup
+    start = time.perf_counter()
+    client = app.test_client()
+    counts = {'ok': 0, 'errors': 0}
+
+    def get(path):
+        try:
+            response = client.get(path, environ_overrides={WARMUP_ENVIRON_KEY: True})
+            if response.status_code != 200:
+                counts['errors'] += 1
+                return None
+            # Guarda também as versões gzip/brotli na entrada do cache
+            for encoding in ENCODINGS:
+                client.get(
+                    path,
+                    headers={'Accept-Encoding': encoding},
+                    environ_overrides={WARMUP_ENVIRON_KEY: True},
+                )
+        except Exception as e:
+            logger.warning(f"Warm-up de {path} falhou: {e}")
+            counts['errors'] += 1
+            return None
+        counts['ok'] += 1
+        return response.get_json()
+
+    get('/api/leagues')
+    for league in LEAGUES.values():
+        league_id = league['league_id']
+        seasons = get(f'/api/leagues/{league_id}/seasons')
+        if seasons and seasons.get('data'):
+            get(f"/api/standings/{league_id}/{seasons['data'][0]['season']}")
+
+    duration = time.perf_counter() - start
+    last_warmup = {
+        'pid': os.getpid(),
+        'duration_seconds': round(duration, 3),
+        'responses': counts['ok'],
+        'errors': counts['errors'],
+    }
+    logger.info(
+        f"Warm-up concluído em {duration:.2f}s: {counts['ok']} respostas em cache, "
+        f"{counts['errors']} erros"
+    )
+    return last_warmup